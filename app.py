@@ -1,8 +1,37 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import requests
 import streamlit as st
 from dotenv import load_dotenv
 
+from utils.almacen import importar_despliegue
+from utils.api_client import TABLA_CRUDOS, TABLA_PROCESADOS
 from utils.auth import require_login, logout
-from utils.ui import hide_streamlit_pages_menu
+from utils.espectral import (
+    VENTANAS,
+    ParametrosEspectro,
+    agrupar_frecuencias,
+    calcular_espectro,
+    clave_espectro,
+    espectro_en_cache,
+)
+from utils.exportacion import exportar_despliegue, formatos_disponibles
+from utils import metricas
+from utils.graficos import traza
+from utils.jobs import PRIORIDAD_BAJA, PRIORIDAD_NORMAL, get_planificador
+from utils.pipeline import TABLA_REPROCESADOS
+from utils.procesamiento import VARIABLES, procesar_despliegue, rango_datos, version_datos
+from utils.recursos import get_api_client, get_rollup_store, get_series_cache, get_series_store
+from utils.resumen import (
+    ETIQUETAS_ESTADO,
+    PROCESADO,
+    SIN_PROCESAR,
+    get_servicio_resumen,
+)
+from utils.ui import hide_streamlit_pages_menu, mostrar_trabajos, registrar_trabajo
 
 # Configuración de página (LO PRIMERO)
 st.set_page_config(
@@ -109,7 +138,20 @@ def main():
             # Lógica de actualización
 
         if st.button("📥 Exportar reporte", use_container_width=True):
-            st.info("Generando reporte...")
+            despliegue_id = st.session_state.despliegue_seleccionado
+            if despliegue_id is None:
+                st.warning("Selecciona un despliegue para exportar.")
+            else:
+                registrar_trabajo(get_planificador().enviar(
+                    f"Exportar despliegue {despliegue_id}",
+                    exportar_despliegue,
+                    get_api_client(), despliegue_id,
+                    [(var, tabla) for var in VARIABLES for tabla in (TABLA_CRUDOS, TABLA_PROCESADOS)],
+                    formatos_disponibles()[-1],
+                ))
+
+    # Avance de los trabajos en segundo plano de esta sesión
+    mostrar_trabajos()
 
     # Contenido principal basado en página seleccionada
     if page == "🏠 Inicio":
@@ -126,88 +168,122 @@ def show_home_page():
     """Página de inicio / dashboard principal"""
     st.title("🏠 Dashboard de Monitoreo - Sertecpet")
 
+    # KPIs y despliegues: una sola consulta agregada, compartida y cacheada
+    try:
+        resumen = get_servicio_resumen().obtener(get_api_client())
+    except requests.RequestException as e:
+        st.error(f"No se pudo obtener el resumen del backend: {e}")
+        return
+
     # 3 columnas para KPIs
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        st.metric("Despliegues Activos", "15", "↑ 2")
+        st.metric("Despliegues Activos", resumen.despliegues_activos,
+                  resumen.deltas.get("despliegues_activos"))
 
     with col2:
-        st.metric("Equipos Monitoreados", "8", "→")
+        st.metric("Equipos Monitoreados", resumen.equipos_monitoreados,
+                  resumen.deltas.get("equipos_monitoreados"))
 
     with col3:
-        st.metric("Alertas Activas", "3", "↓ 1")
+        st.metric("Alertas Activas", resumen.alertas_activas,
+                  resumen.deltas.get("alertas_activas"), delta_color="inverse")
 
     with col4:
-        st.metric("Eficiencia Promedio", "94.2%", "↑ 0.5%")
+        eficiencia = resumen.eficiencia_promedio
+        st.metric("Eficiencia Promedio",
+                  f"{eficiencia:.1f}%" if eficiencia is not None else "—",
+                  resumen.deltas.get("eficiencia_promedio"))
 
     st.divider()
 
-    # Lista de despliegues recientes
-    st.subheader("📋 Despliegues Recientes")
-
-    # Tabla de despliegues (placeholder)
-    despliegues_data = [
-        {
-            "ID": 101,
-            "Motor": "Bomba A",
-            "Fecha": "2024-01-15",
-            "Puntos": "50,243",
-            "Estado": "✅ Procesado",
-        },
-        {
-            "ID": 102,
-            "Motor": "Bomba B",
-            "Fecha": "2024-01-14",
-            "Puntos": "48,512",
-            "Estado": "✅ Procesado",
-        },
-        {
-            "ID": 103,
-            "Motor": "Motor 1",
-            "Fecha": "2024-01-13",
-            "Puntos": "52,100",
-            "Estado": "⏳ Procesando",
-        },
-        {
-            "ID": 104,
-            "Motor": "Motor 2",
-            "Fecha": "2024-01-12",
-            "Puntos": "47,850",
-            "Estado": "❌ Sin procesar",
+    # Lista de despliegues: una sola tabla, filtrada y paginada en memoria
+    st.subheader("📋 Despliegues")
+    mostrar_tabla_despliegues(resumen.despliegues)
+
+
+FILAS_POR_PAGINA = 25
+
+
+def filtrar_despliegues(despliegues, busqueda="", estados=None, orden="Fecha", descendente=True):
+    """DataFrame de despliegues filtrado por texto y estado, y ordenado"""
+    tabla = pd.DataFrame(despliegues, columns=["id", "motor", "fecha", "puntos", "estado"])
+    tabla.columns = ["ID", "Motor", "Fecha", "Puntos", "Estado"]
+    if busqueda:
+        texto = tabla["ID"].astype(str) + " " + tabla["Motor"].astype(str)
+        tabla = tabla[texto.str.contains(busqueda, case=False, regex=False)]
+    if estados:
+        tabla = tabla[tabla["Estado"].isin(estados)]
+    tabla = tabla.sort_values(orden, ascending=not descendente, kind="stable")
+    tabla["Estado"] = tabla["Estado"].map(ETIQUETAS_ESTADO)
+    return tabla.reset_index(drop=True)
+
+
+def mostrar_tabla_despliegues(despliegues):
+    """Tabla única con búsqueda, filtros, orden y paginación.
+
+    Un solo elemento por página (``st.data_editor``, editable solo en la
+    columna de selección) en lugar de una fila de widgets por despliegue;
+    "Ver" y "Procesar" actúan sobre la fila seleccionada.
+    """
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 1])
+    with col1:
+        busqueda = st.text_input("🔎 Buscar", placeholder="ID o motor", key="despliegues_busqueda")
+    with col2:
+        estados = st.multiselect(
+            "Estado", list(ETIQUETAS_ESTADO), format_func=ETIQUETAS_ESTADO.get,
+            key="despliegues_estados",
+        )
+    with col3:
+        orden = st.selectbox("Ordenar por", ["Fecha", "ID", "Motor", "Puntos", "Estado"],
+                             key="despliegues_orden")
+    with col4:
+        descendente = st.toggle("Desc.", value=True, key="despliegues_desc")
+
+    tabla = filtrar_despliegues(despliegues, busqueda, estados, orden, descendente)
+    if tabla.empty:
+        st.info("No hay despliegues que coincidan con los filtros.")
+        return
+
+    paginas = max(1, -(-len(tabla) // FILAS_POR_PAGINA))
+    pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas,
+                             value=1, key="despliegues_pagina") if paginas > 1 else 1
+    visible = tabla.iloc[(pagina - 1) * FILAS_POR_PAGINA:pagina * FILAS_POR_PAGINA]
+    visible.insert(0, "Seleccionar", False)
+
+    editada = st.data_editor(
+        visible,
+        hide_index=True,
+        use_container_width=True,
+        disabled=list(tabla.columns),
+        column_config={
+            "Seleccionar": st.column_config.CheckboxColumn("✔", width="small"),
+            "Puntos": st.column_config.NumberColumn(format="%d"),
         },
-    ]
+        key=f"despliegues_tabla_{pagina}",
+    )
+    seleccion = editada[editada["Seleccionar"]]
+    st.caption(f"{len(tabla):,} despliegues · {len(seleccion)} seleccionados")
 
-    # Mostrar como dataframe con botones de acción
-    for d in despliegues_data:
-        cols = st.columns([1, 2, 2, 2, 2, 2])
-        with cols[0]:
-            st.write(f"**{d['ID']}**")
-        with cols[1]:
-            st.write(d["Motor"])
-        with cols[2]:
-            st.write(d["Fecha"])
-        with cols[3]:
-            st.write(d["Puntos"])
-        with cols[4]:
-            status_color = {
-                "✅ Procesado": "green",
-                "⏳ Procesando": "orange",
-                "❌ Sin procesar": "red",
-            }
-            st.markdown(
-                f"<span style='color:{status_color[d['Estado']]}'>{d['Estado']}</span>",
-                unsafe_allow_html=True,
-            )
-        with cols[5]:
-            if d["Estado"] == "✅ Procesado":
-                if st.button("📊 Ver", key=f"view_{d['ID']}"):
-                    st.session_state.despliegue_seleccionado = d["ID"]
-                    st.switch_page("pages/02_📊_Despliegues.py")
-            elif d["Estado"] == "❌ Sin procesar":
-                if st.button("🔄 Procesar", key=f"process_{d['ID']}"):
-                    st.info(f"Iniciando procesamiento del despliegue {d['ID']}...")
-                    # Llamar al pipeline
+    col1, col2, _ = st.columns([1, 1, 4])
+    ver = seleccion[seleccion["Estado"] == ETIQUETAS_ESTADO[PROCESADO]]
+    procesar = seleccion[seleccion["Estado"] == ETIQUETAS_ESTADO[SIN_PROCESAR]]
+    with col1:
+        if st.button("📊 Ver", disabled=len(ver) != 1, use_container_width=True):
+            st.session_state.despliegue_seleccionado = ver["ID"].iloc[0]
+            st.switch_page("pages/despliegue.py")
+    with col2:
+        if st.button("🔄 Procesar", disabled=procesar.empty, use_container_width=True):
+            for despliegue_id in procesar["ID"]:
+                registrar_trabajo(get_planificador().enviar(
+                    f"Procesar despliegue {despliegue_id}",
+                    procesar_despliegue,
+                    get_api_client(), get_rollup_store(), get_series_cache(),
+                    despliegue_id, VARIABLES,
+                    prioridad=PRIORIDAD_NORMAL,
+                ))
+            st.rerun()
 
 
 def show_despliegues_page():
@@ -218,16 +294,219 @@ def show_despliegues_page():
 
 
 def show_analisis_page():
-    """Página de análisis detallado"""
+    """Página de análisis detallado: espectro, espectrograma y energía por bandas"""
     st.title("🔍 Análisis Detallado")
-    st.write("Funcionalidad en desarrollo...")
+
+    try:
+        despliegues = [d["id"] for d in get_servicio_resumen().obtener(get_api_client()).despliegues]
+    except requests.RequestException as e:
+        st.error(f"No se pudo obtener la lista de despliegues: {e}")
+        return
+    if not despliegues:
+        st.info("No hay despliegues disponibles.")
+        return
+
+    seleccionado = st.session_state.despliegue_seleccionado
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        despliegue_id = st.selectbox(
+            "Despliegue", despliegues,
+            index=despliegues.index(seleccionado) if seleccionado in despliegues else 0,
+        )
+    with col2:
+        variable = st.selectbox("Variable", VARIABLES,
+                                index=VARIABLES.index("vibracion") if "vibracion" in VARIABLES else 0)
+    # Además del backend, las series importadas o reprocesadas en el almacén local
+    almacen = get_series_store()
+    fuentes = [(TABLA_CRUDOS, False), (TABLA_PROCESADOS, False)] + [
+        (t, True) for t in (TABLA_CRUDOS, TABLA_PROCESADOS, TABLA_REPROCESADOS)
+        if almacen.existe(despliegue_id, variable, t)
+    ]
+    with col3:
+        tabla, local = st.selectbox("Datos", fuentes, format_func=nombre_fuente)
+
+    if st.button("💾 Importar despliegue al almacén local",
+                 help="Descarga crudos y procesados para analizarlos sin consultar el backend"):
+        registrar_trabajo(get_planificador().enviar(
+            f"Importar despliegue {despliegue_id}",
+            importar_despliegue,
+            get_api_client(), almacen, despliegue_id, VARIABLES, [TABLA_CRUDOS, TABLA_PROCESADOS],
+            prioridad=PRIORIDAD_BAJA, clave=("importar", despliegue_id),
+        ))
+        st.info("Importación en cola; el avance se muestra en el panel de trabajos.")
+
+    # Extensión real de los datos, estable entre reruns: el rango forma parte
+    # de la clave de la caché de espectros
+    inicio, fin = rango_datos(get_api_client(), despliegue_id)
+    rango = st.slider("Rango temporal", min_value=inicio, max_value=fin,
+                      value=(max(inicio, fin - timedelta(days=1)), fin),
+                      format="YYYY-MM-DD HH:mm")
+
+    with st.form("parametros_espectro"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            muestras = st.selectbox("Muestras por ventana", [256, 512, 1024, 2048, 4096, 8192],
+                                    index=2)
+        with col2:
+            solape = st.slider("Solape", min_value=0.0, max_value=0.9, value=0.5, step=0.05)
+        with col3:
+            ventana = st.selectbox("Ventana", list(VENTANAS))
+        texto_bandas = st.text_input(
+            "Bandas de energía (Hz)", placeholder="0-10, 10-50, 50-200 (vacío: automáticas)"
+        )
+        calcular = st.form_submit_button("📈 Calcular espectro", type="primary")
+
+    try:
+        bandas = interpretar_bandas(texto_bandas)
+    except ValueError as e:
+        st.error(f"Bandas no válidas: {e}")
+        return
+    parametros = ParametrosEspectro(muestras, solape, ventana, bandas)
+    if local:
+        version = almacen.version(despliegue_id, variable, tabla)
+    else:
+        version = version_datos(get_api_client(), despliegue_id)
+    clave = clave_espectro(despliegue_id, variable, tabla, rango[0], rango[1],
+                           version, parametros, local)
+
+    # Al terminar el trabajo el panel recarga la página y el resultado ya está en caché
+    espectro = espectro_en_cache(clave)
+    if espectro is None and calcular:
+        trabajo_id = get_planificador().enviar(
+            f"Espectro de {variable} (despliegue {despliegue_id})",
+            calcular_espectro, get_api_client(), clave, almacen=almacen,
+            clave=("espectro",) + clave,
+        )
+        registrar_trabajo(trabajo_id)
+        st.session_state["espectro_enviado"] = (clave, trabajo_id)
+    if espectro is not None:
+        mostrar_espectro(espectro, variable)
+        return
+
+    # Sin resultado para los controles actuales: el del último cálculo pedido
+    enviado = st.session_state.get("espectro_enviado")
+    if enviado is None:
+        return
+    clave_enviada, trabajo_id = enviado
+    trabajo = get_planificador().estado(trabajo_id)
+    if trabajo is not None and trabajo.activo:
+        st.info("Cálculo en curso; el avance se muestra en el panel de trabajos.")
+        return
+    if trabajo is not None and trabajo.error:
+        st.error(f"El cálculo del espectro falló: {trabajo.error}")
+        return
+    anterior = espectro_en_cache(clave_enviada)
+    if anterior is not None:
+        st.caption("Resultado del último cálculo, con otros parámetros o rango que los actuales.")
+        mostrar_espectro(anterior, clave_enviada[1])
+
+
+def nombre_fuente(fuente):
+    tabla, local = fuente
+    nombre = {TABLA_CRUDOS: "Crudos", TABLA_PROCESADOS: "Procesados",
+              TABLA_REPROCESADOS: "Reprocesados"}[tabla]
+    return f"{nombre} (almacén local)" if local else nombre
+
+
+def interpretar_bandas(texto):
+    """``"0-10, 10-50"`` → ``((0.0, 10.0), (10.0, 50.0))``"""
+    bandas = []
+    for parte in filter(None, (p.strip() for p in texto.split(","))):
+        inferior, _, superior = parte.partition("-")
+        inferior, superior = float(inferior), float(superior)
+        if not 0 <= inferior < superior:
+            raise ValueError(f"'{parte}'")
+        bandas.append((inferior, superior))
+    return tuple(bandas)
+
+
+def mostrar_espectro(espectro, variable):
+    """Welch, espectrograma y tendencia de energía por bandas"""
+    if not espectro.ventanas:
+        st.warning("No hay ventanas completas sin gaps ni faltantes en el rango elegido.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Muestreo", f"{espectro.fs:g} Hz")
+    col2.metric("Ventanas", f"{espectro.ventanas:,}")
+    col3.metric("Descartadas", f"{espectro.descartadas:,}")
+    col4.metric("Cálculo", f"{espectro.segundos:.1f} s")
+
+    fig = go.Figure(traza(espectro.frecuencias, espectro.psd, name="PSD"))
+    fig.update_layout(title=f"Espectro de {variable} (Welch)", xaxis_title="Frecuencia (Hz)",
+                      yaxis_title="PSD (unidades²/Hz)", yaxis_type="log", height=350)
+    st.plotly_chart(fig, use_container_width=True)
+
+    tiempos = espectro.tiempos.view("datetime64[ns]")
+    frecuencias, espectrograma = agrupar_frecuencias(espectro.frecuencias, espectro.espectrograma)
+    with np.errstate(divide="ignore"):
+        decibelios = 10 * np.log10(espectrograma.T)
+    fig = go.Figure(go.Heatmap(x=tiempos, y=frecuencias, z=decibelios,
+                               colorscale="Viridis", colorbar=dict(title="dB")))
+    fig.update_layout(title="Espectrograma", xaxis_title="Fecha/Hora",
+                      yaxis_title="Frecuencia (Hz)", height=400)
+    st.plotly_chart(fig, use_container_width=True)
+
+    fig = go.Figure([traza(tiempos, energia, name=banda)
+                     for banda, energia in espectro.energia_bandas.items()])
+    fig.update_layout(title="Energía por bandas", xaxis_title="Fecha/Hora",
+                      yaxis_title="Energía (unidades²)", hovermode="x unified", height=350)
+    st.plotly_chart(fig, use_container_width=True)
 
 
 def show_config_page():
     """Página de configuración"""
     st.title("⚙️ Configuración del Sistema")
-    st.write("Funcionalidad en desarrollo...")
+
+    user = st.session_state.get("auth_user") or {}
+    if str(user.get("rol", "")).lower() not in ("admin", "administrador"):
+        st.write("Funcionalidad en desarrollo...")
+        return
+
+    mostrar_panel_rendimiento()
+
+
+def mostrar_panel_rendimiento():
+    """Panel de administración con las métricas de rendimiento del proceso"""
+    st.subheader("⏱️ Rendimiento")
+    activo = st.toggle("Registrar métricas", value=metricas.activo())
+    if activo != metricas.activo():
+        metricas.activar(activo)
+
+    filas = metricas.registro.resumen()
+    if not filas:
+        st.info("Sin métricas registradas todavía.")
+    else:
+        tabla = pd.DataFrame(filas)
+        # Los tamaños se muestran tal cual; las latencias, en milisegundos
+        es_tiempo = tabla["metrica"].str.endswith("_segundos")
+        for columna in ("media", "p50", "p95", "p99"):
+            tabla[columna] = tabla[columna].where(~es_tiempo, tabla[columna] * 1000)
+        tabla["unidad"] = es_tiempo.map({True: "ms", False: "bytes"})
+        st.dataframe(
+            tabla,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                columna: st.column_config.NumberColumn(format="%.1f")
+                for columna in ("media", "p50", "p95", "p99")
+            },
+        )
+
+    texto = metricas.registro.prometheus()
+    col1, col2, _ = st.columns([1, 1, 4])
+    with col1:
+        st.download_button("📥 Prometheus", texto, file_name="metrics.prom",
+                           mime="text/plain", use_container_width=True)
+    with col2:
+        if st.button("🗑️ Reiniciar", use_container_width=True):
+            metricas.registro.reiniciar()
+            st.rerun()
+    with st.expander("Formato de exposición"):
+        st.code(texto, language="text")
 
 
 if __name__ == "__main__":
-    main()
+    metricas.iniciar_exportadores()
+    with metricas.medir("rerun_segundos", pagina="app"):
+        main()
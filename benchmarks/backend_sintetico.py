@@ -0,0 +1,303 @@
+"""Backend sintético para benchmarks: imita la API real sin base de datos.
+
+Uso:
+    BENCH_PUNTOS=10000,1000000 python -m uvicorn benchmarks.backend_sintetico:app --port 8765
+
+Cada entrada de ``BENCH_PUNTOS`` es un despliegue (ids 1, 2, ...) con ese
+número de puntos por variable, a 1 Hz. Las series se generan de forma
+determinista en bloques de ``BLOQUE`` puntos, con gaps, faltantes, outliers
+y valores imposibles; solo se guardan en memoria los últimos bloques
+usados, así que un despliegue de 50 millones de puntos no ocupa más que uno
+pequeño. Con ``BENCH_ALMACEN=<directorio>`` cada serie se materializa la
+primera vez en un ``utils.almacen.AlmacenSeries`` y se sirve desde ahí
+(lectura por ``memmap``), como haría un backend real con datos en disco.
+Endpoints:
+
+- ``GET /api/despliegues``
+- ``POST /api/analytics/trend``: rango, límite, cursor, orden y filtro de
+  calidad; responde en ``utils.wire`` (Arrow o NumPy) según ``Accept`` si se
+  pide una sola serie, o en JSON.
+- ``POST /api/pipeline/procesar``: simula un pipeline de ``BENCH_PROCESO_S``
+  segundos; al terminar el despliegue queda procesado con una versión de
+  datos nueva.
+- ``GET /api/pipeline/estado?trabajo_id=...``: estado y progreso de ese
+  pipeline.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from utils import wire
+from utils.almacen import AlmacenSeries
+from utils.api_client import TABLA_CRUDOS, TABLA_PROCESADOS
+from utils.calidad import FALTANTE, IMPOSIBLE, OUTLIER
+from utils.procesamiento import VARIABLES
+
+BLOQUE = 1 << 20
+PASO_NS = 1_000_000_000
+INICIO_NS = pd.Timestamp("2024-01-01").as_unit("ns").value
+# Tiempo reservado por bloque para sus gaps (5 % de su duración)
+_HOLGURA = 0.05
+_DURACION_BLOQUE = int(BLOQUE * PASO_NS * (1 + _HOLGURA))
+
+# Nivel y dispersión típicos de cada variable
+_ESCALAS = {
+    "temperatura": (85.0, 5.0),
+    "presion": (3000.0, 150.0),
+    "vibracion": (5.0, 1.0),
+    "corriente": (200.0, 20.0),
+    "voltaje": (440.0, 10.0),
+}
+
+DURACION_PROCESO_S = float(os.getenv("BENCH_PROCESO_S", "2"))
+
+PUNTOS = [int(p) for p in os.getenv("BENCH_PUNTOS", "10000,1000000").split(",") if p.strip()]
+
+_almacen = AlmacenSeries(os.environ["BENCH_ALMACEN"]) if os.getenv("BENCH_ALMACEN") else None
+_almacen_lock = threading.Lock()
+# Puntos mínimos que se filtran de una vez por calidad al leer del almacén
+_TRAMO_FILTRO = 1 << 16
+
+Arrays = Dict[str, np.ndarray]
+
+
+@lru_cache(maxsize=16)
+def _bloque(despliegue_id: int, variable: str, procesada: bool, k: int) -> Arrays:
+    """Bloque ``k`` de una serie; crudos y procesados comparten semilla."""
+    n = PUNTOS[despliegue_id - 1]
+    m = min(BLOQUE, n - k * BLOQUE)
+    rng = np.random.default_rng([despliegue_id, VARIABLES.index(variable), k])
+
+    # Timestamps: 1 Hz con algunos gaps dentro de la holgura del bloque
+    saltos = np.zeros(m, dtype=np.int64)
+    n_gaps = min(rng.poisson(3), m - 1)
+    if n_gaps:
+        tamanos = rng.uniform(0.2, 1.0, n_gaps) * _HOLGURA * BLOQUE * PASO_NS / n_gaps
+        saltos[rng.integers(1, m, n_gaps)] = tamanos.astype(np.int64)
+    timestamp = INICIO_NS + k * _DURACION_BLOQUE + np.arange(m, dtype=np.int64) * PASO_NS
+    timestamp += np.cumsum(saltos)
+
+    # Valores: ciclo diario + deriva lenta + ruido
+    nivel, escala = _ESCALAS[variable]
+    dias = timestamp / (86400 * PASO_NS)
+    valor = (nivel + escala * np.sin(2 * np.pi * dias)
+             + np.cumsum(rng.normal(0, escala * 0.002, m))
+             + rng.normal(0, escala * 0.1, m))
+
+    outliers = rng.random(m) < 0.001
+    valor[outliers] += rng.choice([-8.0, 8.0], outliers.sum()) * escala
+    imposibles = rng.random(m) < 0.0001
+    valor[imposibles] = -999.0
+    faltantes = rng.random(m) < 0.005
+    valor[faltantes] = np.nan
+
+    calidad = np.zeros(m, dtype=np.int8)
+    if procesada:
+        calidad[outliers] = OUTLIER
+        calidad[imposibles] = IMPOSIBLE
+        calidad[faltantes] = FALTANTE
+        valor[outliers | imposibles] = nivel
+    return {"timestamp": timestamp, "valor": valor, "calidad": calidad}
+
+
+def _n_bloques(despliegue_id: int) -> int:
+    return -(-PUNTOS[despliegue_id - 1] // BLOQUE)
+
+
+def _leer_almacen(despliegue_id: int, variable: str, procesada: bool,
+                  desde: Optional[int], hasta: Optional[int], limite: int,
+                  orden: str, calidad: Optional[List[int]]) -> Arrays:
+    tabla = TABLA_PROCESADOS if procesada else TABLA_CRUDOS
+    with _almacen_lock:
+        if not _almacen.existe(despliegue_id, variable, tabla):
+            _almacen.escribir(despliegue_id, variable, tabla, (
+                _bloque(despliegue_id, variable, procesada, k)
+                for k in range(_n_bloques(despliegue_id))
+            ))
+    if calidad is None:
+        return _almacen.leer_rango(despliegue_id, variable, tabla, desde, hasta, limite, orden)
+    # Vistas sobre el fichero: se filtran por tramos hasta reunir ``limite``
+    # puntos, sin recorrer el resto del rango
+    serie = _almacen.leer_rango(despliegue_id, variable, tabla, desde, hasta, orden=orden)
+    tramo = max(limite, _TRAMO_FILTRO)
+    partes: List[np.ndarray] = []
+    reunidos = 0
+    for inicio in range(0, len(serie["calidad"]), tramo):
+        conservar = np.flatnonzero(np.isin(serie["calidad"][inicio:inicio + tramo], calidad))
+        partes.append(conservar[:limite - reunidos] + inicio)
+        reunidos += len(partes[-1])
+        if reunidos >= limite:
+            break
+    indices = np.concatenate(partes) if partes else np.empty(0, dtype=np.intp)
+    return {c: v[indices] for c, v in serie.items()}
+
+
+def leer_serie(despliegue_id: int, variable: str, procesada: bool,
+               desde: Optional[int], hasta: Optional[int], limite: int,
+               orden: str = "asc", calidad: Optional[List[int]] = None) -> Arrays:
+    """Hasta ``limite`` puntos de [desde, hasta] en el orden pedido."""
+    if _almacen is not None:
+        return _leer_almacen(despliegue_id, variable, procesada, desde, hasta, limite,
+                             orden, calidad)
+    n_bloques = _n_bloques(despliegue_id)
+    desde = INICIO_NS if desde is None else desde
+    hasta = INICIO_NS + n_bloques * _DURACION_BLOQUE if hasta is None else hasta
+    primero = max(0, (desde - INICIO_NS) // _DURACION_BLOQUE)
+    ultimo = min(n_bloques - 1, (hasta - INICIO_NS) // _DURACION_BLOQUE)
+    bloques = range(primero, ultimo + 1)
+    if orden == "desc":
+        bloques = reversed(bloques)
+
+    partes: List[Arrays] = []
+    reunidos = 0
+    for k in bloques:
+        bloque = _bloque(despliegue_id, variable, procesada, k)
+        ts = bloque["timestamp"]
+        corte = slice(np.searchsorted(ts, desde, "left"), np.searchsorted(ts, hasta, "right"))
+        parte = {c: v[corte] for c, v in bloque.items()}
+        if calidad is not None:
+            conservar = np.isin(parte["calidad"], calidad)
+            parte = {c: v[conservar] for c, v in parte.items()}
+        if orden == "desc":
+            parte = {c: v[::-1] for c, v in parte.items()}
+        partes.append(parte)
+        reunidos += len(parte["timestamp"])
+        if reunidos >= limite:
+            break
+    if not partes:
+        return {"timestamp": np.empty(0, np.int64), "valor": np.empty(0),
+                "calidad": np.empty(0, np.int8)}
+    return {c: np.concatenate([p[c] for p in partes])[:limite] for c in partes[0]}
+
+
+def _ns(valor: Optional[str]) -> Optional[int]:
+    return None if valor is None else pd.Timestamp(valor).as_unit("ns").value
+
+
+def _puntos(serie: Arrays) -> List[dict]:
+    timestamps = pd.to_datetime(serie["timestamp"]).strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return [
+        {"timestamp": t, "valor": None if np.isnan(v) else float(v), "calidad": int(q)}
+        for t, v, q in zip(timestamps, serie["valor"].tolist(), serie["calidad"].tolist())
+    ]
+
+
+app = FastAPI(title="Backend sintético")
+_procesados: set = set()
+# Veces que se ha procesado cada despliegue (``version_datos``)
+_versiones: Dict[int, int] = {}
+# Pipelines: trabajo_id -> [despliegue, inicio, terminado]
+_pipelines: Dict[str, list] = {}
+
+
+def _avanzar_pipelines() -> None:
+    """Da por terminados los pipelines que ya cumplieron su duración."""
+    ahora = time.monotonic()
+    for pipeline in _pipelines.values():
+        despliegue_id, inicio, terminado = pipeline
+        if not terminado and ahora - inicio >= DURACION_PROCESO_S:
+            pipeline[2] = True
+            _procesados.add(despliegue_id)
+            _versiones[despliegue_id] = _versiones.get(despliegue_id, 0) + 1
+
+
+def _estado(despliegue_id: int) -> str:
+    if any(not t and d == despliegue_id for d, _, t in _pipelines.values()):
+        return "procesando"
+    return "procesado" if despliegue_id in _procesados else "sin_procesar"
+
+
+@app.get("/api/despliegues")
+def despliegues():
+    _avanzar_pipelines()
+    return [
+        {
+            "id": i,
+            "motor": f"Motor sintético {i}",
+            "fecha": pd.Timestamp(INICIO_NS).strftime("%Y-%m-%d"),
+            "puntos": n * len(VARIABLES),
+            "estado": _estado(i),
+            "version_datos": _versiones.get(i, 0),
+        }
+        for i, n in enumerate(PUNTOS, start=1)
+    ]
+
+
+@app.post("/api/analytics/trend")
+async def trend(request: Request):
+    params = await request.json()
+    despliegue_id = int(params["despliegue_id"])
+    if not 1 <= despliegue_id <= len(PUNTOS):
+        return JSONResponse({"detail": "Despliegue no encontrado"}, status_code=404)
+    limite = int(params.get("limit") or 10_000)
+    orden = params.get("order", "asc")
+    cursor = params.get("cursor")
+    desde = _ns(params.get("ts_from"))
+    hasta = _ns(params.get("ts_to"))
+    # El cursor es el primer timestamp de la página en el sentido del orden
+    if cursor and orden == "desc":
+        hasta = int(cursor)
+    elif cursor:
+        desde = int(cursor)
+
+    series = []
+    for variable in params.get("variables") or VARIABLES:
+        if variable not in _ESCALAS:
+            return JSONResponse({"detail": f"Variable desconocida: {variable}"}, status_code=404)
+        for tabla in params.get("tablas") or [TABLA_CRUDOS]:
+            serie = leer_serie(despliegue_id, variable, tabla == TABLA_PROCESADOS,
+                               desde, hasta, limite + 1, orden, params.get("calidad"))
+            # El punto sobrante solo indica dónde empieza la página siguiente
+            siguiente = None
+            if len(serie["timestamp"]) > limite:
+                siguiente = str(int(serie["timestamp"][limite]))
+            serie = {c: v[:limite] for c, v in serie.items()}
+            series.append((variable, tabla, serie, siguiente))
+
+    aceptados = request.headers.get("accept", "")
+    if len(series) == 1 and wire.FORMATO_ARROW in aceptados and wire.pa is not None:
+        tipo, codificar = wire.FORMATO_ARROW, wire.codificar_arrow
+    elif len(series) == 1 and wire.FORMATO_NUMPY in aceptados:
+        tipo, codificar = wire.FORMATO_NUMPY, wire.codificar_numpy
+    else:
+        return {"series": [
+            {"variable": variable, "tabla": tabla, "points": _puntos(serie),
+             "next_cursor": siguiente}
+            for variable, tabla, serie, siguiente in series
+        ]}
+    _, _, serie, siguiente = series[0]
+    cabeceras = {wire.CABECERA_CURSOR: siguiente} if siguiente else {}
+    return Response(codificar(serie), media_type=tipo, headers=cabeceras)
+
+
+@app.post("/api/pipeline/procesar")
+async def procesar(request: Request):
+    params = await request.json()
+    despliegue_id = int(params["despliegue_id"])
+    trabajo_id = uuid.uuid4().hex
+    _pipelines[trabajo_id] = [despliegue_id, time.monotonic(), False]
+    return {"trabajo_id": trabajo_id, "estado": "procesando",
+            "despliegue_id": params["despliegue_id"]}
+
+
+@app.get("/api/pipeline/estado")
+def estado_pipeline(trabajo_id: str):
+    _avanzar_pipelines()
+    if trabajo_id not in _pipelines:
+        return JSONResponse({"detail": "Trabajo no encontrado"}, status_code=404)
+    despliegue_id, inicio, terminado = _pipelines[trabajo_id]
+    progreso = 1.0 if terminado else (time.monotonic() - inicio) / max(DURACION_PROCESO_S, 1e-9)
+    return {"trabajo_id": trabajo_id, "despliegue_id": despliegue_id,
+            "estado": "procesado" if terminado else "procesando",
+            "progreso": min(1.0, progreso)}
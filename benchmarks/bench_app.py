@@ -0,0 +1,211 @@
+"""Benchmark de extremo a extremo contra el backend sintético.
+
+Uso:
+    python -m benchmarks.bench_app --puntos 10000 1000000 10000000
+    python -m benchmarks.bench_app --guardar base.json
+    python -m benchmarks.bench_app --comparar base.json --tolerancia 0.25
+
+Arranca ``benchmarks.backend_sintetico`` con uvicorn en un proceso aparte
+(o usa ``--url`` para uno ya en marcha) y mide, para un despliegue de cada
+tamaño, las etapas que recorre el dashboard:
+
+- ``descarga``: ``APIClient.iter_trend_pages`` + decodificación a DataFrame.
+- ``reduccion``: ``reducir_serie`` al ancho de un gráfico.
+- ``calidad``: ``AnalizadorCalidad`` bloque a bloque.
+- ``grafico``: figura de Plotly con la serie reducida, serializada a JSON.
+- ``exportacion_<formato>``: ``exportar`` a fichero en cada formato disponible.
+- ``procesar``: ida y vuelta de ``/api/pipeline/procesar``.
+
+Reporta p50/p95 de ``--repeticiones`` ejecuciones y el pico de memoria de
+una ejecución adicional bajo ``tracemalloc``. Con ``--comparar`` termina con
+código 1 si algún p95 o pico supera la referencia en más de ``--tolerancia``.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import plotly.graph_objects as go
+import requests
+
+from utils.api_client import TABLA_CRUDOS, APIClient, arrays_a_dataframe
+from utils.calidad import AnalizadorCalidad
+from utils.downsampling import ANCHO_GRAFICO_PX, reducir_serie
+from utils.exportacion import exportar, formatos_disponibles
+
+VARIABLE = "temperatura"
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_backend(puntos, puerto, espera_s=60):
+    """Lanza el backend sintético y espera a que responda"""
+    entorno = dict(os.environ, BENCH_PUNTOS=",".join(str(n) for n in puntos))
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.backend_sintetico:app",
+         "--port", str(puerto), "--log-level", "warning"],
+        env=entorno,
+    )
+    url = f"http://127.0.0.1:{puerto}"
+    limite = time.monotonic() + espera_s
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("El backend sintético terminó al arrancar")
+        try:
+            requests.get(f"{url}/api/despliegues", timeout=1).raise_for_status()
+            return proceso, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("El backend sintético no respondió a tiempo")
+
+
+def medir(funcion, repeticiones):
+    """Tiempos (s) de ``repeticiones`` ejecuciones y pico de memoria (bytes)"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return tiempos, pico
+
+
+def etapas(client, despliegue_id, pagina, directorio):
+    """Funciones a medir para un despliegue; cada etapa reutiliza la anterior"""
+    datos = {}
+
+    def descarga():
+        datos["serie"] = arrays_a_dataframe(client.iter_trend_pages(
+            despliegue_id, VARIABLE, tabla=TABLA_CRUDOS, page_size=pagina
+        ))
+
+    def reduccion():
+        serie = datos["serie"]
+        datos["indices"] = reducir_serie(
+            serie["timestamp"].to_numpy(), serie["valor"].to_numpy(),
+            ANCHO_GRAFICO_PX, serie["calidad"].to_numpy(),
+        )
+
+    def calidad():
+        ts = datos["serie"]["timestamp"].to_numpy().view(np.int64)
+        valor = datos["serie"]["valor"].to_numpy()
+        analizador = AnalizadorCalidad(VARIABLE)
+        for inicio in range(0, len(ts), pagina):
+            analizador.procesar(ts[inicio:inicio + pagina], valor[inicio:inicio + pagina])
+        return analizador.estadisticas
+
+    def grafico():
+        reducida = datos["serie"].iloc[datos["indices"]]
+        fig = go.Figure(go.Scatter(x=reducida["timestamp"], y=reducida["valor"],
+                                   mode="lines", name=VARIABLE))
+        fig.update_layout(title=f"Tendencia de {VARIABLE}", height=400)
+        return fig.to_json()
+
+    resultado = {
+        "descarga": descarga,
+        "reduccion": reduccion,
+        "calidad": calidad,
+        "grafico": grafico,
+    }
+    for formato in formatos_disponibles():
+        ruta = os.path.join(directorio, f"bench_{despliegue_id}.{formato}")
+        resultado[f"exportacion_{formato}"] = (
+            lambda ruta=ruta, formato=formato: exportar(
+                client, despliegue_id, [(VARIABLE, TABLA_CRUDOS)], ruta, formato
+            )
+        )
+    resultado["procesar"] = lambda: client.iniciar_procesamiento(despliegue_id)
+    return resultado
+
+
+def comparar(resultados, referencia, tolerancia):
+    """Filas que empeoran respecto a la referencia más de ``tolerancia``"""
+    base = {(r["puntos"], r["etapa"]): r for r in referencia}
+    regresiones = []
+    for fila in resultados:
+        previa = base.get((fila["puntos"], fila["etapa"]))
+        if previa is None:
+            continue
+        for campo in ("p95_ms", "pico_mb"):
+            # Por debajo de 1 ms o 1 MB el ruido domina
+            if fila[campo] > max(previa[campo], 1.0) * (1 + tolerancia):
+                regresiones.append((fila, campo, previa[campo]))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--puntos", type=int, nargs="+", default=[10_000, 1_000_000],
+                        help="puntos por serie de cada despliegue sintético")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--pagina", type=int, default=500_000, help="puntos por petición")
+    parser.add_argument("--url", help="backend ya en marcha (no se arranca uno)")
+    parser.add_argument("--guardar", help="escribe los resultados en este JSON")
+    parser.add_argument("--comparar", help="JSON de referencia de una ejecución anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+
+    proceso = None
+    if args.url:
+        url = args.url
+    else:
+        proceso, url = iniciar_backend(args.puntos, puerto_libre())
+
+    resultados = []
+    try:
+        client = APIClient(url)
+        with tempfile.TemporaryDirectory() as directorio:
+            print(f"{'puntos':>11} {'etapa':<20} {'p50 (ms)':>10} {'p95 (ms)':>10} "
+                  f"{'pico (MB)':>10}")
+            for despliegue_id, n in enumerate(args.puntos, start=1):
+                for etapa, funcion in etapas(client, despliegue_id, args.pagina,
+                                             directorio).items():
+                    tiempos, pico = medir(funcion, args.repeticiones)
+                    fila = {
+                        "puntos": n,
+                        "etapa": etapa,
+                        "p50_ms": float(np.percentile(tiempos, 50)) * 1000,
+                        "p95_ms": float(np.percentile(tiempos, 95)) * 1000,
+                        "pico_mb": pico / 1e6,
+                    }
+                    resultados.append(fila)
+                    print(f"{n:>11,} {etapa:<20} {fila['p50_ms']:>10.1f} "
+                          f"{fila['p95_ms']:>10.1f} {fila['pico_mb']:>10.1f}")
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as fichero:
+            json.dump(resultados, fichero, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as fichero:
+            regresiones = comparar(resultados, json.load(fichero), args.tolerancia)
+        for fila, campo, previo in regresiones:
+            print(f"REGRESIÓN {fila['puntos']:,} {fila['etapa']} {campo}: "
+                  f"{previo:.1f} -> {fila[campo]:.1f}")
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark de decodificación de series: JSON vs formatos columnares.
+
+Uso:
+    python -m benchmarks.bench_wire --puntos 1000000
+
+Reporta el tiempo de decodificación por millón de puntos para cada formato
+que ``utils.wire`` sabe leer (Arrow solo si ``pyarrow`` está instalado).
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import wire
+from utils.api_client import _puntos_a_arrays
+
+
+def serie_sintetica(n):
+    """Serie de 1 Hz con valores normales y algún código de calidad"""
+    inicio = np.datetime64("2024-01-01T00:00:00", "ns").astype(np.int64)
+    return {
+        "timestamp": inicio + np.arange(n, dtype=np.int64) * 1_000_000_000,
+        "valor": np.random.normal(85, 5, n),
+        "calidad": np.random.choice([0, 1, 2], size=n, p=[0.98, 0.01, 0.01]).astype(np.int8),
+    }
+
+
+def a_json(serie):
+    """Cuerpo JSON equivalente al que envía el backend actual"""
+    timestamps = pd.to_datetime(serie["timestamp"]).strftime("%Y-%m-%dT%H:%M:%S")
+    points = [
+        {"timestamp": t, "valor": float(v), "calidad": int(q)}
+        for t, v, q in zip(timestamps, serie["valor"], serie["calidad"])
+    ]
+    return json.dumps({"series": [{"points": points}]}).encode("utf-8")
+
+
+def medir(funcion, cuerpo, repeticiones):
+    """Mejor tiempo (s) de ``repeticiones`` ejecuciones"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(cuerpo)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--puntos", type=int, default=1_000_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    serie = serie_sintetica(args.puntos)
+    formatos = {
+        "json": (
+            a_json(serie),
+            lambda cuerpo: _puntos_a_arrays(json.loads(cuerpo)["series"][0]["points"]),
+        ),
+        "numpy": (wire.codificar_numpy(serie), wire.decodificar_numpy),
+    }
+    if wire.pa is not None:
+        formatos["arrow"] = (wire.codificar_arrow(serie), wire.decodificar_arrow)
+
+    print(f"{'formato':<8} {'tamaño (MB)':>12} {'s / millón de puntos':>22}")
+    for nombre, (cuerpo, decodificar) in formatos.items():
+        segundos = medir(decodificar, cuerpo, args.repeticiones)
+        por_millon = segundos * 1_000_000 / args.puntos
+        print(f"{nombre:<8} {len(cuerpo) / 1e6:>12.1f} {por_millon:>22.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,77 @@
+import os
+from dataclasses import asdict
+from functools import partial
+
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
 import pandas as pd
-from utils.api_client import APIClient
+import requests
+from utils.api_client import (
+    TABLA_CRUDOS,
+    TABLA_PROCESADOS,
+    arrays_a_dataframe,
+    dataframe_a_arrays,
+)
+from utils.calidad import AnalizadorCalidad, EstadisticasCalidad
+from utils.downsampling import (
+    ANCHO_GRAFICO_PX,
+    minmax_indices,
+    recortar_ventana,
+    reducir_serie,
+)
+from utils.exportacion import (
+    FORMATO_CSV,
+    FORMATO_PARQUET,
+    exportar_despliegue,
+    formatos_disponibles,
+)
+from utils.fetch import TIMEOUT_PETICION, en_paralelo
+from utils.graficos import figura_apilada, traza
+from utils.jobs import PRIORIDAD_ALTA, get_planificador
+from utils.metricas import iniciar_exportadores, medido, medir
+from utils.paginacion import leer_pagina, precargar
+from utils.pipeline import TABLA_REPROCESADOS, ConfigProceso
+from utils.procesamiento import (
+    VARIABLES,
+    procesar_despliegue,
+    rango_datos,
+    reprocesar_despliegue,
+    version_datos,
+)
+from utils.recursos import get_api_client, get_rollup_store, get_series_cache, get_series_store
+from utils.reportes import (
+    FORMATO_PDF,
+    FORMATO_PNG,
+    clave_reporte,
+    generar_reporte,
+    reporte_en_cache,
+)
+from utils.resumen import ETIQUETAS_ESTADO, PROCESANDO, get_servicio_resumen
+from utils.rollups import elegir_resolucion
+from utils.ui import (
+    HAY_FRAGMENTOS,
+    fragmento,
+    mostrar_trabajos,
+    registrar_trabajo,
+    rerun_periodico,
+)
+from utils.vivo import FuenteSimulada, FuenteSSE, SuscripcionVivo, historico_reciente
+
+# Modo en vivo: fuente ("sse" o "simulada") y segundos entre actualizaciones
+FUENTE_VIVO = os.getenv("VIVO_FUENTE", "sse")
+INTERVALO_VIVO_S = float(os.getenv("VIVO_INTERVALO_S", "2"))
+
+# Análisis de calidad: tramos fijos de este tamaño, cacheados una vez cerrados
+BLOQUE_CALIDAD_S = int(os.getenv("CALIDAD_BLOQUE_S", "86400"))
+
+# Vistas de la página; solo se calcula la seleccionada
+VISTAS = [
+    "📈 Gráficos de Tendencias",
+    "🔍 Análisis de Calidad",
+    "📋 Datos Tabulares",
+    "⚙️ Configuración Avanzada",
+]
 
 # Título de la página
 st.set_page_config(
@@ -26,13 +95,20 @@ def main():
     col1, col2, col3 = st.columns(3)
     with col1:
         st.subheader(f"Despliegue #{despliegue_id}")
+    estado = obtener_estado_despliegue(despliegue_id)
     with col2:
-        st.metric("Estado", "✅ Procesado")
+        st.metric("Estado", ETIQUETAS_ESTADO.get(estado, "—"))
     with col3:
         if st.button("🔄 Reprocesar"):
-            st.info(f"Reprocesando despliegue {despliegue_id}...")
-            # Llamar al pipeline
+            registrar_trabajo(get_planificador().enviar(
+                f"Reprocesar despliegue {despliegue_id}",
+                procesar_despliegue,
+                get_api_client(), get_rollup_store(), get_series_cache(),
+                despliegue_id, obtener_variables_despliegue(despliegue_id),
+                prioridad=PRIORIDAD_ALTA, clave=("procesar", despliegue_id),
+            ))
     
+    mostrar_trabajos()
     st.divider()
     
     # Sidebar de controles
@@ -47,6 +123,10 @@ def main():
             default=variables[:2] if len(variables) >= 2 else variables
         )
         
+        # Datos nuevos de un despliegue en curso, sin recargar la página
+        vivo = st.toggle("🔴 Modo en vivo", value=estado == PROCESANDO,
+                         key=f"vivo_{despliegue_id}")
+        
         # 2. Tipo de datos
         tipo_datos = st.radio(
             "Tipo de datos",
@@ -54,6 +134,10 @@ def main():
             horizontal=True
         )
         
+        # Todas las variables en una figura con el eje de tiempo enlazado
+        apilado = st.toggle("🧩 Un solo gráfico (eje compartido)", value=True,
+                            key="tendencias_apiladas")
+        
         # 3. Rango temporal
         fecha_min, fecha_max = obtener_rango_fechas(despliegue_id)
         rango_fechas = st.slider(
@@ -77,46 +161,99 @@ def main():
         # 5. Botones de acción
         st.divider()
         if st.button("📥 Exportar gráfico como PNG", use_container_width=True):
-            st.info("Exportando...")
+            solicitar_reporte(despliegue_id, variables_seleccionadas, tipo_datos,
+                              rango_fechas, FORMATO_PNG)
         
         if st.button("📊 Generar reporte PDF", use_container_width=True):
-            st.info("Generando reporte...")
-    
-    # Contenido principal - Pestañas
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "📈 Gráficos de Tendencias", 
-        "🔍 Análisis de Calidad", 
-        "📋 Datos Tabulares",
-        "⚙️ Configuración Avanzada"
-    ])
-    
-    with tab1:
-        mostrar_graficos_tendencia(
-            despliegue_id, 
-            variables_seleccionadas, 
-            tipo_datos, 
-            rango_fechas
-        )
+            solicitar_reporte(despliegue_id, variables_seleccionadas, tipo_datos,
+                              rango_fechas, FORMATO_PDF)
     
-    with tab2:
-        mostrar_analisis_calidad(despliegue_id)
+    if not vivo:
+        detener_vivo()
     
-    with tab3:
-        mostrar_datos_tabulares(despliegue_id, variables_seleccionadas)
+    # Contenido principal: st.tabs ejecutaría las cuatro vistas en cada
+    # rerun, así que se elige una y solo esa se calcula
+    vista = st.radio("Vista", VISTAS, horizontal=True, label_visibility="collapsed",
+                     key="vista_despliegue")
     
-    with tab4:
+    if vista == VISTAS[0]:
+        if vivo:
+            mostrar_vivo(despliegue_id, variables_seleccionadas)
+        else:
+            mostrar_graficos_tendencia(
+                despliegue_id, 
+                variables_seleccionadas, 
+                tipo_datos, 
+                rango_fechas,
+                apilado
+            )
+    elif vista == VISTAS[1]:
+        mostrar_analisis_calidad(despliegue_id, variables_seleccionadas, rango_fechas)
+    elif vista == VISTAS[2]:
+        mostrar_datos_tabulares(despliegue_id, variables_seleccionadas, rango_fechas)
+    else:
         mostrar_configuracion_avanzada(despliegue_id)
 
+
+def obtener_estado_despliegue(despliegue_id):
+    """Estado del despliegue según el resumen compartido de la página de inicio"""
+    try:
+        resumen = get_servicio_resumen().obtener(get_api_client())
+    except requests.RequestException:
+        return None
+    for despliegue in resumen.despliegues:
+        if despliegue['id'] == despliegue_id:
+            return despliegue['estado']
+    return None
+
+def solicitar_reporte(despliegue_id, variables, tipo_datos, rango_fechas, formato):
+    """Descarga inmediata si el reporte está en caché; si no, lo genera en segundo plano"""
+    if not variables:
+        st.warning("Selecciona al menos una variable")
+        return
+    tablas = {
+        "Crudos": [TABLA_CRUDOS],
+        "Procesados": [TABLA_PROCESADOS],
+        "Ambos": [TABLA_CRUDOS, TABLA_PROCESADOS],
+    }[tipo_datos]
+    clave = clave_reporte(despliegue_id, variables, tablas, rango_fechas[0], rango_fechas[1],
+                          version_datos(get_api_client(), despliegue_id), formato)
+    
+    reporte = reporte_en_cache(clave)
+    if reporte is not None:
+        st.download_button(f"⬇️ Descargar {reporte.nombre}", data=reporte.datos,
+                           file_name=reporte.nombre, mime=reporte.tipo_mime,
+                           use_container_width=True)
+        return
+    # Pulsar otra vez mientras se genera sigue el mismo trabajo
+    registrar_trabajo(get_planificador().enviar(
+        f"Reporte {formato.upper()} del despliegue {despliegue_id}",
+        generar_reporte, get_api_client(), clave, clave=("reporte",) + clave,
+    ))
+    st.info("Reporte en cola; la descarga aparecerá en el panel de trabajos.")
+
+def memo_vista(nombre, clave, calcular):
+    """Resultado de ``calcular()`` reutilizado mientras ``clave`` no cambie.
+
+    Una entrada por ``nombre`` en la sesión: al volver a una vista, o al
+    tocar un control que no afecta a una parte de ella, esa parte no se
+    vuelve a descargar ni a reducir.
+    """
+    memo = st.session_state.setdefault('memo_vistas', {})
+    anterior = memo.get(nombre)
+    if anterior is not None and anterior[0] == clave:
+        return anterior[1]
+    valor = calcular()
+    memo[nombre] = (clave, valor)
+    return valor
+
 def obtener_variables_despliegue(despliegue_id):
     """Obtiene variables disponibles para un despliegue"""
-    # TODO: Conectar con API de Marcelo
-    return ["temperatura", "presion", "vibracion", "corriente", "voltaje"]
+    return list(VARIABLES)
 
 def obtener_rango_fechas(despliegue_id):
-    """Obtiene rango de fechas para un despliegue"""
-    # TODO: Conectar con API de Marcelo
-    from datetime import datetime, timedelta
-    return datetime.now() - timedelta(days=7), datetime.now()
+    """Obtiene rango de fechas para un despliegue (ver ``rango_datos``)"""
+    return rango_datos(get_api_client(), despliegue_id, obtener_variables_despliegue(despliegue_id))
 
 def obtener_descripcion_calidad(codigo):
     """Descripción de códigos de calidad"""
@@ -129,70 +266,221 @@ def obtener_descripcion_calidad(codigo):
     }
     return descripciones.get(codigo, "Desconocido")
 
-def mostrar_graficos_tendencia(despliegue_id, variables, tipo_datos, rango_fechas):
-    """Muestra gráficos de tendencia"""
+def mostrar_graficos_tendencia(despliegue_id, variables, tipo_datos, rango_fechas,
+                               apilado=False):
+    """Muestra gráficos de tendencia, uno por variable o todos apilados"""
     st.subheader("📈 Gráficos de Tendencias")
     
     if not variables:
         st.warning("Selecciona al menos una variable para visualizar")
         return
     
-    # Para cada variable seleccionada
+    tablas = []
+    if tipo_datos in ["Crudos", "Ambos"]:
+        tablas.append(TABLA_CRUDOS)
+    if tipo_datos in ["Procesados", "Ambos"]:
+        tablas.append(TABLA_PROCESADOS)
+    
+    # Un hueco por variable, que se rellena en cuanto llegan todas sus tablas;
+    # apiladas, un único hueco que se dibuja cuando han llegado todas
+    huecos = {}
+    if apilado:
+        hueco = st.empty()
+        hueco.info("Cargando datos...")
+    else:
+        for var in variables:
+            st.write(f"### Variable: `{var}`")
+            huecos[var] = st.empty()
+            huecos[var].info("Cargando datos...")
+    listas_apiladas = {}
+    
+    # Series ya reducidas de la última vez que se dibujó cada variable con
+    # los mismos parámetros: no se vuelven a pedir
+    resolucion = elegir_resolucion(rango_fechas[0], rango_fechas[1], ANCHO_GRAFICO_PX)
+    version = version_datos(get_api_client(), despliegue_id)
+    claves = {var: (despliegue_id, tuple(tablas), tuple(rango_fechas), resolucion, version)
+              for var in variables}
+    
+    def dibujar(var, series=None, memorizar=True):
+        if memorizar:
+            reducidas = memo_vista(f"tendencia:{var}", claves[var],
+                                   lambda: reducir_series(series, rango_fechas))
+        else:
+            reducidas = reducir_series(series, rango_fechas)
+        if not apilado:
+            with huecos[var].container():
+                dibujar_tendencia(var, reducidas, rango_fechas)
+            return
+        listas_apiladas[var] = reducidas
+        if len(listas_apiladas) < len(variables):
+            hueco.info(f"Cargando datos... {len(listas_apiladas)}/{len(variables)} variables")
+        else:
+            with hueco.container():
+                dibujar_tendencias_apiladas(
+                    {v: listas_apiladas[v] for v in variables}, rango_fechas
+                )
+    
+    memo = st.session_state.get('memo_vistas', {})
+    recibidas = {}
     for var in variables:
-        st.write(f"### Variable: `{var}`")
-        
-        # Crear gráfico con Plotly
-        fig = go.Figure()
-        
-        # Datos crudos (si se seleccionó)
-        if tipo_datos in ["Crudos", "Ambos"]:
-            datos_crudos = obtener_datos_crudos(despliegue_id, var, rango_fechas)
-            if datos_crudos:
-                fig.add_trace(go.Scatter(
-                    x=datos_crudos['timestamp'],
-                    y=datos_crudos['valor'],
-                    name=f"{var} (Crudos)",
-                    line=dict(color='red', dash='dash', width=1),
-                    mode='lines+markers'
-                ))
-        
-        # Datos procesados (si se seleccionó)
-        if tipo_datos in ["Procesados", "Ambos"]:
-            datos_procesados = obtener_datos_procesados(despliegue_id, var, rango_fechas)
-            if datos_procesados:
-                fig.add_trace(go.Scatter(
-                    x=datos_procesados['timestamp'],
-                    y=datos_procesados['valor'],
-                    name=f"{var} (Procesados)",
-                    line=dict(color='blue', width=2),
-                    mode='lines'
-                ))
-        
-        # Configurar layout
-        fig.update_layout(
-            title=f"Tendencia de {var}",
-            xaxis_title="Fecha/Hora",
-            yaxis_title="Valor",
-            hovermode="x unified",
-            height=400
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        anterior = memo.get(f"tendencia:{var}")
+        if anterior is not None and anterior[0] == claves[var]:
+            dibujar(var)
+        else:
+            recibidas[var] = {}
+    
+    # Vista general: agregados precalculados en lugar de datos crudos, si se
+    # construyeron con los datos actuales; mientras el despliegue está en
+    # curso, además, deben cubrir el final del rango pedido
+    if resolucion is not None:
+        almacen = get_rollup_store()
+        hasta = rango_fechas[1] if obtener_estado_despliegue(despliegue_id) == PROCESANDO else None
+        for var in recibidas:
+            for tabla in tablas:
+                if not almacen.vigente(despliegue_id, var, tabla, version[0], hasta):
+                    continue
+                agregados = almacen.leer_rango(
+                    despliegue_id, var, tabla, resolucion, rango_fechas[0], rango_fechas[1]
+                )
+                if agregados is not None:
+                    recibidas[var][tabla] = rollup_a_dataframe(agregados)
+    
+    pendientes = [(var, tabla) for var in recibidas for tabla in tablas
+                  if tabla not in recibidas[var]]
+    listas = [var for var in recibidas if len(recibidas[var]) == len(tablas)]
+    for var in listas:
+        dibujar(var, recibidas[var])
+    
+    # Una variable con alguna descarga fallida se dibuja con lo que haya, pero
+    # no se memoriza: el siguiente rerun vuelve a intentarlo
+    fallidas = set()
+    for (var, tabla), datos in iterar_series(despliegue_id, pendientes, rango_fechas):
+        if datos is None:
+            fallidas.add(var)
+            datos = pd.DataFrame()
+        recibidas[var][tabla] = datos
+        if len(recibidas[var]) == len(tablas):
+            dibujar(var, recibidas[var], memorizar=var not in fallidas)
+
+def rollup_a_dataframe(agregados):
+    """DataFrame de un nivel de rollup; ``valor`` es la media de cada bucket"""
+    datos = pd.DataFrame(agregados)
+    datos['timestamp'] = datos['timestamp'].to_numpy().view('datetime64[ns]')
+    return datos
+
+def reducir_series(series, rango_fechas):
+    """Series de una variable recortadas al rango y reducidas para el gráfico"""
+    return {
+        tabla: reducir_para_grafico(datos, rango_fechas)
+        for tabla, datos in series.items() if not datos.empty
+    }
+
+def agregar_trazas(fig, var, series, fila=None):
+    """Envolventes y líneas de las series de una variable (en ``fila`` si es apilada)"""
+    posicion = dict(row=fila, col=1) if fila is not None else {}
+    
+    # Datos crudos (si se seleccionó)
+    datos_crudos = series.get(TABLA_CRUDOS)
+    if datos_crudos is not None and not datos_crudos.empty:
+        agregar_envolvente(fig, datos_crudos, f"{var} (Crudos)", 'rgba(255, 0, 0, 0.15)',
+                           posicion)
+        fig.add_trace(traza(
+            datos_crudos['timestamp'],
+            datos_crudos['valor'],
+            name=f"{var} (Crudos)",
+            line=dict(color='red', dash='dash', width=1),
+            marcadores=True
+        ), **posicion)
+    
+    # Datos procesados (si se seleccionó)
+    datos_procesados = series.get(TABLA_PROCESADOS)
+    if datos_procesados is not None and not datos_procesados.empty:
+        agregar_envolvente(fig, datos_procesados, f"{var} (Procesados)", 'rgba(0, 0, 255, 0.15)',
+                           posicion)
+        fig.add_trace(traza(
+            datos_procesados['timestamp'],
+            datos_procesados['valor'],
+            name=f"{var} (Procesados)",
+            line=dict(color='blue', width=2)
+        ), **posicion)
+
+@medido("grafico_segundos", grafico="tendencias_apiladas")
+def dibujar_tendencias_apiladas(series_por_variable, rango_fechas):
+    """Dibuja todas las variables en una figura con el eje de tiempo compartido"""
+    fig = figura_apilada(list(series_por_variable), rango_fechas)
+    for fila, (var, series) in enumerate(series_por_variable.items(), start=1):
+        agregar_trazas(fig, var, series, fila)
+    st.plotly_chart(fig, use_container_width=True)
+
+@medido("grafico_segundos", grafico="tendencia")
+def dibujar_tendencia(var, series, rango_fechas):
+    """Dibuja el gráfico de una variable con sus series ya reducidas"""
+    # Crear gráfico con Plotly
+    fig = go.Figure()
+    agregar_trazas(fig, var, series)
+    
+    # Configurar layout
+    fig.update_layout(
+        title=f"Tendencia de {var}",
+        xaxis_title="Fecha/Hora",
+        yaxis_title="Valor",
+        hovermode="x unified",
+        height=400,
+        xaxis_range=list(rango_fechas)
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+def agregar_envolvente(fig, datos, nombre, color, posicion=None):
+    """Banda mínimo-máximo de los datos agregados (no hace nada con datos crudos)"""
+    if 'min' not in datos or 'max' not in datos:
+        return
+    fig.add_trace(traza(
+        datos['timestamp'], datos['max'],
+        line=dict(width=0),
+        showlegend=False, hoverinfo='skip'
+    ), **(posicion or {}))
+    fig.add_trace(traza(
+        datos['timestamp'], datos['min'],
+        line=dict(width=0),
+        fill='tonexty', fillcolor=color,
+        name=f"{nombre} mín-máx", hoverinfo='skip'
+    ), **(posicion or {}))
 
-def mostrar_analisis_calidad(despliegue_id):
+def reducir_para_grafico(datos, rango_fechas, ancho_px=ANCHO_GRAFICO_PX):
+    """Recorta al rango visible y reduce la serie a ~1 punto por píxel"""
+    datos = datos.sort_values('timestamp', ignore_index=True)
+    ts = pd.to_datetime(datos['timestamp']).to_numpy()
+    visible = recortar_ventana(ts, rango_fechas[0], rango_fechas[1])
+    ventana = datos.iloc[visible]
+    
+    # Agregados: se conservan los buckets con el máximo y el mínimo de cada
+    # tramo, para que la envolvente no pierda picos al reducir por la media
+    if 'min' in ventana and 'max' in ventana:
+        tramos = max(1, ancho_px // 4)
+        indices = np.union1d(minmax_indices(ventana['max'].to_numpy(), tramos),
+                             minmax_indices(ventana['min'].to_numpy(), tramos))
+        return ventana.iloc[indices]
+    
+    calidad = ventana['calidad'].to_numpy() if 'calidad' in ventana else None
+    indices = reducir_serie(ts[visible], ventana['valor'].to_numpy(), ancho_px, calidad)
+    return ventana.iloc[indices]
+
+def mostrar_analisis_calidad(despliegue_id, variables, rango_fechas):
     """Muestra análisis de calidad de datos"""
     st.subheader("🔍 Análisis de Calidad de Datos")
     
+    if not variables:
+        st.warning("Selecciona al menos una variable para analizar")
+        return
+    
     # Obtener estadísticas de calidad
-    # TODO: Conectar con tu pipeline para obtener estas métricas
-    estadisticas = {
-        "total_puntos": 50243,
-        "validos": 48500,
-        "outliers": 125,
-        "faltantes": 47,
-        "imposibles": 12,
-        "gaps": 3
-    }
+    estadisticas = calcular_estadisticas_calidad(
+        despliegue_id, tuple(variables), rango_fechas[0], rango_fechas[1]
+    )
+    if not estadisticas['total_puntos']:
+        st.info("No hay datos en el rango seleccionado")
+        return
     
     # Mostrar métricas
     col1, col2, col3, col4 = st.columns(4)
@@ -214,17 +502,84 @@ def mostrar_analisis_calidad(despliegue_id):
     
     # Gráfico de distribución de calidad
     fig = go.Figure(data=[go.Pie(
-        labels=['Válidos', 'Outliers', 'Faltantes', 'Imposibles'],
+        labels=['Válidos', 'Outliers', 'Faltantes', 'Imposibles', 'Error de categoría'],
         values=[estadisticas['validos'], estadisticas['outliers'], 
-                estadisticas['faltantes'], estadisticas['imposibles']],
+                estadisticas['faltantes'], estadisticas['imposibles'],
+                estadisticas['errores_categoria']],
         hole=.3
     )])
     
     fig.update_layout(title="Distribución de Calidad de Datos")
     st.plotly_chart(fig, use_container_width=True)
 
-def mostrar_datos_tabulares(despliegue_id, variables):
-    """Muestra datos en formato tabular"""
+def tramos_calidad(desde_ns, hasta_ns, bloque_s=BLOQUE_CALIDAD_S):
+    """Tramos [inicio, fin) que cubren [desde, hasta], cortados en múltiplos de ``bloque_s``"""
+    paso = bloque_s * 1_000_000_000
+    cortes = np.arange((desde_ns // paso + 1) * paso, hasta_ns + 1, paso, dtype=np.int64)
+    limites = [desde_ns, *cortes.tolist(), hasta_ns + 1]
+    return [(a, b) for a, b in zip(limites, limites[1:]) if a < b]
+
+def analizar_tramo_calidad(despliegue_id, variable, inicio, fin):
+    """Estadísticas de calidad de los datos crudos de [inicio, fin) (ns).
+
+    Además del recuento devuelve el primer y último timestamp y el paso
+    nominal, para contar los gaps entre tramos al unirlos.
+    """
+    analizador = AnalizadorCalidad(variable)
+    primero = ultimo = None
+    for chunk in get_api_client().iter_trend_pages(
+        despliegue_id, variable, pd.Timestamp(inicio), pd.Timestamp(fin - 1), tabla=TABLA_CRUDOS
+    ):
+        analizador.procesar(chunk['timestamp'], chunk['valor'])
+        primero = int(chunk['timestamp'][0]) if primero is None else primero
+        ultimo = int(chunk['timestamp'][-1])
+    return {"estadisticas": asdict(analizador.estadisticas), "primero": primero,
+            "ultimo": ultimo, "paso": analizador.paso, "factor_gap": analizador.factor_gap}
+
+@st.cache_data(show_spinner=False, max_entries=20_000)
+def analizar_tramo_cerrado(despliegue_id, variable, inicio, fin):
+    """``analizar_tramo_calidad`` de un tramo ya pasado: sus datos no cambian"""
+    return analizar_tramo_calidad(despliegue_id, variable, inicio, fin)
+
+def calcular_estadisticas_calidad(despliegue_id, variables, desde, hasta):
+    """Clasifica los datos crudos por tramos fijos de tiempo y une sus estadísticas.
+
+    Los tramos terminados antes de ahora se analizan una vez y se cachean,
+    así que al avanzar el rango solo se descarga lo nuevo. Los gaps entre
+    tramos se cuentan al unirlos; la dispersión local con la que se buscan
+    outliers empieza de cero en cada tramo.
+    """
+    desde_ns = pd.Timestamp(desde).as_unit('ns').value
+    hasta_ns = pd.Timestamp(hasta).as_unit('ns').value
+    ahora = pd.Timestamp.now().value
+    total = EstadisticasCalidad()
+    with st.spinner("Analizando calidad de datos..."):
+        for var in variables:
+            anterior = paso = None
+            for inicio, fin in tramos_calidad(desde_ns, hasta_ns):
+                analizar = analizar_tramo_cerrado if fin <= ahora else analizar_tramo_calidad
+                tramo = analizar(despliegue_id, var, inicio, fin)
+                total = total + EstadisticasCalidad(**tramo['estadisticas'])
+                if tramo['primero'] is None:
+                    continue
+                paso = paso or tramo['paso']
+                if anterior is not None and paso and (
+                    tramo['primero'] - anterior > tramo['factor_gap'] * paso
+                ):
+                    total.gaps += 1
+                anterior = tramo['ultimo']
+    return asdict(total)
+
+@fragmento()
+def mostrar_datos_tabulares(despliegue_id, variables, rango_fechas):
+    """Muestra datos en formato tabular, página a página.
+
+    Con fragmentos (Streamlit 1.33 o posterior) filtros y botones de página
+    solo vuelven a ejecutar esta vista. Con la versión fijada en
+    requirements.txt (1.28) ``fragmento`` no hace nada y cada interacción
+    relanza la página entera (los gráficos ya dibujados salen de
+    ``memo_vista`` y la página visible, de la sesión).
+    """
     st.subheader("📋 Datos Tabulares")
     
     # Selector de qué datos mostrar
@@ -236,33 +591,137 @@ def mostrar_datos_tabulares(despliegue_id, variables):
     )
     
     # Filtros adicionales
-    col1, col2 = st.columns(2)
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
-        limite_filas = st.number_input("Límite de filas", min_value=100, max_value=10000, value=1000)
+        filas = st.selectbox("Filas por página", [100, 250, 500, 1000], index=2)
     with col2:
-        if st.button("📥 Exportar a CSV"):
-            st.info("Exportando...")
+        orden = st.selectbox("Orden", ["Más antiguos primero", "Más recientes primero"])
+    with col3:
+        calidad_tabla = st.multiselect(
+            "Códigos de calidad",
+            options=[0, 1, 2, 3, 4],
+            default=[0, 1, 2, 3, 4],
+            format_func=lambda x: f"{x}: {obtener_descripcion_calidad(x)}",
+            key="tabla_calidad"
+        )
+    with col4:
+        formato = st.selectbox(
+            "Formato de exportación",
+            formatos_disponibles(),
+            format_func=lambda f: {FORMATO_CSV: "CSV (gzip)", FORMATO_PARQUET: "Parquet"}[f]
+        )
+        exportar = st.button("📥 Exportar a CSV" if formato == FORMATO_CSV else "📥 Exportar a Parquet")
     
-    # Obtener datos
-    # TODO: Conectar con API de Marcelo
-    datos = pd.DataFrame({
-        'timestamp': pd.date_range(start='2024-01-01', periods=100, freq='15min'),
-        'temperatura': np.random.normal(85, 5, 100),
-        'presion': np.random.normal(100, 10, 100)
-    })
+    if not variables:
+        st.info("Selecciona al menos una variable.")
+        return
+    
+    tablas = {
+        "Crudos": [TABLA_CRUDOS],
+        "Procesados": [TABLA_PROCESADOS],
+        "Ambos": [TABLA_CRUDOS, TABLA_PROCESADOS],
+    }[tipo_tabla]
+    
+    # Exporta la selección completa (no solo la página) en segundo plano
+    if exportar:
+        registrar_trabajo(get_planificador().enviar(
+            f"Exportar despliegue {despliegue_id}",
+            exportar_despliegue,
+            get_api_client(), despliegue_id,
+            [(var, tabla) for var in variables for tabla in tablas], formato,
+            ts_from=rango_fechas[0], ts_to=rango_fechas[1],
+            calidad=None if len(calidad_tabla) == 5 else list(calidad_tabla),
+        ))
+        st.info("Exportación en cola; la descarga aparecerá en el panel de trabajos.")
+    
+    consulta = dict(
+        pares=tuple((var, tabla) for var in variables for tabla in tablas),
+        rango_fechas=tuple(rango_fechas),
+        orden="desc" if orden == "Más recientes primero" else "asc",
+        calidad=None if len(calidad_tabla) == 5 else tuple(calidad_tabla),
+        filas=filas,
+    )
+    
+    # Claves keyset de las páginas visitadas; cambian los filtros → página 1
+    firma = (despliegue_id, tuple(sorted(consulta.items())))
+    estado = st.session_state.get("tabla_paginacion")
+    if estado is None or estado["firma"] != firma:
+        estado = {"firma": firma, "claves": [None], "siguiente": None}
+        st.session_state["tabla_paginacion"] = estado
+    
+    try:
+        pagina = leer_pagina_tabla(despliegue_id, consulta, estado)
+    except Exception as e:
+        st.error(f"No se pudieron cargar los datos: {e}")
+        return
+    estado["siguiente"] = pagina.siguiente
+    
+    # Mientras el operador mira esta página, la siguiente se descarga
+    precarga = st.session_state.get("tabla_precarga")
+    if pagina.siguiente is not None and (
+        precarga is None or precarga[:2] != (firma, pagina.siguiente)
+    ):
+        st.session_state["tabla_precarga"] = (
+            firma, pagina.siguiente,
+            precargar(get_api_client(), despliegue_id, despues_de=pagina.siguiente, **consulta)
+        )
     
     # Mostrar tabla
     st.dataframe(
-        datos,
+        pagina.datos,
         use_container_width=True,
         height=400
     )
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("⬅️ Anterior", on_click=retroceder_pagina,
+                  disabled=len(estado["claves"]) == 1, key="tabla_anterior")
+    with col2:
+        st.caption(f"Página {len(estado['claves'])} · {len(pagina.datos)} filas")
+    with col3:
+        st.button("Siguiente ➡️", on_click=avanzar_pagina,
+                  disabled=pagina.siguiente is None, key="tabla_siguiente")
+
+def leer_pagina_tabla(despliegue_id, consulta, estado):
+    """Página actual: la ya mostrada, la precargada o, si no, una lectura nueva"""
+    clave = estado["claves"][-1]
+    if estado.get("pagina") and estado["pagina"][0] == clave:
+        return estado["pagina"][1]
+    
+    precarga = st.session_state.pop("tabla_precarga", None)
+    if precarga is not None and precarga[:2] == (estado["firma"], clave):
+        pagina = precarga[2].result()
+    else:
+        if precarga is not None:
+            precarga[2].cancel()
+        pagina = leer_pagina(get_api_client(), despliegue_id, despues_de=clave, **consulta)
+    estado["pagina"] = (clave, pagina)
+    return pagina
+
+def avanzar_pagina():
+    estado = st.session_state["tabla_paginacion"]
+    if estado["siguiente"] is not None:
+        estado["claves"].append(estado["siguiente"])
 
+def retroceder_pagina():
+    estado = st.session_state["tabla_paginacion"]
+    if len(estado["claves"]) > 1:
+        estado["claves"].pop()
+
+@fragmento()
 def mostrar_configuracion_avanzada(despliegue_id):
-    """Configuración avanzada para reprocesamiento"""
+    """Configuración avanzada para reprocesamiento.
+
+    Fragmento solo donde Streamlit los tiene (ver ``mostrar_datos_tabulares``);
+    en 1.28 enviar el formulario relanza la página entera.
+    """
     st.subheader("⚙️ Configuración de Reprocesamiento")
     
-    st.warning("⚠️ Cambiar estos parámetros requiere reprocesar el despliegue completo.")
+    st.info(
+        "ℹ️ Al cambiar un parámetro solo se recalculan las etapas afectadas y los "
+        "bloques con datos nuevos; el resto se reutiliza del último reprocesamiento."
+    )
     
     # Parámetros configurables
     with st.form("config_reproceso"):
@@ -279,8 +738,9 @@ def mostrar_configuracion_avanzada(despliegue_id):
                 ["IQR Automático", "2σ", "3σ", "Personalizado"]
             )
             
+            sigma_personalizado = 3.0
             if umbral_outliers == "Personalizado":
-                st.number_input("Valor personalizado (σ)", min_value=1.0, max_value=5.0, value=3.0)
+                sigma_personalizado = st.number_input("Valor personalizado (σ)", min_value=1.0, max_value=5.0, value=3.0)
         
         with col2:
             freq_resample = st.selectbox(
@@ -303,18 +763,190 @@ def mostrar_configuracion_avanzada(despliegue_id):
             cargar_default = st.form_submit_button("↩️ Cargar valores por defecto")
         
         if reprocesar:
-            st.success(f"Reprocesando despliegue {despliegue_id} con nueva configuración...")
-            # Llamar al pipeline con nueva configuración
+            config = ConfigProceso.desde_formulario(
+                metodo_imputacion, umbral_outliers, freq_resample,
+                tratamiento_gaps, sigma_personalizado
+            )
+            desde, hasta = obtener_rango_fechas(despliegue_id)
+            trabajo_id = get_planificador().enviar(
+                f"Reprocesar despliegue {despliegue_id} con nueva configuración",
+                reprocesar_despliegue,
+                get_api_client(), get_series_store(), despliegue_id,
+                obtener_variables_despliegue(despliegue_id), config, desde, hasta,
+                prioridad=PRIORIDAD_ALTA,
+            )
+            registrar_trabajo(trabajo_id)
+            st.session_state.setdefault('reprocesos', {})[despliegue_id] = trabajo_id
+            st.info("Reprocesamiento en cola; el avance se muestra arriba.")
+    
+    # Resumen del último reprocesamiento
+    trabajo_id = st.session_state.get('reprocesos', {}).get(despliegue_id)
+    trabajo = get_planificador().estado(trabajo_id) if trabajo_id else None
+    if trabajo is not None and trabajo.resultado is not None:
+        st.dataframe(
+            pd.DataFrame({var: asdict(r) for var, r in trabajo.resultado.items()}).T,
+            use_container_width=True
+        )
+        st.caption(f"Series reprocesadas guardadas en el almacén local (tabla `{TABLA_REPROCESADOS}`)")
+
+def mostrar_vivo(despliegue_id, variables):
+    """Gráfico de las últimas mediciones, alimentado por una suscripción en vivo"""
+    st.subheader("🔴 En vivo")
+    if not variables:
+        st.warning("Selecciona al menos una variable para visualizar")
+        return
+    
+    clave = (despliegue_id, tuple(variables))
+    actual = st.session_state.get('vivo')
+    if actual is None or actual[0] != clave or not actual[1].activa:
+        detener_vivo()
+        client = get_api_client()
+        if FUENTE_VIVO == "simulada":
+            fuente = FuenteSimulada(variables)
+        else:
+            fuente = FuenteSSE(client, despliegue_id, variables)
+        suscripcion = SuscripcionVivo(fuente, variables).iniciar(
+            historico_reciente(client, despliegue_id, variables)
+        )
+        st.session_state['vivo'] = (clave, suscripcion)
+    
+    dibujar_vivo()
+    # Sin fragmentos, el navegador relanza la página completa cada intervalo
+    if not HAY_FRAGMENTOS and not rerun_periodico(INTERVALO_VIVO_S, "vivo_refresco"):
+        st.caption("Instala streamlit-autorefresh para actualizar el gráfico solo.")
+        st.button("🔄 Actualizar", key="vivo_actualizar")
+
+@fragmento(run_every=INTERVALO_VIVO_S)
+@medido("grafico_segundos", grafico="vivo")
+def dibujar_vivo():
+    """Redibuja solo este gráfico; su coste depende del tamaño de los buffers"""
+    actual = st.session_state.get('vivo')
+    if actual is None:
+        return
+    suscripcion = actual[1]
+    datos = suscripcion.datos()
+    if suscripcion.error:
+        st.warning(f"Reconectando con el backend: {suscripcion.error}")
+    
+    fig = go.Figure()
+    ultimo = None
+    for var, serie in datos.items():
+        if not len(serie['timestamp']):
+            continue
+        indices = reducir_serie(serie['timestamp'], serie['valor'], ANCHO_GRAFICO_PX,
+                                serie['calidad'])
+        fig.add_trace(traza(
+            serie['timestamp'][indices].view('datetime64[ns]'),
+            serie['valor'][indices],
+            name=var
+        ))
+        ultimo = max(ultimo or 0, int(serie['timestamp'][-1]))
+    
+    fig.update_layout(
+        xaxis_title="Fecha/Hora",
+        yaxis_title="Valor",
+        hovermode="x unified",
+        height=450,
+        uirevision="vivo"  # conserva el zoom del usuario entre actualizaciones
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    if ultimo is not None:
+        st.caption(f"Último dato: {pd.Timestamp(ultimo):%Y-%m-%d %H:%M:%S}")
+    else:
+        st.caption("Esperando datos...")
+
+def detener_vivo():
+    actual = st.session_state.pop('vivo', None)
+    if actual is not None:
+        actual[1].detener()
+
+def iterar_series(despliegue_id, pares, rango_fechas):
+    """Produce ((variable, tabla), DataFrame) a medida que llegan los datos.
+
+    Si una descarga falla se muestra el error y se produce None en lugar
+    del DataFrame.
+
+    Lo que ya está en la caché de rangos se sirve de memoria. Si a todas las
+    series les falta el mismo tramo, se pide con una única petición agrupada;
+    si no (o el backend no la soporta), se lanzan las peticiones individuales
+    a la vez en el pool compartido, descargando solo los tramos que faltan.
+    """
+    client = get_api_client()
+    cache = get_series_cache()
+    desde, hasta = rango_fechas
+    
+    pendientes = []
+    for var, tabla in pares:
+        datos = cache.leer((despliegue_id, var, tabla), desde, hasta)
+        if datos is None:
+            pendientes.append((var, tabla))
+        else:
+            yield (var, tabla), arrays_a_dataframe([datos])
+    if not pendientes:
+        return
+    
+    faltan = {tuple(cache.faltantes((despliegue_id, *p), desde, hasta)) for p in pendientes}
+    if len(faltan) == 1 and len(next(iter(faltan))) == 1:
+        (tramo_desde, tramo_hasta), = next(iter(faltan))
+        try:
+            series = client.get_trend_batch(
+                despliegue_id,
+                sorted({var for var, _ in pendientes}),
+                sorted({tabla for _, tabla in pendientes}),
+                ts_from=tramo_desde, ts_to=tramo_hasta,
+                timeout=TIMEOUT_PETICION
+            )
+        except requests.RequestException:
+            # Falló la paginación de alguna serie truncada: peticiones individuales
+            series = None
+        if series is not None:
+            for var, tabla in pendientes:
+                bloque = dataframe_a_arrays(series[(var, tabla)])
+                datos = cache.obtener(
+                    (despliegue_id, var, tabla), desde, hasta,
+                    lambda d, h, bloque=bloque: [bloque]
+                )
+                yield (var, tabla), arrays_a_dataframe([datos])
+            return
+    
+    tareas = {
+        (var, tabla): partial(
+            obtener_serie, client, cache, despliegue_id, var, tabla, rango_fechas
+        )
+        for var, tabla in pendientes
+    }
+    for clave, datos, error in en_paralelo(tareas, timeout=TIMEOUT_PETICION):
+        if error is not None:
+            st.error(f"Error obteniendo {clave[0]} ({clave[1]}): {error}")
+            datos = None
+        yield clave, datos
+
+def obtener_serie(client, cache, despliegue_id, variable, tabla, rango_fechas):
+    """Obtiene una serie a través de la caché, descargando solo lo que falta"""
+    fetch = partial(
+        client.iter_trend_pages, despliegue_id, variable,
+        tabla=tabla, timeout=TIMEOUT_PETICION
+    )
+    datos = cache.obtener(
+        (despliegue_id, variable, tabla), rango_fechas[0], rango_fechas[1], fetch
+    )
+    return arrays_a_dataframe([datos])
 
 def obtener_datos_crudos(despliegue_id, variable, rango_fechas):
-    """Obtiene datos crudos de la API"""
-    # TODO: Implementar usando API de Marcelo
-    return None
+    """Obtiene datos crudos (desde la caché o la API)"""
+    return obtener_serie(
+        get_api_client(), get_series_cache(),
+        despliegue_id, variable, TABLA_CRUDOS, rango_fechas
+    )
 
 def obtener_datos_procesados(despliegue_id, variable, rango_fechas):
-    """Obtiene datos procesados de la API"""
-    # TODO: Implementar usando API de Marcelo
-    return None
+    """Obtiene datos procesados (desde la caché o la API)"""
+    return obtener_serie(
+        get_api_client(), get_series_cache(),
+        despliegue_id, variable, TABLA_PROCESADOS, rango_fechas
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    iniciar_exportadores()
+    with medir("rerun_segundos", pagina="despliegue"):
+        main()
\ No newline at end of file
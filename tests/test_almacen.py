@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from utils.almacen import AlmacenSeries
+
+
+def bloques(n, tamano):
+    for inicio in range(0, n, tamano):
+        ts = np.arange(inicio, min(n, inicio + tamano), dtype=np.int64) * 1000
+        yield {"timestamp": ts, "valor": ts / 1000.0, "calidad": (ts % 7 == 0).astype(np.int8)}
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenSeries(str(tmp_path))
+
+
+def test_escribir_y_leer_rango(almacen):
+    assert almacen.escribir(1, "temperatura", "crudos", bloques(10_000, 3000)) == 10_000
+
+    serie = almacen.leer_rango(1, "temperatura", "crudos", 2000 * 1000, 2999 * 1000)
+
+    assert len(serie["timestamp"]) == 1000
+    assert serie["timestamp"][0] == 2000 * 1000
+    assert serie["valor"].dtype == np.float32
+    np.testing.assert_array_equal(serie["valor"], np.arange(2000, 3000, dtype=np.float32))
+    assert almacen.extension(1, "temperatura", "crudos") == (0, 9999 * 1000, 10_000)
+
+
+def test_leer_rango_desc_con_limite(almacen):
+    almacen.escribir(1, "temperatura", "crudos", bloques(100, 100))
+
+    serie = almacen.leer_rango(1, "temperatura", "crudos", ts_to=49 * 1000, limite=5, orden="desc")
+
+    np.testing.assert_array_equal(serie["timestamp"], np.arange(49, 44, -1) * 1000)
+
+
+def test_iter_rango_en_bloques_float64(almacen):
+    almacen.escribir(1, "temperatura", "crudos", bloques(1000, 1000))
+
+    partes = list(almacen.iter_rango(1, "temperatura", "crudos", tamano=300))
+
+    assert [len(p["timestamp"]) for p in partes] == [300, 300, 300, 100]
+    assert all(p["valor"].dtype == np.float64 for p in partes)
+    np.testing.assert_array_equal(np.concatenate([p["valor"] for p in partes]), np.arange(1000))
+
+
+def test_serie_inexistente(almacen):
+    assert almacen.leer_rango(1, "temperatura", "crudos") is None
+    assert almacen.extension(1, "temperatura", "crudos") is None
+    assert list(almacen.iter_rango(1, "temperatura", "crudos")) == []
+
+
+def test_reescribir_cambia_version_y_conserva_lectores(almacen):
+    almacen.escribir(1, "temperatura", "crudos", bloques(100, 100))
+    version = almacen.version(1, "temperatura", "crudos")
+    antigua = almacen.abrir(1, "temperatura", "crudos")
+
+    almacen.escribir(1, "temperatura", "crudos", bloques(50, 50))
+
+    assert almacen.version(1, "temperatura", "crudos") != version
+    assert len(antigua["timestamp"]) == 100
+    assert len(almacen.abrir(1, "temperatura", "crudos")["timestamp"]) == 50
+
+
+def test_escritura_con_error_no_publica(almacen):
+    almacen.escribir(1, "temperatura", "crudos", bloques(100, 100))
+
+    with pytest.raises(RuntimeError):
+        with almacen.escritura(1, "temperatura", "crudos") as escritura:
+            escritura.agregar(next(bloques(10, 10)))
+            raise RuntimeError("corte de red")
+
+    assert almacen.extension(1, "temperatura", "crudos")[2] == 100
+    assert [p.name for p in almacen._ruta(1, "temperatura", "crudos").parent.iterdir()] == [
+        "temperatura.srm"
+    ]
+
+
+def test_bloques_desordenados_se_rechazan(almacen):
+    desordenados = [next(bloques(10, 10)), next(bloques(5, 5))]
+    with pytest.raises(ValueError):
+        almacen.escribir(1, "temperatura", "crudos", desordenados)
+    assert not almacen.existe(1, "temperatura", "crudos")
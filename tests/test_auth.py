@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+
+import pytest
+
+from utils import auth
+
+
+class CursorFalso:
+    def __init__(self, filas):
+        self.filas = filas
+        self.consultas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.consultas.append((sql, params))
+
+    def fetchone(self):
+        return self.filas.get(self.consultas[-1][1][0])
+
+
+class ConexionFalsa:
+    def __init__(self, filas):
+        self.cursor_ = CursorFalso(filas)
+
+    def cursor(self, cursor_factory=None):
+        return self.cursor_
+
+
+@pytest.fixture
+def conexion(monkeypatch):
+    conexion = ConexionFalsa({
+        "ana@example.com": {
+            "id_usuario": 7, "nombre": "Ana", "correo": "ana@example.com",
+            "rol": "admin", "contrasena": "secreta",
+        }
+    })
+
+    @contextmanager
+    def db_connection():
+        yield conexion
+
+    monkeypatch.setattr(auth, "db_connection", db_connection)
+    # Sin bcrypt no se intenta migrar la contraseña en texto plano
+    monkeypatch.setattr(auth, "bcrypt", None)
+    return conexion
+
+
+def test_authenticate_correcto(conexion):
+    ok, usuario, mensaje = auth.authenticate(" Ana@Example.com ", "secreta")
+
+    assert ok, mensaje
+    assert usuario == auth.AuthUser(id_usuario=7, nombre="Ana", correo="ana@example.com", rol="admin")
+    assert conexion.cursor_.consultas[0][1] == ("ana@example.com",)
+
+
+@pytest.mark.parametrize("correo, contrasena", [
+    ("ana@example.com", "otra"),
+    ("nadie@example.com", "secreta"),
+])
+def test_authenticate_credenciales_incorrectas(conexion, correo, contrasena):
+    assert auth.authenticate(correo, contrasena) == (False, None, "Usuario o contraseña incorrectos.")
+
+
+def test_authenticate_sin_datos():
+    assert auth.authenticate("", "x") == (False, None, "Ingresa correo y contraseña.")
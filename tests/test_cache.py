@@ -0,0 +1,124 @@
+from datetime import datetime
+
+import numpy as np
+
+from utils.cache import CacheSeries
+
+HORA = 3600 * 10**9
+CLAVE = (1, "temperatura", "crudos")
+INICIO = datetime(2024, 1, 1)
+
+
+def serie(desde, hasta, paso=60 * 10**9):
+    ts = np.arange(desde, hasta, paso, dtype=np.int64)
+    return {"timestamp": ts, "valor": ts.astype(np.float64), "calidad": np.zeros(len(ts), dtype=np.int8)}
+
+
+class Backend:
+    """``fetch`` que registra los rangos pedidos."""
+
+    def __init__(self):
+        self.pedidos = []
+
+    def __call__(self, desde, hasta):
+        self.pedidos.append((desde, hasta))
+        inicio = np.datetime64(desde, "ns").astype(np.int64)
+        fin = np.datetime64(hasta, "ns").astype(np.int64)
+        yield serie(inicio, fin)
+
+
+def ns(dt):
+    return int(np.datetime64(dt, "ns").astype(np.int64))
+
+
+def test_segunda_lectura_es_acierto_sin_red():
+    cache = CacheSeries(tam_bucket_s=3600)
+    backend = Backend()
+    desde, hasta = INICIO, datetime(2024, 1, 1, 3)
+
+    primero = cache.obtener(CLAVE, desde, hasta, backend)
+    segundo = cache.obtener(CLAVE, desde, hasta, backend)
+
+    assert len(backend.pedidos) == 1
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+    np.testing.assert_array_equal(primero["timestamp"], segundo["timestamp"])
+    assert primero["timestamp"][0] == ns(desde)
+    assert primero["timestamp"][-1] == ns(hasta)
+
+
+def test_solo_descarga_los_buckets_que_faltan():
+    cache = CacheSeries(tam_bucket_s=3600)
+    backend = Backend()
+    cache.obtener(CLAVE, datetime(2024, 1, 1, 1), datetime(2024, 1, 1, 1, 30), backend)
+    backend.pedidos.clear()
+
+    datos = cache.obtener(CLAVE, INICIO, datetime(2024, 1, 1, 3, 30), backend)
+
+    assert backend.pedidos == [
+        (datetime(2024, 1, 1, 0), datetime(2024, 1, 1, 1)),
+        (datetime(2024, 1, 1, 2), datetime(2024, 1, 1, 4)),
+    ]
+    assert len(datos["timestamp"]) == 3 * 60 + 30 + 1
+    assert np.all(np.diff(datos["timestamp"]) > 0)
+
+
+def test_faltantes_agrupa_buckets_contiguos():
+    cache = CacheSeries(tam_bucket_s=3600)
+    cache.insertar(CLAVE, datetime(2024, 1, 1, 2), datetime(2024, 1, 1, 3),
+                   serie(ns(INICIO) + 2 * HORA, ns(INICIO) + 3 * HORA))
+
+    assert cache.faltantes(CLAVE, INICIO, datetime(2024, 1, 1, 4, 30)) == [
+        (datetime(2024, 1, 1, 0), datetime(2024, 1, 1, 2)),
+        (datetime(2024, 1, 1, 3), datetime(2024, 1, 1, 5)),
+    ]
+
+
+def test_no_guarda_buckets_que_terminan_en_el_futuro():
+    cache = CacheSeries(tam_bucket_s=3600)
+    backend = Backend()
+    ahora = datetime.now()
+    cache.obtener(CLAVE, ahora.replace(minute=0, second=0, microsecond=0), ahora, backend)
+
+    assert cache.leer(CLAVE, ahora, ahora) is None
+
+
+def test_expulsa_lo_menos_usado_al_superar_el_limite():
+    cache = CacheSeries(tam_bucket_s=3600, max_bytes=2 * 60 * 17)
+    backend = Backend()
+    cache.obtener(CLAVE, INICIO, datetime(2024, 1, 1, 2, 59), backend)
+
+    assert cache.bytes_usados <= cache.max_bytes
+    assert cache.leer(CLAVE, INICIO, datetime(2024, 1, 1, 0, 59)) is None
+    assert cache.leer(CLAVE, datetime(2024, 1, 1, 2), datetime(2024, 1, 1, 2, 59)) is not None
+
+
+def test_rellena_buckets_expulsados_durante_la_lectura():
+    cache = CacheSeries(tam_bucket_s=3600)
+    cache.insertar(CLAVE, INICIO, datetime(2024, 1, 1, 1), serie(ns(INICIO), ns(INICIO) + HORA))
+    backend = Backend()
+
+    def fetch(desde, hasta):
+        # Mientras se descarga lo que falta, otro hilo expulsa el bucket en caché
+        cache.invalidar(1)
+        return backend(desde, hasta)
+
+    datos = cache.obtener(CLAVE, INICIO, datetime(2024, 1, 1, 3, 59), fetch)
+
+    assert backend.pedidos == [
+        (datetime(2024, 1, 1, 1), datetime(2024, 1, 1, 4)),
+        (datetime(2024, 1, 1, 0), datetime(2024, 1, 1, 1)),
+    ]
+    assert len(datos["timestamp"]) == 4 * 60
+    np.testing.assert_array_equal(np.diff(datos["timestamp"]), 60 * 10**9)
+
+
+def test_invalidar_descarta_solo_el_despliegue():
+    cache = CacheSeries(tam_bucket_s=3600)
+    otra = (2, "temperatura", "crudos")
+    for clave in (CLAVE, otra):
+        cache.obtener(clave, INICIO, datetime(2024, 1, 1, 0, 30), Backend())
+
+    cache.invalidar(1)
+
+    assert cache.leer(CLAVE, INICIO, datetime(2024, 1, 1, 0, 30)) is None
+    assert cache.leer(otra, INICIO, datetime(2024, 1, 1, 0, 30)) is not None
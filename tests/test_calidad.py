@@ -0,0 +1,86 @@
+import numpy as np
+
+from utils.calidad import (
+    FALTANTE,
+    IMPOSIBLE,
+    OUTLIER,
+    VALIDO,
+    AnalizadorCalidad,
+    EstadisticasCalidad,
+    clasificar,
+    detectar_gaps,
+    paso_nominal,
+)
+
+
+def senal(n=5000, semilla=0):
+    return 20.0 + np.random.default_rng(semilla).normal(scale=0.5, size=n)
+
+
+def test_clasificar_marca_faltantes_imposibles_y_outliers():
+    valor = senal()
+    valor[100] = np.nan
+    valor[200] = 900.0   # fuera de los límites físicos de temperatura
+    valor[300] = 35.0    # dentro de límites, pero lejos de la dispersión local
+
+    calidad = clasificar(valor, "temperatura")
+
+    assert calidad.dtype == np.int8
+    assert calidad[100] == FALTANTE
+    assert calidad[200] == IMPOSIBLE
+    assert calidad[300] == OUTLIER
+    assert np.mean(calidad == VALIDO) > 0.95
+
+
+def test_clasificar_sigma():
+    valor = senal()
+    valor[2500] = 35.0
+    calidad = clasificar(valor, "temperatura", metodo="sigma")
+    assert calidad[2500] == OUTLIER
+    assert np.count_nonzero(calidad == OUTLIER) < 50
+
+
+def test_variable_sin_limites_no_tiene_imposibles():
+    valor = senal()
+    valor[10] = 1e9
+    calidad = clasificar(valor, "desconocida")
+    assert not np.any(calidad == IMPOSIBLE)
+    assert calidad[10] == OUTLIER
+
+
+def test_paso_nominal_y_gaps():
+    ts = np.arange(0, 1000, 10, dtype=np.int64)
+    ts = np.concatenate([ts[:50], ts[50:] + 500])
+
+    assert paso_nominal(ts) == 10
+    np.testing.assert_array_equal(detectar_gaps(ts), [50])
+    assert paso_nominal(ts[:1]) is None
+    assert len(detectar_gaps(ts[:1])) == 0
+
+
+def test_analizador_por_bloques_coincide_con_una_pasada():
+    n = 6000
+    ts = np.arange(n, dtype=np.int64) * 10
+    ts[4000:] += 1000  # gap justo en el borde entre bloques
+    valor = senal(n)
+    valor[[123, 3999, 4000]] = [35.0, np.nan, 900.0]
+
+    analizador = AnalizadorCalidad("temperatura")
+    for inicio in range(0, n, 2000):
+        analizador.procesar(ts[inicio:inicio + 2000], valor[inicio:inicio + 2000])
+    estadisticas = analizador.estadisticas
+
+    assert analizador.paso == 10
+    assert estadisticas.total_puntos == n
+    assert estadisticas.gaps == 1
+    assert estadisticas.faltantes == 1
+    assert estadisticas.imposibles == 1
+    assert estadisticas.outliers >= 1
+
+
+def test_estadisticas_se_suman():
+    a = EstadisticasCalidad.desde_codigos(np.array([0, 0, 1, 2], dtype=np.int8), gaps=1)
+    b = EstadisticasCalidad.desde_codigos(np.array([3, 0], dtype=np.int8))
+    total = a + b
+    assert (total.total_puntos, total.validos, total.faltantes, total.outliers,
+            total.imposibles, total.gaps) == (6, 3, 1, 1, 1, 1)
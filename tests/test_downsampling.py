@@ -0,0 +1,69 @@
+import numpy as np
+
+from utils.downsampling import lttb_indices, minmax_indices, recortar_ventana, reducir_serie
+
+
+def test_recortar_ventana_incluye_extremos():
+    x = np.arange(0, 100, 10)
+    assert recortar_ventana(x, 20, 50) == slice(2, 6)
+    assert recortar_ventana(x, None, None) == slice(0, 10)
+
+
+def test_recortar_ventana_con_datetime64():
+    x = np.arange("2024-01-01", "2024-01-11", dtype="datetime64[D]")
+    ventana = recortar_ventana(x, np.datetime64("2024-01-03"), np.datetime64("2024-01-05"))
+    assert list(x[ventana].astype(str)) == ["2024-01-03", "2024-01-04", "2024-01-05"]
+
+
+def test_minmax_conserva_extremos_de_cada_bucket():
+    y = np.zeros(1000)
+    y[123] = 50.0
+    y[877] = -50.0
+    y[500] = np.nan
+
+    indices = minmax_indices(y, 10)
+
+    assert 123 in indices and 877 in indices
+    assert 500 not in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_minmax_serie_corta_se_devuelve_entera():
+    np.testing.assert_array_equal(minmax_indices(np.arange(6.0), 3), np.arange(6))
+
+
+def test_lttb_conserva_bordes_y_tamano():
+    x = np.arange(10_000)
+    y = np.sin(x / 100.0)
+
+    indices = lttb_indices(x, y, 200)
+
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_elige_el_pico():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[437] = 10.0
+    assert 437 in lttb_indices(x, y, 20)
+
+
+def test_reducir_serie_respeta_ancho_y_conserva_anomalos():
+    n = 100_000
+    x = np.arange(n, dtype=np.int64)
+    y = np.random.default_rng(0).normal(size=n)
+    y[54_321] = 40.0
+    calidad = np.zeros(n, dtype=np.int8)
+    calidad[[10, 20_000, 99_000]] = 2
+
+    indices = reducir_serie(x, y, ancho_px=500, calidad=calidad)
+
+    assert len(indices) <= 500 + 3
+    assert 54_321 in indices
+    assert {10, 20_000, 99_000} <= set(indices.tolist())
+
+
+def test_reducir_serie_corta_no_reduce():
+    np.testing.assert_array_equal(reducir_serie(np.arange(50), np.ones(50), ancho_px=100), np.arange(50))
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from utils.api_client import TABLA_CRUDOS, TABLA_PROCESADOS
+from utils.paginacion import leer_pagina, nombre_columna
+
+
+class ClienteKeyset:
+    """Sirve ``get_trend_page`` en memoria como lo haría el backend."""
+
+    def __init__(self, series):
+        self.series = {
+            variable: {
+                "timestamp": np.asarray(ts, dtype=np.int64),
+                "valor": np.arange(len(ts), dtype=np.float64),
+                "calidad": np.zeros(len(ts), dtype=np.int8),
+            }
+            for variable, ts in series.items()
+        }
+
+    def get_trend_page(self, despliegue_id, variable, tabla, ts_from, ts_to,
+                       despues_de, orden, calidad, page_size, timeout):
+        serie = self.series[variable]
+        ts = serie["timestamp"]
+        if orden == "desc":
+            indices = np.flatnonzero(ts < despues_de) if despues_de is not None else np.arange(len(ts))
+            indices = indices[::-1]
+        else:
+            indices = np.flatnonzero(ts > despues_de) if despues_de is not None else np.arange(len(ts))
+        tomados = indices[:page_size]
+        chunk = {c: v[tomados] for c, v in serie.items()}
+        return chunk, len(indices) > page_size
+
+
+def recorrer(client, variables, filas, orden="asc"):
+    pares = [(v, TABLA_CRUDOS) for v in variables]
+    paginas, despues_de = [], None
+    while True:
+        pagina = leer_pagina(client, 1, pares, (None, None), despues_de, orden, filas=filas)
+        paginas.append(pagina.datos)
+        if pagina.siguiente is None:
+            return paginas
+        despues_de = pagina.siguiente
+
+
+@pytest.mark.parametrize("orden", ["asc", "desc"])
+@pytest.mark.parametrize("filas", [7, 500])
+def test_series_disjuntas_no_pierden_filas(orden, filas):
+    client = ClienteKeyset({"a": range(0, 800, 2), "b": range(1, 800, 2)})
+    paginas = recorrer(client, ["a", "b"], filas, orden)
+
+    indice = np.concatenate([p.index.asi8 for p in paginas])
+    assert len(indice) == 800
+    assert len(np.unique(indice)) == 800
+    esperado = np.arange(800) if orden == "asc" else np.arange(799, -1, -1)
+    np.testing.assert_array_equal(indice, esperado)
+    assert all(len(p) <= filas for p in paginas)
+
+
+def test_timestamps_repetidos_no_se_parten_entre_paginas():
+    ts = np.repeat(np.arange(100), 3)
+    client = ClienteKeyset({"a": ts})
+    paginas = recorrer(client, ["a"], filas=10)
+
+    assert sum(len(p) for p in paginas) == 300
+    for anterior, siguiente in zip(paginas, paginas[1:]):
+        assert anterior.index.asi8[-1] < siguiente.index.asi8[0]
+
+
+def test_series_alineadas_comparten_fila():
+    client = ClienteKeyset({"a": range(10), "b": range(10)})
+    pagina = leer_pagina(client, 1, [("a", TABLA_CRUDOS), ("b", TABLA_PROCESADOS)], (None, None))
+
+    assert len(pagina.datos) == 10
+    assert pagina.siguiente is None
+    procesado = nombre_columna("b", TABLA_PROCESADOS)
+    assert set(pagina.datos.columns) == {
+        "a", "a · calidad", procesado, f"{procesado} · calidad",
+    }
+
+
+def test_sin_series_devuelve_pagina_vacia():
+    pagina = leer_pagina(ClienteKeyset({}), 1, [], (None, None))
+    assert pagina.datos.empty
+    assert pagina.siguiente is None
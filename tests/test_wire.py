@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from utils import wire
+
+
+def serie(n=1000):
+    return {
+        "timestamp": np.arange(n, dtype=np.int64) * 10**9,
+        "valor": np.linspace(0.0, 1.0, n),
+        "calidad": (np.arange(n) % 4).astype(np.int8),
+    }
+
+
+class Respuesta:
+    def __init__(self, tipo, contenido):
+        self.headers = {"Content-Type": tipo}
+        self.content = contenido
+
+
+def comprobar_igual(decodificada, original):
+    for columna, valores in original.items():
+        assert decodificada[columna].dtype == valores.dtype
+        np.testing.assert_array_equal(decodificada[columna], valores)
+
+
+def test_numpy_ida_y_vuelta():
+    original = serie()
+    comprobar_igual(wire.decodificar_numpy(wire.codificar_numpy(original)), original)
+
+
+def test_numpy_serie_vacia():
+    decodificada = wire.decodificar_numpy(wire.codificar_numpy(serie(0)))
+    assert all(len(v) == 0 for v in decodificada.values())
+
+
+def test_numpy_rechaza_cabecera_desconocida():
+    with pytest.raises(ValueError):
+        wire.decodificar_numpy(b"XXXX" + wire.codificar_numpy(serie())[4:])
+
+
+def test_arrow_ida_y_vuelta():
+    pytest.importorskip("pyarrow")
+    original = serie()
+    comprobar_igual(wire.decodificar_arrow(wire.codificar_arrow(original)), original)
+
+
+def test_decodificar_respuesta_segun_content_type():
+    original = serie(10)
+    binaria = Respuesta(f"{wire.FORMATO_NUMPY}; charset=binary", wire.codificar_numpy(original))
+    comprobar_igual(wire.decodificar_respuesta(binaria), original)
+    assert wire.decodificar_respuesta(Respuesta("application/json", b"[]")) is None
+
+
+def test_cabecera_accept_prefiere_binario():
+    accept = wire.cabecera_accept()
+    assert wire.FORMATO_NUMPY in accept
+    assert accept.endswith(f"{wire.FORMATO_JSON};q=0.1")
@@ -0,0 +1,267 @@
+"""Almacén de series en disco leído con ``numpy.memmap``.
+
+Cada serie (despliegue, variable, tabla) es un fichero columnar inmutable::
+
+    b"SRM1" | 4 bytes de relleno | n: uint64
+    timestamp: int64[n] (ns desde epoch, ordenados)
+    valor: float32[n]
+    calidad: int8[n]
+
+El fichero se proyecta en memoria sin leerlo y un rango ``[ts_from, ts_to]``
+se resuelve con dos búsquedas binarias sobre ``timestamp``: el resultado son
+vistas sobre la proyección, así que la consulta cuesta microsegundos sea
+cual sea el tamaño del fichero y solo se leen de disco las páginas que el
+llamador toque después. Los valores son float32 (la mitad de espacio que en
+memoria); quien necesite float64 convierte solo el rango leído.
+
+Las series se escriben en streaming desde bloques ordenados (p. ej.
+``iter_trend_pages``) y se publican con un ``os.replace`` atómico; los
+lectores que tuvieran abierta la versión anterior la siguen viendo entera.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+Arrays = Dict[str, np.ndarray]
+
+_MAGIA = b"SRM1"
+_CABECERA = struct.Struct("<4s4xQ")
+_COLUMNAS = (("timestamp", np.dtype("<i8")), ("valor", np.dtype("<f4")),
+             ("calidad", np.dtype("i1")))
+
+
+def _a_ns(valor) -> int:
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    return int(pd.Timestamp(valor).as_unit("ns").value)
+
+
+def _vacio() -> Arrays:
+    return {nombre: np.empty(0, dtype=dtype) for nombre, dtype in _COLUMNAS}
+
+
+def _proyectar(ruta: Path) -> Arrays:
+    """Vistas de solo lectura sobre cada columna del fichero."""
+    with open(ruta, "rb") as fichero:
+        magia, n = _CABECERA.unpack(fichero.read(_CABECERA.size))
+    if magia != _MAGIA:
+        raise ValueError(f"{ruta} no es una serie del almacén")
+    if not n:
+        return _vacio()
+    mapa = np.memmap(ruta, dtype=np.uint8, mode="r")
+    columnas = {}
+    inicio = _CABECERA.size
+    for nombre, dtype in _COLUMNAS:
+        columnas[nombre] = mapa[inicio:inicio + n * dtype.itemsize].view(dtype)
+        inicio += n * dtype.itemsize
+    return columnas
+
+
+class AlmacenSeries:
+    """Series completas en ``SERIES_DIR``: ``<dir>/<despliegue>/<tabla>/<variable>.srm``."""
+
+    def __init__(self, directorio: Optional[str] = None):
+        self.directorio = Path(directorio or os.getenv("SERIES_DIR", ".series"))
+        # Proyecciones abiertas, con la identidad del fichero al abrirlas
+        self._abiertas: Dict[tuple, Tuple[tuple, Arrays]] = {}
+        self._lock = threading.Lock()
+
+    def _ruta(self, despliegue_id: Hashable, variable: str, tabla: str) -> Path:
+        return self.directorio / str(despliegue_id) / tabla / f"{variable}.srm"
+
+    def existe(self, despliegue_id: Hashable, variable: str, tabla: str) -> bool:
+        return self._ruta(despliegue_id, variable, tabla).exists()
+
+    def escribir(self, despliegue_id: Hashable, variable: str, tabla: str,
+                 bloques: Iterable[Arrays]) -> int:
+        """Guarda la serie formada por ``bloques`` (ordenados); devuelve los puntos."""
+        with self.escritura(despliegue_id, variable, tabla) as escritura:
+            for bloque in bloques:
+                escritura.agregar(bloque)
+        return escritura.n
+
+    def escritura(self, despliegue_id: Hashable, variable: str, tabla: str) -> "EscrituraSerie":
+        """Escritura incremental de una serie (ver ``EscrituraSerie``)."""
+        return EscrituraSerie(self, despliegue_id, variable, tabla)
+
+    def _olvidar(self, despliegue_id: Hashable, variable: str, tabla: str) -> None:
+        with self._lock:
+            self._abiertas.pop((despliegue_id, variable, tabla), None)
+
+    def abrir(self, despliegue_id: Hashable, variable: str, tabla: str) -> Optional[Arrays]:
+        """Serie completa como vistas sobre el fichero, o None si no existe."""
+        clave = (despliegue_id, variable, tabla)
+        ruta = self._ruta(despliegue_id, variable, tabla)
+        try:
+            estado = ruta.stat()
+        except FileNotFoundError:
+            return None
+        # ``escribir`` publica con os.replace: un fichero nuevo cambia de inodo
+        version = (estado.st_ino, estado.st_mtime_ns)
+        with self._lock:
+            abierta = self._abiertas.get(clave)
+        if abierta is not None and abierta[0] == version:
+            return abierta[1]
+        columnas = _proyectar(ruta)
+        with self._lock:
+            self._abiertas[clave] = (version, columnas)
+        return columnas
+
+    def leer_rango(self, despliegue_id: Hashable, variable: str, tabla: str,
+                   ts_from=None, ts_to=None, limite: Optional[int] = None,
+                   orden: str = "asc") -> Optional[Arrays]:
+        """Puntos de [ts_from, ts_to] (extremos incluidos) sin copiar.
+
+        Con ``orden="desc"`` las vistas van del más reciente al más antiguo y
+        ``limite`` se aplica desde ese extremo. None si la serie no existe.
+        """
+        serie = self.abrir(despliegue_id, variable, tabla)
+        if serie is None:
+            return None
+        ts = serie["timestamp"]
+        i = 0 if ts_from is None else int(np.searchsorted(ts, _a_ns(ts_from), side="left"))
+        j = len(ts) if ts_to is None else int(np.searchsorted(ts, _a_ns(ts_to), side="right"))
+        if limite is not None:
+            if orden == "desc":
+                i = max(i, j - limite)
+            else:
+                j = min(j, i + limite)
+        paso = -1 if orden == "desc" else 1
+        return {nombre: columna[i:j][::paso] for nombre, columna in serie.items()}
+
+    def iter_rango(self, despliegue_id: Hashable, variable: str, tabla: str,
+                   ts_from=None, ts_to=None, tamano: int = 200_000) -> Iterator[Arrays]:
+        """Puntos de [ts_from, ts_to] en bloques de ``tamano``, con valores float64.
+
+        Mismo formato que ``APIClient.iter_trend_pages``; solo se copian de
+        disco los puntos del bloque en curso.
+        """
+        serie = self.leer_rango(despliegue_id, variable, tabla, ts_from, ts_to)
+        if serie is None:
+            return
+        for inicio in range(0, len(serie["timestamp"]), tamano):
+            bloque = {c: np.array(v[inicio:inicio + tamano]) for c, v in serie.items()}
+            bloque["valor"] = bloque["valor"].astype(np.float64)
+            yield bloque
+
+    def version(self, despliegue_id: Hashable, variable: str, tabla: str) -> Optional[tuple]:
+        """Identidad del fichero de la serie; cambia cada vez que se reescribe."""
+        try:
+            estado = self._ruta(despliegue_id, variable, tabla).stat()
+        except FileNotFoundError:
+            return None
+        return estado.st_ino, estado.st_mtime_ns
+
+    def extension(self, despliegue_id: Hashable, variable: str, tabla: str
+                  ) -> Optional[Tuple[int, int, int]]:
+        """(primer timestamp, último timestamp, puntos), o None si no hay datos."""
+        serie = self.abrir(despliegue_id, variable, tabla)
+        if serie is None or not len(serie["timestamp"]):
+            return None
+        ts = serie["timestamp"]
+        return int(ts[0]), int(ts[-1]), len(ts)
+
+    def invalidar(self, despliegue_id: Hashable) -> None:
+        """Olvida las proyecciones abiertas (los ficheros no se tocan)."""
+        with self._lock:
+            for clave in [c for c in self._abiertas if c[0] == despliegue_id]:
+                del self._abiertas[clave]
+
+
+class EscrituraSerie:
+    """Serie que se escribe bloque a bloque y se publica al cerrarla.
+
+    Cada columna se vuelca a su propio temporal a medida que llegan los
+    bloques y al publicar se concatenan tras la cabecera, así que la memoria
+    usada es la de un bloque. Como context manager publica al salir sin
+    error y descarta los temporales si hubo una excepción.
+    """
+
+    def __init__(self, almacen: AlmacenSeries, despliegue_id: Hashable, variable: str, tabla: str):
+        self._almacen = almacen
+        self._clave = (despliegue_id, variable, tabla)
+        self._ruta = almacen._ruta(despliegue_id, variable, tabla)
+        self._ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._temporal = tempfile.TemporaryDirectory(dir=self._ruta.parent)
+        self._partes = {nombre: open(os.path.join(self._temporal.name, nombre), "wb")
+                        for nombre, _ in _COLUMNAS}
+        self._ultimo: Optional[int] = None
+        self.n = 0
+
+    def __enter__(self) -> "EscrituraSerie":
+        return self
+
+    def __exit__(self, tipo, *exc) -> bool:
+        if tipo is None:
+            self.publicar()
+        else:
+            self.descartar()
+        return False
+
+    def agregar(self, bloque: Arrays) -> None:
+        ts = np.asarray(bloque["timestamp"], dtype=np.int64)
+        if not len(ts):
+            return
+        if np.any(np.diff(ts) < 0) or (self._ultimo is not None and ts[0] < self._ultimo):
+            raise ValueError("Los bloques deben llegar ordenados por timestamp")
+        calidad = bloque.get("calidad")
+        if calidad is None:
+            calidad = np.zeros(len(ts), dtype=np.int8)
+        datos = {"timestamp": ts, "valor": bloque["valor"], "calidad": calidad}
+        for nombre, dtype in _COLUMNAS:
+            self._partes[nombre].write(np.ascontiguousarray(datos[nombre], dtype=dtype).data)
+        self.n += len(ts)
+        self._ultimo = int(ts[-1])
+
+    def _cerrar_partes(self) -> None:
+        for parte in self._partes.values():
+            parte.close()
+
+    def publicar(self) -> int:
+        """Reemplaza la serie del almacén por la escrita; devuelve los puntos."""
+        try:
+            self._cerrar_partes()
+            salida = os.path.join(self._temporal.name, "serie.srm")
+            with open(salida, "wb") as destino:
+                destino.write(_CABECERA.pack(_MAGIA, self.n))
+                for nombre, _ in _COLUMNAS:
+                    with open(os.path.join(self._temporal.name, nombre), "rb") as origen:
+                        shutil.copyfileobj(origen, destino, 16 * 1024 * 1024)
+            os.replace(salida, self._ruta)
+        finally:
+            self._temporal.cleanup()
+        self._almacen._olvidar(*self._clave)
+        return self.n
+
+    def descartar(self) -> None:
+        self._cerrar_partes()
+        self._temporal.cleanup()
+
+
+def importar_despliegue(progreso, client, almacen: AlmacenSeries, despliegue_id: Hashable,
+                        variables: Sequence[str], tablas: Sequence[str],
+                        page_size: int = 100_000) -> int:
+    """Trabajo de ``utils.jobs``: descarga las series del backend al almacén.
+
+    Permite analizar el despliegue sin conexión (p. ej. el espectro de la
+    página de análisis); devuelve los puntos importados.
+    """
+    total = 0
+    pares = [(var, tabla) for var in variables for tabla in tablas]
+    for i, (variable, tabla) in enumerate(pares):
+        progreso(i / len(pares), f"Importando {variable} ({tabla}) · {total:,} puntos")
+        total += almacen.escribir(despliegue_id, variable, tabla, client.iter_trend_pages(
+            despliegue_id, variable, tabla=tabla, page_size=page_size
+        ))
+    progreso(1.0, f"{total:,} puntos importados")
+    return total
@@ -1,13 +1,69 @@
 # dashboard/utils/api_client.py
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import streamlit as st
 
+from utils.metricas import SesionMedida, medir
+from utils.wire import CABECERA_CURSOR, cabecera_accept, decodificar_respuesta
+
+# Tablas de series disponibles en el backend
+TABLA_CRUDOS = "mediciones"
+TABLA_PROCESADOS = "mediciones_procesadas"
+
+
+def _puntos_a_dataframe(points):
+    """Convierte la lista de puntos de una serie en un DataFrame ordenado"""
+    df = pd.DataFrame(points)
+    if df.empty:
+        return pd.DataFrame(columns=["timestamp", "valor"])
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df.sort_values("timestamp", ignore_index=True)
+
+
+def _puntos_a_arrays(points):
+    """Convierte la lista de puntos en arrays NumPy.
+
+    timestamp: int64 (ns desde epoch), valor: float64 (NaN si falta),
+    calidad: int8 (0 si el backend no la envía).
+    """
+    timestamps = pd.to_datetime([p["timestamp"] for p in points])
+    return {
+        "timestamp": np.asarray(timestamps.as_unit("ns").asi8, dtype=np.int64),
+        "valor": np.array([p.get("valor") for p in points], dtype=np.float64),
+        "calidad": np.array([p.get("calidad", 0) for p in points], dtype=np.int8),
+    }
+
+
+def arrays_a_dataframe(chunks):
+    """Une bloques de arrays (ver ``_puntos_a_arrays``) en un DataFrame"""
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame(columns=["timestamp", "valor", "calidad"])
+    return pd.DataFrame({
+        "timestamp": np.concatenate([c["timestamp"] for c in chunks]).view("datetime64[ns]"),
+        "valor": np.concatenate([c["valor"] for c in chunks]),
+        "calidad": np.concatenate([c["calidad"] for c in chunks]),
+    })
+
+
+def dataframe_a_arrays(df):
+    """Inverso de ``arrays_a_dataframe`` para un único bloque"""
+    calidad = df["calidad"] if "calidad" in df else np.zeros(len(df))
+    return {
+        "timestamp": pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[ns]").view(np.int64),
+        "valor": np.asarray(df["valor"], dtype=np.float64),
+        "calidad": np.asarray(calidad, dtype=np.int8),
+    }
+
+
 class APIClient:
     def __init__(self, base_url="http://localhost:8000"):
         self.base_url = base_url
-        self.session = requests.Session()
+        self.session = SesionMedida(base_url)
+        # El backend respondió en orden ascendente a una petición "desc"
+        self._desc_ignorado = False
     
     @st.cache_data(ttl=300)  # Cache de 5 minutos
     def get_despliegues(_self):
@@ -19,13 +75,42 @@ class APIClient:
         except:
             pass
         return []
-    
+
+    def get_resumen_dashboard(self, limite=1000, timeout=None):
+        """KPIs y lista de despliegues de la página de inicio en una sola consulta.
+
+        Devuelve el JSON de ``/api/dashboard/resumen``; si el backend no tiene
+        ese endpoint, la lista de ``/api/despliegues`` (sin KPIs), que el
+        llamador agrega. Lanza ``requests.RequestException`` si ambos fallan.
+        """
+        response = self.session.get(
+            f"{self.base_url}/api/dashboard/resumen",
+            params={"limite": limite},
+            timeout=timeout
+        )
+        if response.status_code == 404:
+            response = self.session.get(f"{self.base_url}/api/despliegues", timeout=timeout)
+            response.raise_for_status()
+            return {"despliegues": response.json()}
+        response.raise_for_status()
+        return response.json()
+
     def get_trend_data(self, despliegue_id, variable, ts_from=None, ts_to=None, 
-                       tabla="mediciones", limit=10000):
-        """Obtiene datos de tendencia para gráficos"""
+                       tabla="mediciones", limit=None, timeout=None):
+        """Obtiene datos de tendencia para gráficos.
+
+        Sin ``limit`` se recorre el rango completo página a página; con
+        ``limit`` se hace una sola petición truncada a ese número de puntos.
+        """
+        if limit is None:
+            return arrays_a_dataframe(self.iter_trend_pages(
+                despliegue_id, variable, ts_from, ts_to, tabla=tabla, timeout=timeout
+            ))
+        
         params = {
             "despliegue_id": despliegue_id,
             "variables": [variable],
+            "tablas": [tabla],
             "limit": limit
         }
         
@@ -34,26 +119,320 @@ class APIClient:
         if ts_to:
             params["ts_to"] = ts_to.isoformat()
         
-        # TODO: Necesitarás que Marcelo agregue parámetro "tabla"
         response = self.session.post(
             f"{self.base_url}/api/analytics/trend",
-            json=params
+            json=params,
+            timeout=timeout
         )
         
         if response.status_code == 200:
             data = response.json()
             if data.get("series"):
                 points = data["series"][0]["points"]
-                return pd.DataFrame(points)
+                return _puntos_a_dataframe(points)
         
         return pd.DataFrame()
     
+    def iter_trend_pages(self, despliegue_id, variable, ts_from=None, ts_to=None,
+                         tabla=TABLA_CRUDOS, page_size=10000, cursor=None, timeout=None):
+        """Recorre una serie completa en páginas de ``page_size`` puntos.
+
+        Produce dicts de arrays NumPy (ver ``_puntos_a_arrays``), de modo que
+        el llamador consume series de cualquier tamaño con memoria acotada.
+        Cada página se pide en formato columnar binario (ver ``utils.wire``)
+        y se decodifica sin copia; los backends antiguos responden JSON.
+        Usa el ``next_cursor`` del backend si lo hay; si no, continúa desde el
+        último timestamp recibido descartando los puntos ya entregados.
+        """
+        ultimo = None
+        while True:
+            params = {
+                "despliegue_id": despliegue_id,
+                "variables": [variable],
+                "tablas": [tabla],
+                "limit": page_size
+            }
+            if cursor:
+                params["cursor"] = cursor
+            elif ultimo is not None:
+                params["ts_from"] = pd.Timestamp(ultimo).isoformat()
+            elif ts_from:
+                params["ts_from"] = ts_from.isoformat()
+            if ts_to:
+                params["ts_to"] = ts_to.isoformat()
+            
+            response = self.session.post(
+                f"{self.base_url}/api/analytics/trend",
+                json=params,
+                headers={"Accept": cabecera_accept()},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            
+            # Formato columnar si el backend lo soporta; JSON en otro caso
+            with medir("api_decodificacion_segundos", endpoint="/api/analytics/trend"):
+                chunk = decodificar_respuesta(response)
+            if chunk is not None:
+                recibidos = len(chunk["timestamp"])
+                siguiente = response.headers.get(CABECERA_CURSOR)
+            else:
+                data = response.json()
+                series = data.get("series") or []
+                points = series[0]["points"] if series else []
+                chunk = _puntos_a_arrays(points)
+                recibidos = len(points)
+                siguiente = data.get("next_cursor") or (
+                    series[0].get("next_cursor") if series else None
+                )
+            if not recibidos:
+                return
+            
+            if ultimo is not None and not cursor:
+                nuevos = chunk["timestamp"] > ultimo
+                chunk = {k: v[nuevos] for k, v in chunk.items()}
+                if not len(chunk["timestamp"]):
+                    return  # Sin avance: evita un bucle infinito
+            if len(chunk["timestamp"]):
+                yield chunk
+                ultimo = int(chunk["timestamp"][-1])
+            
+            cursor = siguiente
+            if not cursor and recibidos < page_size:
+                return
+    
+    def _pedir_trend(self, despliegue_id, variable, tabla, ts_from, ts_to, limite,
+                     orden="asc", calidad=None, timeout=None):
+        """Una petición a ``/api/analytics/trend`` tal cual la responde el backend."""
+        params = {
+            "despliegue_id": despliegue_id,
+            "variables": [variable],
+            "tablas": [tabla],
+            "limit": limite,
+            "order": orden
+        }
+        if calidad is not None:
+            params["calidad"] = [int(c) for c in calidad]
+        if ts_from is not None:
+            params["ts_from"] = ts_from.isoformat()
+        if ts_to is not None:
+            params["ts_to"] = ts_to.isoformat()
+
+        response = self.session.post(
+            f"{self.base_url}/api/analytics/trend",
+            json=params,
+            headers={"Accept": cabecera_accept()},
+            timeout=timeout
+        )
+        response.raise_for_status()
+
+        chunk = decodificar_respuesta(response)
+        if chunk is None:
+            series = response.json().get("series") or []
+            chunk = _puntos_a_arrays(series[0]["points"] if series else [])
+        return chunk
+
+    def get_trend_page(self, despliegue_id, variable, tabla=TABLA_CRUDOS, ts_from=None,
+                       ts_to=None, despues_de=None, orden="asc", calidad=None,
+                       page_size=1000, timeout=None):
+        """Una página de una serie con paginación keyset sobre el timestamp.
+
+        ``despues_de`` (ns) es el último timestamp de la página anterior en el
+        sentido de ``orden`` ("asc" o "desc"); la página empieza justo después.
+        Devuelve ``(chunk, hay_mas)``: hasta ``page_size`` puntos y si el
+        backend tiene más puntos en ese sentido.
+
+        El orden y el filtro de códigos de ``calidad`` se envían al backend
+        ("order", "calidad"). Un backend que los ignora se detecta en la
+        respuesta y la página se completa aquí:
+
+        - ``calidad`` ignorada (llegan otros códigos): se filtra y se siguen
+          pidiendo páginas hasta reunir ``page_size`` puntos o agotar el rango.
+        - ``order="desc"`` ignorado (llega en orden ascendente): ver
+          ``_pagina_hacia_atras``.
+        """
+        desde = pd.Timestamp(ts_from) if ts_from is not None else None
+        hasta = pd.Timestamp(ts_to) if ts_to is not None else None
+        if despues_de is not None:
+            limite = pd.Timestamp(despues_de)
+            if orden == "desc":
+                hasta = min(hasta, limite) if hasta is not None else limite
+            else:
+                desde = max(desde, limite) if desde is not None else limite
+        if orden == "desc" and self._desc_ignorado:
+            return self._pagina_hacia_atras(despliegue_id, variable, tabla, desde, hasta,
+                                            despues_de, calidad, page_size, None, timeout)
+
+        partes, reunidos = [], 0
+        while True:
+            # +1: el límite inclusivo repite ``despues_de``
+            chunk = self._pedir_trend(despliegue_id, variable, tabla, desde, hasta,
+                                      page_size + 1, orden, calidad, timeout)
+            ts = chunk["timestamp"]
+            if orden == "desc" and len(ts) > 1 and ts[0] < ts[-1]:
+                self._desc_ignorado = True
+                return self._pagina_hacia_atras(despliegue_id, variable, tabla, desde, hasta,
+                                                despues_de, calidad, page_size, chunk, timeout)
+            nuevos = ts != despues_de if despues_de is not None else np.ones(len(ts), bool)
+            # Con ``page_size`` puntos nuevos la página está llena: puede haber más
+            hay_mas = int(nuevos.sum()) >= page_size
+            conservar = nuevos.copy()
+            if calidad is not None:
+                conservar &= np.isin(chunk["calidad"], list(calidad))
+            partes.append({k: v[conservar] for k, v in chunk.items()})
+            reunidos += int(conservar.sum())
+            if not hay_mas or reunidos >= page_size:
+                break
+            # El backend ignoró ``calidad``: se continúa tras el último punto crudo
+            despues_de = int(ts[-1])
+            if orden == "desc":
+                hasta = pd.Timestamp(despues_de)
+            else:
+                desde = pd.Timestamp(despues_de)
+
+        chunk = {k: np.concatenate([p[k] for p in partes]) for k in partes[0]}
+        indices = np.argsort(chunk["timestamp"], kind="stable")
+        if orden == "desc":
+            indices = indices[::-1]
+        hay_mas = hay_mas or reunidos > page_size
+        return {k: v[indices[:page_size]] for k, v in chunk.items()}, hay_mas
+
+    def _pagina_hacia_atras(self, despliegue_id, variable, tabla, desde, hasta, despues_de,
+                            calidad, page_size, primera, timeout):
+        """Página descendente para un backend que solo entrega en orden ascendente.
+
+        ``primera`` es la respuesta ascendente ya recibida para el rango (o
+        None): si no llenó el límite contiene el rango entero. Si no, el
+        rango se recorre hacia atrás desde ``hasta`` en ventanas de tiempo que
+        se duplican, estimadas con el paso entre puntos, hasta reunir
+        ``page_size`` puntos o llegar a ``desde``.
+        """
+        if primera is None:
+            primera = self._pedir_trend(despliegue_id, variable, tabla, desde, hasta,
+                                        page_size + 1, "asc", calidad, timeout)
+        ts = primera["timestamp"]
+
+        def filtrar(chunk):
+            conservar = np.ones(len(chunk["timestamp"]), dtype=bool)
+            if despues_de is not None:
+                conservar &= chunk["timestamp"] != despues_de
+            if calidad is not None:
+                conservar &= np.isin(chunk["calidad"], list(calidad))
+            return {k: v[conservar] for k, v in chunk.items()}
+
+        if len(ts) <= page_size:
+            chunk = filtrar(primera)
+            return {k: v[::-1][:page_size] for k, v in chunk.items()}, False
+
+        inicio = int(ts[0])  # primer punto del rango
+        fin = hasta.value if hasta is not None else pd.Timestamp.now().value
+        ventana = max(1, int((ts[-1] - ts[0]) // max(1, len(ts) - 1))) * (page_size + 1) * 2
+        partes, reunidos = [], 0
+        while reunidos <= page_size and fin >= inicio:
+            comienzo = max(inicio, fin - ventana)
+            for chunk in reversed(list(self.iter_trend_pages(
+                despliegue_id, variable, pd.Timestamp(comienzo), pd.Timestamp(fin),
+                tabla=tabla, page_size=max(page_size, 10_000), timeout=timeout
+            ))):
+                chunk = filtrar(chunk)
+                partes.insert(0, chunk)
+                reunidos += len(chunk["timestamp"])
+            fin, ventana = comienzo - 1, ventana * 2
+
+        if not partes:
+            return filtrar({k: v[:0] for k, v in primera.items()}), False
+        chunk = {k: np.concatenate([p[k] for p in partes]) for k in partes[0]}
+        return {k: v[::-1][:page_size] for k, v in chunk.items()}, reunidos > page_size
+
+    def get_trend_batch(self, despliegue_id, variables, tablas=(TABLA_CRUDOS,),
+                        ts_from=None, ts_to=None, limit=10000, timeout=None):
+        """Obtiene varias variables y tablas en una sola petición.
+
+        Devuelve un dict {(variable, tabla): DataFrame} con las mismas columnas
+        y timestamps ya parseados, o None si el backend no soporta la consulta
+        agrupada (para que el llamador recurra a peticiones individuales).
+        """
+        params = {
+            "despliegue_id": despliegue_id,
+            "variables": list(variables),
+            "tablas": list(tablas),
+            "limit": limit
+        }
+        
+        if ts_from:
+            params["ts_from"] = ts_from.isoformat()
+        if ts_to:
+            params["ts_to"] = ts_to.isoformat()
+        
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/analytics/trend",
+                json=params,
+                timeout=timeout
+            )
+        except requests.RequestException:
+            return None
+        
+        if response.status_code != 200:
+            return None
+        
+        series = response.json().get("series") or []
+        # Sin claves explícitas, el backend responde en orden variables × tablas
+        orden = [(v, t) for v in variables for t in tablas]
+        resultado = {clave: arrays_a_dataframe([]) for clave in orden}
+        for i, serie in enumerate(series):
+            if "variable" in serie:
+                clave = (serie["variable"], serie.get("tabla", tablas[0]))
+            elif i < len(orden):
+                clave = orden[i]
+            else:
+                continue
+            points = serie.get("points", [])
+            chunks = [_puntos_a_arrays(points)]
+            
+            # Serie truncada por el límite: se completa con paginación
+            if points and (serie.get("next_cursor") or len(points) >= limit):
+                ultimo = int(chunks[0]["timestamp"].max())
+                for chunk in self.iter_trend_pages(
+                    despliegue_id, clave[0],
+                    ts_from=pd.Timestamp(ultimo).to_pydatetime(), ts_to=ts_to,
+                    tabla=clave[1], page_size=limit,
+                    cursor=serie.get("next_cursor"), timeout=timeout
+                ):
+                    nuevos = chunk["timestamp"] > ultimo
+                    chunks.append({k: v[nuevos] for k, v in chunk.items()})
+            
+            resultado[clave] = arrays_a_dataframe(chunks).sort_values(
+                "timestamp", ignore_index=True
+            )
+        
+        return resultado
+    
+    @st.cache_data(ttl=60, show_spinner=False)
+    def get_extension(_self, despliegue_id, variables, tabla=TABLA_CRUDOS, timeout=None):
+        """Primer y último timestamp (ns) con datos del despliegue, o None si no hay.
+
+        Pide un único punto de cada extremo de cada serie (``page_size=1``
+        en orden ascendente y descendente). Se cachea un minuto: acota los
+        selectores de rango y forma parte de claves de caché, así que no
+        debe cambiar en cada rerun. Lanza ``requests.RequestException`` si
+        el backend no responde (los fallos no se cachean).
+        """
+        extremos = []
+        for variable in variables:
+            for orden in ("asc", "desc"):
+                chunk, _ = _self.get_trend_page(despliegue_id, variable, tabla=tabla, orden=orden,
+                                                page_size=1, timeout=timeout)
+                extremos.extend(chunk["timestamp"].tolist())
+        if not extremos:
+            return None
+        return min(extremos), max(extremos)
+
     def get_quality_stats(self, despliegue_id):
         """Obtiene estadísticas de calidad para un despliegue"""
         # TODO: Implementar endpoint específico
         return {}
     
-    def iniciar_procesamiento(self, despliegue_id, config=None):
+    def iniciar_procesamiento(self, despliegue_id, config=None, timeout=None):
         """Inicia procesamiento de un despliegue"""
         payload = {
             "despliegue_id": despliegue_id,
@@ -62,7 +441,33 @@ class APIClient:
         
         response = self.session.post(
             f"{self.base_url}/api/pipeline/procesar",
-            json=payload
+            json=payload,
+            timeout=timeout
         )
         
-        return response.json()
\ No newline at end of file
+        return response.json()
+
+    def estado_procesamiento(self, despliegue_id, trabajo_id=None, timeout=None):
+        """Estado del pipeline del servidor para un despliegue.
+
+        Devuelve un dict con ``estado`` ("procesando", "procesado" o "error")
+        y, si el backend los envía, ``progreso`` (0-1) y ``error``. Consulta
+        ``/api/pipeline/estado``; si el backend no tiene ese endpoint, el
+        estado del despliegue en ``/api/despliegues``.
+        """
+        if trabajo_id:
+            response = self.session.get(
+                f"{self.base_url}/api/pipeline/estado",
+                params={"trabajo_id": trabajo_id},
+                timeout=timeout
+            )
+            if response.status_code != 404:
+                response.raise_for_status()
+                return response.json()
+        
+        response = self.session.get(f"{self.base_url}/api/despliegues", timeout=timeout)
+        response.raise_for_status()
+        for despliegue in response.json():
+            if despliegue.get("id", despliegue.get("despliegue_id")) == despliegue_id:
+                return {"estado": despliegue.get("estado")}
+        return {"estado": None}
\ No newline at end of file
@@ -6,23 +6,33 @@ Expected table:
 Supports:
 - Plain text passwords (compatibility)
 - bcrypt hashes (recommended)
+
+bcrypt checks run in a bounded process pool (see ``utils.hashing``), and
+plain-text passwords are rehashed to bcrypt after a successful login.
+
+Database access goes through a shared, thread-safe connection pool
+(``get_pool`` / ``db_connection``) sized from DB_POOL_MIN / DB_POOL_MAX.
 """
 
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
-from typing import Optional, Tuple
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Iterator, Optional, Tuple
 
 import streamlit as st
 
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
 
-try:
-    import bcrypt  # type: ignore
-except Exception:
-    bcrypt = None
+from utils.hashing import HashQueueFull, bcrypt, get_hash_pool
+from utils.metricas import medir, observar
 
 
 @dataclass
@@ -43,12 +53,143 @@ def _db_params_from_env() -> dict:
     }
 
 
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    timeouts: int = 0
+    reconnects: int = 0
+    in_use: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+class ConnectionPool:
+    """ThreadedConnectionPool with bounded checkout wait and liveness checks.
+
+    psycopg2's pool raises immediately when exhausted; a semaphore in front of
+    it makes callers wait up to ``checkout_timeout`` seconds instead. Idle
+    connections older than ``ping_after`` seconds are pinged before being
+    handed out, and broken ones are discarded and replaced.
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        checkout_timeout: float,
+        ping_after: float,
+        **params,
+    ):
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # Keyed by the connection itself: entries go away with closed connections
+        self._last_used: "weakref.WeakKeyDictionary[psycopg2.extensions.connection, float]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.maxconn = maxconn
+        self._lock = threading.Lock()
+        self.checkout_timeout = checkout_timeout
+        self.ping_after = ping_after
+        self.metrics = PoolMetrics()
+
+    def _is_alive(self, conn) -> bool:
+        if conn.closed:
+            return False
+        with self._lock:
+            last_used = self._last_used.get(conn, 0.0)
+        idle = time.monotonic() - last_used
+        if idle < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        """A live connection, discarding dead ones.
+
+        Every idle connection may have gone stale (e.g. after a database
+        restart), so up to ``maxconn + 1`` are tried before giving up.
+        """
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            if self._is_alive(conn):
+                conn.autocommit = True
+                return conn
+            self._release(conn, close=True)
+            with self._lock:
+                self.metrics.reconnects += 1
+        raise psycopg2.OperationalError("No se pudo obtener una conexión viva")
+
+    def _release(self, conn, close: bool) -> None:
+        self._pool.putconn(conn, close=close)
+        with self._lock:
+            if conn.closed:
+                self._last_used.pop(conn, None)
+            else:
+                self._last_used[conn] = time.monotonic()
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg2.extensions.connection]:
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self.metrics.timeouts += 1
+            raise PoolTimeout(
+                f"No hay conexiones libres tras {self.checkout_timeout:.0f} s"
+            )
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self.metrics.checkouts += 1
+            self.metrics.in_use += 1
+            self.metrics.wait_seconds_total += waited
+            self.metrics.wait_seconds_max = max(self.metrics.wait_seconds_max, waited)
+
+        conn = None
+        broken = False
+        try:
+            conn = self._checkout()
+            # Slot wait plus handing out the connection (and its ping, if due)
+            observar("db_checkout_segundos", time.monotonic() - start)
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if conn is not None:
+                self._release(conn, close=broken or bool(conn.closed))
+            with self._lock:
+                self.metrics.in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return asdict(self.metrics)
+
+
 @st.cache_resource(show_spinner=False)
-def get_conn():
-    params = _db_params_from_env()
-    conn = psycopg2.connect(**params)
-    conn.autocommit = True
-    return conn
+def get_pool() -> ConnectionPool:
+    return ConnectionPool(
+        minconn=int(os.getenv("DB_POOL_MIN", "1")),
+        maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+        checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30")),
+        **_db_params_from_env(),
+    )
+
+
+@contextmanager
+def db_connection() -> Iterator[psycopg2.extensions.connection]:
+    """Borrow a pooled autocommit connection for the duration of the block."""
+    with get_pool().connection() as conn:
+        yield conn
 
 
 def _is_bcrypt_hash(value: str) -> bool:
@@ -64,40 +205,58 @@ def verify_password(plain_password: str, stored_password: str) -> bool:
     if _is_bcrypt_hash(stored_password):
         if bcrypt is None:
             return False
-        try:
-            return bcrypt.checkpw(
-                plain_password.encode("utf-8"), stored_password.encode("utf-8")
-            )
-        except Exception:
-            return False
+        return get_hash_pool().checkpw(plain_password, stored_password)
 
     return plain_password == stored_password
 
 
+def _upgrade_legacy_password(id_usuario: int, plain_password: str) -> None:
+    """Replace a plain-text password with its bcrypt hash (best effort)."""
+    if bcrypt is None:
+        return
+    try:
+        hashed = get_hash_pool().hashpw(plain_password)
+        with db_connection() as conn:
+            with conn.cursor() as cur, medir("db_consulta_segundos", consulta="actualizar_hash"):
+                cur.execute(
+                    "UPDATE iot.usuarios SET contrasena = %s WHERE id_usuario = %s",
+                    (hashed, id_usuario),
+                )
+    except Exception:
+        # The login already succeeded; the upgrade is retried on the next one
+        pass
+
+
 def authenticate(email: str, password: str) -> Tuple[bool, Optional[AuthUser], str]:
     email = (email or "").strip().lower()
     if not email or not password:
         return False, None, "Ingresa correo y contraseña."
 
     try:
-        conn = get_conn()
-        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            cur.execute(
-                """
-                SELECT id_usuario, nombre, correo, rol, contrasena
-                FROM iot.usuarios
-                WHERE lower(correo) = %s
-                """,
-                (email,),
-            )
-            row = cur.fetchone()
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur, \
+                    medir("db_consulta_segundos", consulta="usuario_por_correo"):
+                cur.execute(
+                    """
+                    SELECT id_usuario, nombre, correo, rol, contrasena
+                    FROM iot.usuarios
+                    WHERE lower(correo) = %s
+                    """,
+                    (email,),
+                )
+                row = cur.fetchone()
 
         if not row:
             return False, None, "Usuario o contraseña incorrectos."
 
-        if not verify_password(password, row["contrasena"]):
+        with medir("auth_verificacion_segundos"):
+            valida = verify_password(password, row["contrasena"])
+        if not valida:
             return False, None, "Usuario o contraseña incorrectos."
 
+        if not _is_bcrypt_hash(row["contrasena"]):
+            _upgrade_legacy_password(int(row["id_usuario"]), password)
+
         user = AuthUser(
             id_usuario=int(row["id_usuario"]),
             nombre=str(row["nombre"]),
@@ -105,6 +264,8 @@ def authenticate(email: str, password: str) -> Tuple[bool, Optional[AuthUser], s
             rol=str(row["rol"]),
         )
         return True, user, ""
+    except (PoolTimeout, HashQueueFull):
+        return False, None, "El servidor está ocupado, intenta de nuevo en unos segundos."
     except Exception as e:
         return False, None, f"Error conectando a la BD: {e}"
 
@@ -0,0 +1,190 @@
+"""Caché de series temporales por rangos, con expulsión LRU por tamaño.
+
+Cada serie (despliegue_id, variable, tabla) se guarda troceada en buckets de
+tiempo de tamaño fijo. Al pedir un rango solo se descargan los buckets que
+faltan (agrupados en sub-rangos contiguos), así que mover el slider de fechas
+o hacer zoom sobre datos ya vistos no vuelve a tocar la red.
+
+Los buckets que aún pueden recibir datos (los que terminan en el futuro) no
+se guardan, para no servir series incompletas de despliegues en curso.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+Arrays = Dict[str, np.ndarray]
+ClaveSerie = Tuple[Hashable, str, str]  # (despliegue_id, variable, tabla)
+Fetch = Callable[[datetime, datetime], Iterable[Arrays]]
+
+_COLUMNAS = ("timestamp", "valor", "calidad")
+
+
+def _a_ns(valor) -> int:
+    return int(pd.Timestamp(valor).as_unit("ns").value)
+
+
+def _a_datetime(ns: int) -> datetime:
+    return pd.Timestamp(ns).to_pydatetime()
+
+
+def _vacio() -> Arrays:
+    return {
+        "timestamp": np.empty(0, dtype=np.int64),
+        "valor": np.empty(0, dtype=np.float64),
+        "calidad": np.empty(0, dtype=np.int8),
+    }
+
+
+def _concatenar(bloques: List[Arrays]) -> Arrays:
+    if not bloques:
+        return _vacio()
+    return {c: np.concatenate([b[c] for b in bloques]) for c in _COLUMNAS}
+
+
+class CacheSeries:
+    """Caché de buckets ``(despliegue_id, variable, tabla, bucket)`` → arrays."""
+
+    def __init__(self, tam_bucket_s: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.tam_bucket_ns = int(
+            (tam_bucket_s or int(os.getenv("CACHE_BUCKET_S", "3600"))) * 1e9
+        )
+        self.max_bytes = max_bytes or int(os.getenv("CACHE_MAX_MB", "256")) * 1024 * 1024
+        self._buckets: "OrderedDict[tuple, Arrays]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    # ------------------------------------------------------------------ buckets
+    def _indices(self, ts_from, ts_to) -> range:
+        return range(_a_ns(ts_from) // self.tam_bucket_ns, _a_ns(ts_to) // self.tam_bucket_ns + 1)
+
+    def _limites(self, bucket: int) -> Tuple[int, int]:
+        return bucket * self.tam_bucket_ns, (bucket + 1) * self.tam_bucket_ns
+
+    def faltantes(self, clave: ClaveSerie, ts_from, ts_to) -> List[Tuple[datetime, datetime]]:
+        """Sub-rangos (alineados a buckets) de [ts_from, ts_to] que no están en caché."""
+        with self._lock:
+            ausentes = [b for b in self._indices(ts_from, ts_to) if (*clave, b) not in self._buckets]
+
+        rangos = []
+        for bucket in ausentes:
+            desde, hasta = self._limites(bucket)
+            if rangos and rangos[-1][1] == desde:
+                rangos[-1][1] = hasta
+            else:
+                rangos.append([desde, hasta])
+        return [(_a_datetime(d), _a_datetime(h)) for d, h in rangos]
+
+    def insertar(self, clave: ClaveSerie, ts_from, ts_to, datos: Arrays) -> None:
+        """Guarda ``datos`` (ordenados) descargados para el rango alineado [ts_from, ts_to)."""
+        limite_completo = _a_ns(datetime.now())
+        timestamps = datos["timestamp"]
+        with self._lock:
+            for bucket in self._indices(ts_from, _a_ns(ts_to) - 1):
+                desde, hasta = self._limites(bucket)
+                if hasta > limite_completo:
+                    continue
+                i, j = np.searchsorted(timestamps, [desde, hasta], side="left")
+                trozo = {c: np.array(datos[c][i:j]) for c in _COLUMNAS}
+                self._guardar((*clave, bucket), trozo)
+            self._expulsar()
+
+    def _guardar(self, clave: tuple, trozo: Arrays) -> None:
+        anterior = self._buckets.pop(clave, None)
+        if anterior is not None:
+            self._bytes -= sum(a.nbytes for a in anterior.values())
+        self._buckets[clave] = trozo
+        self._bytes += sum(a.nbytes for a in trozo.values())
+
+    def _expulsar(self) -> None:
+        while self._bytes > self.max_bytes and self._buckets:
+            _, trozo = self._buckets.popitem(last=False)
+            self._bytes -= sum(a.nbytes for a in trozo.values())
+
+    # ------------------------------------------------------------------ lectura
+    def _recortar(self, datos: Arrays, ts_from, ts_to) -> Arrays:
+        i = np.searchsorted(datos["timestamp"], _a_ns(ts_from), side="left")
+        j = np.searchsorted(datos["timestamp"], _a_ns(ts_to), side="right")
+        return {c: datos[c][i:j] for c in _COLUMNAS}
+
+    def leer(self, clave: ClaveSerie, ts_from, ts_to) -> Optional[Arrays]:
+        """Datos de [ts_from, ts_to] si todos sus buckets están en caché; si no, None."""
+        bloques = []
+        with self._lock:
+            for bucket in self._indices(ts_from, ts_to):
+                trozo = self._buckets.get((*clave, bucket))
+                if trozo is None:
+                    return None
+                self._buckets.move_to_end((*clave, bucket))
+                bloques.append(trozo)
+        return self._recortar(_concatenar(bloques), ts_from, ts_to)
+
+    def obtener(self, clave: ClaveSerie, ts_from, ts_to, fetch: Fetch) -> Arrays:
+        """Datos de [ts_from, ts_to], descargando con ``fetch`` solo lo que falta."""
+        datos = self.leer(clave, ts_from, ts_to)
+        with self._lock:
+            if datos is not None:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+        if datos is not None:
+            return datos
+
+        descargados = []
+        for desde, hasta in self.faltantes(clave, ts_from, ts_to):
+            bloque = _concatenar(list(fetch(desde, hasta)))
+            self.insertar(clave, desde, hasta, bloque)
+            descargados.append((_a_ns(desde), _a_ns(hasta), bloque))
+
+        # Lo recién descargado se usa directamente: puede no haberse guardado
+        # (bucket en curso) o haber sido expulsado por falta de espacio
+        bloques: List[Optional[Arrays]] = []
+        for bucket in self._indices(ts_from, ts_to):
+            desde, hasta = self._limites(bucket)
+            origen = next((d for a, b, d in descargados if a <= desde < b), None)
+            if origen is not None:
+                i, j = np.searchsorted(origen["timestamp"], [desde, hasta], side="left")
+                bloques.append({c: origen[c][i:j] for c in _COLUMNAS})
+                continue
+            with self._lock:
+                bloques.append(self._buckets.get((*clave, bucket)))
+
+        # Otro hilo pudo expulsar buckets que estaban en caché: se vuelven a
+        # descargar, agrupados en tramos contiguos
+        primero = self._indices(ts_from, ts_to)[0]
+        i = 0
+        while i < len(bloques):
+            if bloques[i] is not None:
+                i += 1
+                continue
+            j = i
+            while j < len(bloques) and bloques[j] is None:
+                j += 1
+            desde, hasta = self._limites(primero + i)[0], self._limites(primero + j - 1)[1]
+            bloque = _concatenar(list(fetch(_a_datetime(desde), _a_datetime(hasta))))
+            self.insertar(clave, desde, hasta, bloque)
+            for k in range(i, j):
+                a, b = self._limites(primero + k)
+                inicio, fin = np.searchsorted(bloque["timestamp"], [a, b], side="left")
+                bloques[k] = {c: bloque[c][inicio:fin] for c in _COLUMNAS}
+            i = j
+        return self._recortar(_concatenar(bloques), ts_from, ts_to)
+
+    def invalidar(self, despliegue_id: Hashable) -> None:
+        """Descarta todos los buckets de un despliegue (p. ej. tras reprocesarlo)."""
+        with self._lock:
+            for clave in [c for c in self._buckets if c[0] == despliegue_id]:
+                self._bytes -= sum(a.nbytes for a in self._buckets.pop(clave).values())
+
+    @property
+    def bytes_usados(self) -> int:
+        return self._bytes
@@ -0,0 +1,232 @@
+"""Clasificación de calidad de datos, vectorizada y por bloques.
+
+Códigos asignados a cada punto (en orden de prioridad):
+
+- 1 faltante: valor NaN / ausente.
+- 3 físicamente imposible: fuera de los límites físicos de la variable.
+- 4 error de categoría: variable categórica con un valor no permitido.
+- 2 outlier: fuera de ``k`` veces la dispersión local (IQR o σ móvil).
+- 0 válido.
+
+Además se cuentan los gaps temporales: saltos entre timestamps consecutivos
+mayores que ``factor_gap`` veces el paso nominal de muestreo.
+
+Todo se calcula con operaciones NumPy sobre el bloque completo; el bucle de
+Python es por bloque, no por punto. ``AnalizadorCalidad`` acumula
+estadísticas bloque a bloque (por ejemplo, sobre ``iter_trend_pages``) con
+memoria acotada, arrastrando el contexto necesario entre bloques.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+VALIDO = 0
+FALTANTE = 1
+OUTLIER = 2
+IMPOSIBLE = 3
+ERROR_CATEGORIA = 4
+
+# Límites físicos por variable (mínimo, máximo)
+LIMITES_FISICOS: Dict[str, Tuple[float, float]] = {
+    "temperatura": (-40.0, 250.0),
+    "presion": (0.0, 10000.0),
+    "vibracion": (0.0, 500.0),
+    "corriente": (0.0, 2000.0),
+    "voltaje": (0.0, 1000.0),
+}
+
+# Valores permitidos para variables categóricas (p. ej. estados del equipo)
+CATEGORIAS: Dict[str, Sequence[float]] = {}
+
+# Puntos por ventana para la dispersión local
+VENTANA = 1024
+
+# Muestras por ventana usadas para estimar cuartiles
+_MUESTRAS_IQR = 256
+
+
+@dataclass
+class EstadisticasCalidad:
+    total_puntos: int = 0
+    validos: int = 0
+    faltantes: int = 0
+    outliers: int = 0
+    imposibles: int = 0
+    errores_categoria: int = 0
+    gaps: int = 0
+
+    def __add__(self, otra: "EstadisticasCalidad") -> "EstadisticasCalidad":
+        return EstadisticasCalidad(
+            **{campo: valor + getattr(otra, campo) for campo, valor in asdict(self).items()}
+        )
+
+    @classmethod
+    def desde_codigos(cls, calidad: np.ndarray, gaps: int = 0) -> "EstadisticasCalidad":
+        conteo = np.bincount(calidad.astype(np.int64), minlength=5)
+        return cls(
+            total_puntos=int(len(calidad)),
+            validos=int(conteo[VALIDO]),
+            faltantes=int(conteo[FALTANTE]),
+            outliers=int(conteo[OUTLIER]),
+            imposibles=int(conteo[IMPOSIBLE]),
+            errores_categoria=int(conteo[ERROR_CATEGORIA]),
+            gaps=gaps,
+        )
+
+
+def _outliers_iqr(valor: np.ndarray, ventana: int, k: float) -> np.ndarray:
+    """Outliers respecto al IQR de ventanas consecutivas de ``ventana`` puntos.
+
+    Los cuartiles se estiman con hasta ``_MUESTRAS_IQR`` puntos equiespaciados
+    de cada ventana, ordenados todos a la vez como una matriz 2D.
+    """
+    n = len(valor)
+    n_ventanas = -(-n // ventana)
+    relleno = np.full(n_ventanas * ventana, np.nan)
+    relleno[:n] = valor
+    bloques = relleno.reshape(n_ventanas, ventana)
+
+    paso = max(1, ventana // _MUESTRAS_IQR)
+    muestras = np.sort(bloques[:, ::paso], axis=1)  # NaN al final
+    validos = np.sum(~np.isnan(muestras), axis=1)
+    filas = np.arange(n_ventanas)
+    q1 = muestras[filas, np.clip((validos * 0.25).astype(np.int64), 0, muestras.shape[1] - 1)]
+    q3 = muestras[filas, np.clip((validos * 0.75).astype(np.int64), 0, muestras.shape[1] - 1)]
+    iqr = q3 - q1
+
+    bajo = np.repeat(q1 - k * iqr, ventana)[:n]
+    alto = np.repeat(q3 + k * iqr, ventana)[:n]
+    with np.errstate(invalid="ignore"):
+        return (valor < bajo) | (valor > alto)
+
+
+def _outliers_sigma(valor: np.ndarray, ventana: int, k: float) -> np.ndarray:
+    """Outliers respecto a media ± k·σ de una ventana móvil centrada (O(n))."""
+    mitad = ventana // 2
+    w = 2 * mitad + 1
+    # Relleno de ``mitad`` puntos vacíos a cada lado: las sumas de ventana
+    # son diferencias de sumas acumuladas sobre slices contiguos
+    finitos = np.pad(np.isfinite(valor), mitad)
+    x = np.where(finitos, np.pad(valor, mitad), 0.0)
+
+    def suma_movil(a):
+        acumulada = np.concatenate(([0.0], np.cumsum(a)))
+        return acumulada[w:] - acumulada[:-w]
+
+    c = suma_movil(finitos)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = suma_movil(x) / c
+        var = suma_movil(x * x) / c - media * media
+        sigma = np.sqrt(np.maximum(var, 0.0))
+        return np.abs(valor - media) > k * sigma
+
+
+def clasificar(
+    valor: np.ndarray,
+    variable: Optional[str] = None,
+    metodo: str = "iqr",
+    k: Optional[float] = None,
+    ventana: int = VENTANA,
+) -> np.ndarray:
+    """Código de calidad (int8) de cada punto de ``valor``.
+
+    ``metodo`` es ``"iqr"`` (k por defecto 1.5) o ``"sigma"`` (k por defecto 3).
+    """
+    valor = np.asarray(valor, dtype=np.float64)
+    calidad = np.zeros(len(valor), dtype=np.int8)
+    if not len(valor):
+        return calidad
+
+    faltante = np.isnan(valor)
+    imposible = np.zeros(len(valor), dtype=bool)
+    if variable in LIMITES_FISICOS:
+        minimo, maximo = LIMITES_FISICOS[variable]
+        with np.errstate(invalid="ignore"):
+            imposible = (valor < minimo) | (valor > maximo)
+
+    if variable in CATEGORIAS:
+        categoria = ~faltante & ~np.isin(valor, CATEGORIAS[variable])
+        outlier = np.zeros(len(valor), dtype=bool)
+    else:
+        categoria = np.zeros(len(valor), dtype=bool)
+        # Los imposibles no deben inflar la dispersión local
+        base = np.where(imposible, np.nan, valor)
+        if metodo == "sigma":
+            outlier = _outliers_sigma(base, ventana, 3.0 if k is None else k)
+        else:
+            outlier = _outliers_iqr(base, ventana, 1.5 if k is None else k)
+
+    # Se asigna de menor a mayor prioridad
+    calidad[outlier] = OUTLIER
+    calidad[categoria] = ERROR_CATEGORIA
+    calidad[imposible] = IMPOSIBLE
+    calidad[faltante] = FALTANTE
+    return calidad
+
+
+def paso_nominal(timestamp: np.ndarray) -> Optional[int]:
+    """Paso de muestreo típico (mediana de las diferencias), en las mismas unidades."""
+    if len(timestamp) < 2:
+        return None
+    muestra = np.diff(timestamp[: 100_001])
+    return int(np.median(muestra))
+
+
+def detectar_gaps(timestamp: np.ndarray, paso: Optional[int] = None,
+                  factor_gap: float = 3.0) -> np.ndarray:
+    """Índices ``i`` tales que entre ``timestamp[i-1]`` y ``timestamp[i]`` hay un gap."""
+    paso = paso if paso is not None else paso_nominal(timestamp)
+    if paso is None or paso <= 0:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.diff(timestamp) > factor_gap * paso) + 1
+
+
+class AnalizadorCalidad:
+    """Acumula estadísticas de calidad de una serie bloque a bloque.
+
+    Cada bloque se clasifica junto con las últimas ``ventana`` muestras del
+    anterior, para que la dispersión local no se reinicie en los bordes, y
+    los gaps se detectan también entre el final de un bloque y el siguiente.
+    """
+
+    def __init__(self, variable: Optional[str] = None, metodo: str = "iqr",
+                 k: Optional[float] = None, ventana: int = VENTANA,
+                 factor_gap: float = 3.0):
+        self.variable = variable
+        self.metodo = metodo
+        self.k = k
+        self.ventana = ventana
+        self.factor_gap = factor_gap
+        self.estadisticas = EstadisticasCalidad()
+        self._paso: Optional[int] = None
+        self._cola_ts = np.empty(0, dtype=np.int64)
+        self._cola_valor = np.empty(0, dtype=np.float64)
+
+    @property
+    def paso(self) -> Optional[int]:
+        """Paso nominal de muestreo, estimado con el primer bloque (None antes)."""
+        return self._paso
+
+    def procesar(self, timestamp: np.ndarray, valor: np.ndarray) -> np.ndarray:
+        """Clasifica un bloque (posterior a los ya vistos) y devuelve sus códigos."""
+        timestamp = np.asarray(timestamp, dtype=np.int64)
+        valor = np.asarray(valor, dtype=np.float64)
+        contexto = len(self._cola_ts)
+
+        ts = np.concatenate([self._cola_ts, timestamp])
+        todos = np.concatenate([self._cola_valor, valor])
+        calidad = clasificar(todos, self.variable, self.metodo, self.k, self.ventana)[contexto:]
+
+        if self._paso is None:
+            self._paso = paso_nominal(ts)
+        gaps = detectar_gaps(ts, self._paso, self.factor_gap)
+        gaps = int(np.count_nonzero(gaps >= max(contexto, 1)))
+
+        self.estadisticas = self.estadisticas + EstadisticasCalidad.desde_codigos(calidad, gaps)
+        self._cola_ts = ts[-self.ventana:]
+        self._cola_valor = todos[-self.ventana:]
+        return calidad
@@ -0,0 +1,165 @@
+"""Reducción de series temporales para gráficos.
+
+Un gráfico no puede mostrar más puntos que píxeles tiene de ancho, así que
+antes de construir la figura cada serie se reduce a ~``ancho_px`` puntos:
+
+- ``minmax_indices``: envolvente mínimo/máximo por bucket (conserva picos).
+- ``lttb_indices``: Largest-Triangle-Three-Buckets sobre esa envolvente
+  (conserva la forma visual de la curva).
+- ``reducir_serie``: combina ambos y añade siempre los puntos con códigos de
+  calidad anómalos, para que outliers e imposibles sigan visibles.
+
+Todas las funciones devuelven índices sobre los arrays originales, de modo que
+cualquier columna adicional (calidad, etiquetas) se puede reducir igual.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+# Ancho aproximado (en píxeles) de un gráfico de tendencia a ancho completo
+ANCHO_GRAFICO_PX = 1200
+
+# Códigos de calidad que nunca se descartan al reducir (outlier, imposible)
+CODIGOS_CONSERVADOS = (2, 3)
+
+# Cuántos candidatos min/max se preseleccionan por punto final de LTTB
+_FACTOR_PRESELECCION = 4
+
+
+def _como_float(x: np.ndarray) -> np.ndarray:
+    """Convierte timestamps (datetime64/int64) a float64 para calcular áreas."""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[ns]").view("int64")
+    return x.astype(np.float64, copy=False)
+
+
+def recortar_ventana(x: np.ndarray, inicio, fin) -> slice:
+    """Slice de ``x`` (ordenado) que cae dentro de [inicio, fin].
+
+    Usa búsqueda binaria, así que recortar al rango visible no cuesta más que
+    O(log n) aunque la serie completa tenga millones de puntos.
+    """
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        inicio = np.datetime64(inicio, "ns") if inicio is not None else None
+        fin = np.datetime64(fin, "ns") if fin is not None else None
+        x = x.astype("datetime64[ns]")
+    desde = 0 if inicio is None else int(np.searchsorted(x, inicio, side="left"))
+    hasta = len(x) if fin is None else int(np.searchsorted(x, fin, side="right"))
+    return slice(desde, hasta)
+
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Índices del mínimo y máximo de cada bucket (de igual número de puntos).
+
+    Los NaN se ignoran; un bucket formado solo por NaN aporta su primer índice.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_buckets <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if n <= 2 * n_buckets:
+        return np.arange(n, dtype=np.int64)
+
+    tam = n // n_buckets
+    usado = tam * n_buckets
+    bloques = y[:usado].reshape(n_buckets, tam)
+    base = np.arange(n_buckets, dtype=np.int64) * tam
+
+    idx_min = base + np.argmin(np.where(np.isnan(bloques), np.inf, bloques), axis=1)
+    idx_max = base + np.argmax(np.where(np.isnan(bloques), -np.inf, bloques), axis=1)
+    partes = [idx_min, idx_max]
+
+    if usado < n:
+        resto = y[usado:]
+        partes.append(
+            np.array(
+                [
+                    usado + np.argmin(np.where(np.isnan(resto), np.inf, resto)),
+                    usado + np.argmax(np.where(np.isnan(resto), -np.inf, resto)),
+                ],
+                dtype=np.int64,
+            )
+        )
+
+    return np.unique(np.concatenate(partes))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Índices seleccionados por Largest-Triangle-Three-Buckets.
+
+    El primer y último punto se conservan siempre. Cada bucket intermedio se
+    evalúa de forma vectorizada; el bucle es sobre ``n_out`` (≈ píxeles), no
+    sobre el número de puntos.
+    """
+    xf = _como_float(x)
+    yf = np.asarray(y, dtype=np.float64)
+    n = len(xf)
+    if n_out >= n or n_out < 3:
+        return np.arange(n, dtype=np.int64)
+
+    # Límites de los n_out - 2 buckets intermedios
+    bordes = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    seleccion = np.empty(n_out, dtype=np.int64)
+    seleccion[0] = 0
+    seleccion[-1] = n - 1
+
+    # Promedio del bucket siguiente, precalculado para todos los buckets
+    sum_x = np.add.reduceat(xf[1 : n - 1], bordes[:-1] - 1)
+    sum_y = np.add.reduceat(yf[1 : n - 1], bordes[:-1] - 1)
+    cuenta = np.diff(bordes).astype(np.float64)
+    prom_x = np.append(sum_x / cuenta, xf[-1])
+    prom_y = np.append(sum_y / cuenta, yf[-1])
+
+    a = 0
+    for i in range(n_out - 2):
+        desde, hasta = bordes[i], bordes[i + 1]
+        cx = xf[desde:hasta]
+        cy = yf[desde:hasta]
+        area = np.abs(
+            (xf[a] - prom_x[i + 1]) * (cy - yf[a]) - (xf[a] - cx) * (prom_y[i + 1] - yf[a])
+        )
+        a = desde + int(np.argmax(area))
+        seleccion[i + 1] = a
+
+    return seleccion
+
+
+def reducir_serie(
+    x: np.ndarray,
+    y: np.ndarray,
+    ancho_px: int = ANCHO_GRAFICO_PX,
+    calidad: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Índices (ordenados) que representan la serie en ``ancho_px`` píxeles.
+
+    1. Envolvente min/max sobre ``_FACTOR_PRESELECCION * ancho_px`` puntos,
+       para que ningún pico quede entre dos puntos elegidos.
+    2. LTTB sobre esa envolvente hasta ``ancho_px`` puntos.
+    3. Unión con los puntos de calidad anómala (``CODIGOS_CONSERVADOS``).
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= ancho_px:
+        return np.arange(n, dtype=np.int64)
+
+    finitos = np.flatnonzero(np.isfinite(y))
+    if len(finitos) > ancho_px:
+        candidatos = finitos[
+            minmax_indices(y[finitos], _FACTOR_PRESELECCION * ancho_px // 2)
+        ]
+        elegidos = candidatos[lttb_indices(np.asarray(x)[candidatos], y[candidatos], ancho_px)]
+    else:
+        elegidos = finitos
+
+    if calidad is not None:
+        anomalos = np.flatnonzero(np.isin(np.asarray(calidad), CODIGOS_CONSERVADOS))
+        if len(anomalos) > ancho_px:
+            anomalos = anomalos[minmax_indices(y[anomalos], ancho_px // 2)]
+        elegidos = np.union1d(elegidos, anomalos)
+
+    return elegidos
@@ -0,0 +1,341 @@
+"""Análisis espectral de series (vibración, corriente): Welch, espectrograma y
+energía por bandas.
+
+La serie se recorre en bloques (``iter_trend_pages``) y cada bloque se corta
+en ventanas de ``muestras_ventana`` puntos con salto ``(1 - solape)``; todas
+las ventanas de un bloque se transforman de una vez (``np.fft.rfft`` sobre
+una matriz ventanas × muestras), repartidas entre ``ESPECTRO_WORKERS``
+hilos (NumPy libera el GIL en las operaciones sobre arrays grandes). Entre
+bloques se arrastran solo las muestras de la ventana incompleta, así que la
+memoria no depende de la duración del registro.
+
+- Welch: media de las PSD de todas las ventanas válidas.
+- Espectrograma: PSD media por columna de tiempo; el rango se divide en
+  ``ESPECTRO_COLUMNAS`` columnas sea cual sea el número de ventanas. Al
+  dibujarlo, las frecuencias se agrupan hasta ``ESPECTRO_MAX_FRECUENCIAS``.
+- Energía por bandas: integral de la PSD de cada columna en cada banda.
+
+Las ventanas que cruzan un gap temporal se descartan (la FFT supone
+muestreo uniforme); los faltantes sueltos se rellenan con la media de su
+ventana, y las ventanas con más de un ``_MAX_FALTANTES`` de faltantes
+también se descartan. Los resultados se guardan en
+una caché LRU por (despliegue, variable, tabla, rango, versión de datos,
+parámetros, origen) y se calculan como trabajos de ``utils.jobs``. La serie
+sale del backend o, si se importó antes, del almacén local
+(``utils.almacen``).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.api_client import TABLA_CRUDOS
+from utils.calidad import paso_nominal
+
+Arrays = Dict[str, np.ndarray]
+
+VENTANAS = {
+    "hann": np.hanning,
+    "hamming": np.hamming,
+    "rectangular": np.ones,
+}
+
+COLUMNAS = int(os.getenv("ESPECTRO_COLUMNAS", "400"))
+# Filas (frecuencias) del espectrograma dibujado; ver ``agrupar_frecuencias``
+MAX_FRECUENCIAS = int(os.getenv("ESPECTRO_MAX_FRECUENCIAS", "256"))
+WORKERS = int(os.getenv("ESPECTRO_WORKERS", str(os.cpu_count() or 2)))
+# Ventanas por tarea del pool: por debajo no compensa repartir
+_MIN_VENTANAS_TAREA = 64
+# Una ventana es válida si no dura más que esto veces lo esperado
+_TOLERANCIA_GAP = 1.5
+# Fracción máxima de valores faltantes en una ventana válida
+_MAX_FALTANTES = 0.05
+
+
+@dataclass(frozen=True)
+class ParametrosEspectro:
+    muestras_ventana: int = 1024
+    solape: float = 0.5
+    ventana: str = "hann"
+    # Bandas (Hz) para la tendencia de energía; vacío = cuatro bandas iguales
+    bandas: Tuple[Tuple[float, float], ...] = ()
+
+    @property
+    def salto(self) -> int:
+        return max(1, int(round(self.muestras_ventana * (1 - self.solape))))
+
+
+@dataclass
+class Espectro:
+    fs: float  # Hz
+    frecuencias: np.ndarray  # Hz
+    psd: np.ndarray  # Welch, unidades²/Hz
+    tiempos: np.ndarray  # ns, centro de cada columna del espectrograma
+    espectrograma: np.ndarray  # (columnas, frecuencias); NaN si la columna no tiene ventanas
+    energia_bandas: Dict[str, np.ndarray]  # etiqueta → (columnas,)
+    ventanas: int
+    descartadas: int
+    segundos: float
+
+    @property
+    def bytes(self) -> int:
+        return (self.frecuencias.nbytes + self.psd.nbytes + self.tiempos.nbytes
+                + self.espectrograma.nbytes
+                + sum(e.nbytes for e in self.energia_bandas.values()))
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Pool de hilos para las FFT; tamaño por ESPECTRO_WORKERS."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WORKERS,
+                                               thread_name_prefix="espectro")
+    return _executor
+
+
+def psd_ventanas(bloque: np.ndarray, ventana: np.ndarray, fs: float) -> np.ndarray:
+    """PSD unilateral de cada fila de ``bloque`` (ventanas × muestras).
+
+    Los NaN cuentan como la media de su fila (cero tras restarla).
+    """
+    bloque = np.nan_to_num(bloque - np.nanmean(bloque, axis=1, keepdims=True), nan=0.0)
+    espectro = np.fft.rfft(bloque * ventana, axis=1)
+    psd = (espectro.real ** 2 + espectro.imag ** 2) / (fs * np.sum(ventana ** 2))
+    # Unilateral: se duplica todo salvo la componente continua (y Nyquist si existe)
+    fin = None if len(ventana) % 2 else -1
+    psd[:, 1:fin] *= 2
+    return psd
+
+
+class AcumuladorEspectral:
+    """Acumula Welch y espectrograma de una serie bloque a bloque.
+
+    ``desde_ns``/``hasta_ns`` delimitan el rango que se reparte entre las
+    columnas del espectrograma.
+    """
+
+    def __init__(self, parametros: ParametrosEspectro, desde_ns: int, hasta_ns: int,
+                 columnas: int = COLUMNAS):
+        self.parametros = parametros
+        self.desde_ns = desde_ns
+        self.hasta_ns = max(hasta_ns, desde_ns + 1)
+        self.columnas = columnas
+        self.ventana = VENTANAS[parametros.ventana](parametros.muestras_ventana)
+        self.paso: Optional[int] = None
+        self.ventanas = 0
+        self.descartadas = 0
+        self._suma: Optional[np.ndarray] = None
+        self._suma_columnas: Optional[np.ndarray] = None
+        self._cuenta_columnas = np.zeros(columnas, dtype=np.int64)
+        self._cola_ts = np.empty(0, dtype=np.int64)
+        self._cola_valor = np.empty(0, dtype=np.float64)
+
+    @property
+    def fs(self) -> Optional[float]:
+        return 1e9 / self.paso if self.paso else None
+
+    def agregar(self, timestamp: np.ndarray, valor: np.ndarray) -> None:
+        n = self.parametros.muestras_ventana
+        salto = self.parametros.salto
+        ts = np.concatenate([self._cola_ts, np.asarray(timestamp, dtype=np.int64)])
+        valores = np.concatenate([self._cola_valor, np.asarray(valor, dtype=np.float64)])
+        if self.paso is None:
+            self.paso = paso_nominal(ts)
+        if len(ts) < n or not self.paso:
+            self._cola_ts, self._cola_valor = ts, valores
+            return
+
+        inicios = np.arange(0, len(ts) - n + 1, salto)
+        # Las muestras desde la primera ventana incompleta pasan al bloque siguiente
+        siguiente = int(inicios[-1]) + salto
+        self._cola_ts, self._cola_valor = ts[siguiente:], valores[siguiente:]
+
+        duracion = ts[inicios + n - 1] - ts[inicios]
+        nan_acumulados = np.concatenate([[0], np.cumsum(np.isnan(valores))])
+        validas = (
+            (duracion <= _TOLERANCIA_GAP * (n - 1) * self.paso)
+            & (nan_acumulados[inicios + n] - nan_acumulados[inicios] <= _MAX_FALTANTES * n)
+        )
+        self.descartadas += int(np.count_nonzero(~validas))
+        inicios = inicios[validas]
+        if not len(inicios):
+            return
+
+        matriz = np.lib.stride_tricks.sliding_window_view(valores, n)
+        lotes = np.array_split(inicios, max(1, min(WORKERS, len(inicios) // _MIN_VENTANAS_TAREA)))
+        if len(lotes) == 1:
+            psd = psd_ventanas(matriz[inicios], self.ventana, self.fs)
+        else:
+            psd = np.concatenate(list(get_executor().map(
+                lambda lote: psd_ventanas(matriz[lote], self.ventana, self.fs), lotes
+            )))
+
+        if self._suma is None:
+            self._suma = np.zeros(psd.shape[1])
+            self._suma_columnas = np.zeros((self.columnas, psd.shape[1]))
+        self._suma += psd.sum(axis=0)
+        self.ventanas += len(psd)
+
+        # Las ventanas llegan en orden: cada columna es un tramo contiguo
+        centros = (ts[inicios] + ts[inicios + n - 1]) // 2
+        relativo = (centros - self.desde_ns) / (self.hasta_ns - self.desde_ns)
+        columna = np.clip((relativo * self.columnas).astype(np.int64), 0, self.columnas - 1)
+        unicas, primeras, cuentas = np.unique(columna, return_index=True, return_counts=True)
+        self._suma_columnas[unicas] += np.add.reduceat(psd, primeras, axis=0)
+        self._cuenta_columnas[unicas] += cuentas
+
+    def resultado(self, segundos: float = 0.0) -> Espectro:
+        n = self.parametros.muestras_ventana
+        fs = self.fs or 1.0
+        frecuencias = np.fft.rfftfreq(n, d=1 / fs)
+        tiempos = self.desde_ns + (
+            (np.arange(self.columnas) + 0.5) * (self.hasta_ns - self.desde_ns) / self.columnas
+        ).astype(np.int64)
+        if self._suma is None:
+            vacio = np.full((self.columnas, len(frecuencias)), np.nan)
+            return Espectro(fs, frecuencias, np.full(len(frecuencias), np.nan), tiempos, vacio,
+                            {}, 0, self.descartadas, segundos)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            espectrograma = self._suma_columnas / self._cuenta_columnas[:, None]
+        df = frecuencias[1] - frecuencias[0]
+        energia = {}
+        for inferior, superior in bandas_efectivas(self.parametros, fs):
+            en_banda = (frecuencias >= inferior) & (frecuencias < superior)
+            serie = espectrograma[:, en_banda].sum(axis=1) * df
+            serie[self._cuenta_columnas == 0] = np.nan
+            energia[f"{inferior:g}–{superior:g} Hz"] = serie
+        return Espectro(fs, frecuencias, self._suma / self.ventanas, tiempos, espectrograma,
+                        energia, self.ventanas, self.descartadas, segundos)
+
+
+def agrupar_frecuencias(frecuencias: np.ndarray, espectrograma: np.ndarray,
+                        maximo: int = MAX_FRECUENCIAS) -> Tuple[np.ndarray, np.ndarray]:
+    """Espectrograma con como mucho ``maximo`` frecuencias, para dibujarlo.
+
+    Promedia grupos de bins contiguos (la PSD media de un grupo conserva su
+    energía por Hz); con 8192 muestras por ventana serían 4097 filas.
+    """
+    n = len(frecuencias)
+    factor = -(-n // maximo) if maximo > 0 else 1
+    if factor <= 1:
+        return frecuencias, espectrograma
+    grupos = -(-n // factor)
+    relleno = grupos * factor - n
+    frecuencias = np.pad(frecuencias, (0, relleno), constant_values=np.nan)
+    espectrograma = np.pad(espectrograma, ((0, 0), (0, relleno)), constant_values=np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # columnas sin ventanas
+        return (np.nanmean(frecuencias.reshape(grupos, factor), axis=1),
+                np.nanmean(espectrograma.reshape(len(espectrograma), grupos, factor), axis=2))
+
+
+def bandas_efectivas(parametros: ParametrosEspectro, fs: float) -> Tuple[Tuple[float, float], ...]:
+    """Bandas pedidas o, si no hay, cuatro bandas iguales hasta Nyquist."""
+    if parametros.bandas:
+        return parametros.bandas
+    nyquist = fs / 2
+    limites = np.round(np.linspace(0, nyquist, 5), 6)
+    return tuple((float(a), float(b)) for a, b in zip(limites[:-1], limites[1:]))
+
+
+def analizar(bloques, parametros: ParametrosEspectro, desde_ns: int, hasta_ns: int,
+             columnas: int = COLUMNAS, progreso=None) -> Espectro:
+    """Espectro de una serie dada como iterable de bloques ordenados."""
+    inicio = time.perf_counter()
+    acumulador = AcumuladorEspectral(parametros, desde_ns, hasta_ns, columnas)
+    for bloque in bloques:
+        acumulador.agregar(bloque["timestamp"], bloque["valor"])
+        if progreso is not None and len(bloque["timestamp"]):
+            avance = (int(bloque["timestamp"][-1]) - desde_ns) / max(hasta_ns - desde_ns, 1)
+            progreso(min(max(avance, 0.0), 0.99), f"{acumulador.ventanas:,} ventanas")
+    return acumulador.resultado(time.perf_counter() - inicio)
+
+
+# ---------------------------------------------------------------------- caché
+class CacheEspectros:
+    """Espectros calculados ``clave → Espectro``, con expulsión LRU por bytes."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or int(os.getenv("ESPECTRO_CACHE_MB", "128")) * 1024 * 1024
+        self._espectros: "OrderedDict[tuple, Espectro]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: tuple) -> Optional[Espectro]:
+        with self._lock:
+            espectro = self._espectros.get(clave)
+            if espectro is not None:
+                self._espectros.move_to_end(clave)
+            return espectro
+
+    def guardar(self, clave: tuple, espectro: Espectro) -> None:
+        with self._lock:
+            anterior = self._espectros.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior.bytes
+            self._espectros[clave] = espectro
+            self._bytes += espectro.bytes
+            while self._bytes > self.max_bytes and len(self._espectros) > 1:
+                _, expulsado = self._espectros.popitem(last=False)
+                self._bytes -= expulsado.bytes
+
+
+_cache = CacheEspectros()
+
+
+def clave_espectro(despliegue_id: Hashable, variable: str, tabla: str, desde: datetime,
+                   hasta: datetime, version: Hashable, parametros: ParametrosEspectro,
+                   local: bool = False) -> tuple:
+    """Clave de la caché. Con ``local`` la serie se lee del almacén local
+    (``utils.almacen``) y ``version`` debe ser la de su fichero."""
+    return (despliegue_id, variable, tabla, desde, hasta, version, parametros, local)
+
+
+def espectro_en_cache(clave: tuple) -> Optional[Espectro]:
+    return _cache.obtener(clave)
+
+
+def calcular_espectro(progreso, client, clave: tuple, page_size: int = 200_000,
+                      almacen=None) -> Espectro:
+    """Trabajo de ``utils.jobs``: recorre la serie, la analiza y guarda en la caché.
+
+    Las claves ``local`` leen la serie de ``almacen`` en lugar del backend.
+    """
+    espectro = _cache.obtener(clave)
+    if espectro is not None:
+        return espectro
+
+    despliegue_id, variable, tabla, desde, hasta, _, parametros, local = clave
+    if local:
+        bloques = almacen.iter_rango(despliegue_id, variable, tabla or TABLA_CRUDOS, desde, hasta,
+                                     tamano=page_size)
+    else:
+        bloques = client.iter_trend_pages(despliegue_id, variable, desde, hasta,
+                                          tabla=tabla or TABLA_CRUDOS, page_size=page_size)
+    espectro = analizar(
+        bloques,
+        parametros,
+        pd.Timestamp(desde).as_unit("ns").value,
+        pd.Timestamp(hasta).as_unit("ns").value,
+        progreso=progreso,
+    )
+    _cache.guardar(clave, espectro)
+    return espectro
@@ -0,0 +1,220 @@
+"""Exportación de series a CSV comprimido o Parquet en streaming.
+
+Las páginas de ``iter_trend_pages`` se escriben directamente en el fichero
+de salida a medida que llegan, en formato largo (una fila por punto:
+``timestamp, variable, tabla, valor, calidad``), así que la memoria usada
+depende del tamaño de página y no del despliegue. Cada página de cada serie
+se convierte en un bloque de CSV (gzip) o en un row group de Parquet.
+
+Los ficheros viven en ``EXPORT_DIR`` hasta que el usuario los descarta desde
+el panel de trabajos; los que quedan olvidados se borran al lanzar una
+exportación nueva si tienen más de ``EXPORT_TTL_S`` segundos.
+
+Parquet requiere ``pyarrow``; sin él solo está disponible CSV.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except Exception:
+    pa = pq = None
+
+FORMATO_CSV = "csv.gz"
+FORMATO_PARQUET = "parquet"
+
+TIPOS_MIME = {FORMATO_CSV: "application/gzip", FORMATO_PARQUET: "application/vnd.apache.parquet"}
+
+# Directorio de los ficheros generados
+DIRECTORIO_EXPORTACION = os.getenv(
+    "EXPORT_DIR", os.path.join(tempfile.gettempdir(), "sertecpet_exportaciones")
+)
+
+# Antigüedad a partir de la cual se borra un fichero exportado
+TTL_EXPORTACION_S = float(os.getenv("EXPORT_TTL_S", str(24 * 3600)))
+
+_COLUMNAS = ("timestamp", "variable", "tabla", "valor", "calidad")
+
+
+@dataclass
+class ResultadoExportacion:
+    ruta: str
+    formato: str
+    filas: int
+    bytes: int
+    segundos: float
+
+    @property
+    def filas_por_s(self) -> float:
+        return self.filas / self.segundos if self.segundos > 0 else 0.0
+
+    @property
+    def nombre(self) -> str:
+        return os.path.basename(self.ruta)
+
+    @property
+    def tipo_mime(self) -> str:
+        return TIPOS_MIME[self.formato]
+
+    def borrar(self) -> None:
+        try:
+            os.remove(self.ruta)
+        except FileNotFoundError:
+            pass
+
+
+def formatos_disponibles() -> Tuple[str, ...]:
+    return (FORMATO_CSV, FORMATO_PARQUET) if pq is not None else (FORMATO_CSV,)
+
+
+def _filtrar(chunk, calidad: Optional[Sequence[int]]):
+    if calidad is None:
+        return chunk
+    conservar = np.isin(chunk["calidad"], list(calidad))
+    return {k: v[conservar] for k, v in chunk.items()}
+
+
+class _EscritorCSV:
+    """CSV comprimido; cada página se formatea con operaciones vectorizadas.
+
+    Se usa el nivel 1 de gzip: con niveles mayores la compresión pasa a ser
+    el cuello de botella a cambio de ficheros apenas más pequeños.
+    """
+
+    def __init__(self, ruta: str):
+        self._fichero = gzip.open(ruta, "wb", compresslevel=1)
+        self._fichero.write((",".join(_COLUMNAS) + "\n").encode("utf-8"))
+
+    def escribir(self, variable: str, tabla: str, chunk) -> None:
+        fechas = np.datetime_as_string(chunk["timestamp"].view("datetime64[ns]"), unit="ms")
+        lineas = np.char.add(fechas, f",{variable},{tabla},")
+        lineas = np.char.add(lineas, chunk["valor"].astype(str))
+        lineas = np.char.add(lineas, ",")
+        lineas = np.char.add(lineas, chunk["calidad"].astype(str))
+        self._fichero.write(("\n".join(lineas.tolist()) + "\n").encode("utf-8"))
+
+    def cerrar(self) -> None:
+        self._fichero.close()
+
+
+class _EscritorParquet:
+    def __init__(self, ruta: str):
+        self._esquema = pa.schema([
+            ("timestamp", pa.timestamp("ns")),
+            ("variable", pa.dictionary(pa.int32(), pa.string())),
+            ("tabla", pa.dictionary(pa.int32(), pa.string())),
+            ("valor", pa.float64()),
+            ("calidad", pa.int8()),
+        ])
+        self._escritor = pq.ParquetWriter(ruta, self._esquema, compression="zstd")
+
+    def escribir(self, variable: str, tabla: str, chunk) -> None:
+        n = len(chunk["timestamp"])
+        ceros = np.zeros(n, dtype=np.int32)
+        self._escritor.write_table(pa.Table.from_arrays([
+            pa.array(chunk["timestamp"].view("datetime64[ns]")),
+            pa.DictionaryArray.from_arrays(ceros, pa.array([variable])),
+            pa.DictionaryArray.from_arrays(ceros, pa.array([tabla])),
+            pa.array(chunk["valor"]),
+            pa.array(chunk["calidad"]),
+        ], schema=self._esquema))
+
+    def cerrar(self) -> None:
+        self._escritor.close()
+
+
+def exportar(
+    client,
+    despliegue_id: Hashable,
+    pares: Sequence[Tuple[str, str]],
+    ruta: str,
+    formato: str = FORMATO_CSV,
+    ts_from: Optional[datetime] = None,
+    ts_to: Optional[datetime] = None,
+    calidad: Optional[Sequence[int]] = None,
+    page_size: int = 50_000,
+    progreso: Optional[Callable[[float, str], None]] = None,
+) -> ResultadoExportacion:
+    """Escribe las series ``(variable, tabla)`` en ``ruta`` página a página."""
+    if formato == FORMATO_PARQUET and pq is None:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow")
+    escritor = _EscritorParquet(ruta) if formato == FORMATO_PARQUET else _EscritorCSV(ruta)
+
+    inicio = time.perf_counter()
+    filas = 0
+    completo = False
+    try:
+        for i, (variable, tabla) in enumerate(pares):
+            if progreso is not None:
+                progreso(i / len(pares), f"Exportando {variable} ({tabla}) · {filas:,} filas")
+            for chunk in client.iter_trend_pages(
+                despliegue_id, variable, ts_from=ts_from, ts_to=ts_to,
+                tabla=tabla, page_size=page_size
+            ):
+                chunk = _filtrar(chunk, calidad)
+                if len(chunk["timestamp"]):
+                    escritor.escribir(variable, tabla, chunk)
+                    filas += len(chunk["timestamp"])
+        completo = True
+    finally:
+        escritor.cerrar()
+        if not completo and os.path.exists(ruta):
+            os.remove(ruta)  # exportación fallida o cancelada
+
+    return ResultadoExportacion(
+        ruta=ruta,
+        formato=formato,
+        filas=filas,
+        bytes=os.path.getsize(ruta),
+        segundos=time.perf_counter() - inicio,
+    )
+
+
+def limpiar_exportaciones(max_edad_s: float = TTL_EXPORTACION_S) -> int:
+    """Borra los ficheros exportados con más de ``max_edad_s`` segundos."""
+    limite = time.time() - max_edad_s
+    borrados = 0
+    try:
+        entradas = list(os.scandir(DIRECTORIO_EXPORTACION))
+    except FileNotFoundError:
+        return 0
+    for entrada in entradas:
+        try:
+            if entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+                borrados += 1
+        except FileNotFoundError:
+            pass
+    return borrados
+
+
+def ruta_exportacion(despliegue_id: Hashable, formato: str) -> str:
+    os.makedirs(DIRECTORIO_EXPORTACION, exist_ok=True)
+    marca = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(DIRECTORIO_EXPORTACION, f"despliegue_{despliegue_id}_{marca}.{formato}")
+
+
+def exportar_despliegue(progreso, client, despliegue_id: Hashable,
+                        pares: Sequence[Tuple[str, str]], formato: str = FORMATO_CSV,
+                        ts_from: Optional[datetime] = None, ts_to: Optional[datetime] = None,
+                        calidad: Optional[Sequence[int]] = None) -> ResultadoExportacion:
+    """Trabajo de ``utils.jobs``: exporta a un fichero nuevo del directorio de exportación.
+
+    Antes borra las exportaciones caducadas (``limpiar_exportaciones``).
+    """
+    limpiar_exportaciones()
+    return exportar(
+        client, despliegue_id, pares, ruta_exportacion(despliegue_id, formato), formato,
+        ts_from=ts_from, ts_to=ts_to, calidad=calidad, progreso=progreso,
+    )
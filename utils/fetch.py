@@ -0,0 +1,65 @@
+"""Descarga concurrente de series sobre un pool de hilos acotado y compartido.
+
+Las peticiones HTTP liberan el GIL mientras esperan la red, así que lanzar
+todas las consultas (variable, tabla) a la vez hace que la página tarde lo que
+la petición más lenta, no la suma de todas. El pool es único por proceso para
+que muchas sesiones de Streamlit no multipliquen el número de conexiones.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+# Tiempo máximo (s) de una petición individual
+TIMEOUT_PETICION = float(os.getenv("FETCH_TIMEOUT", "30"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Pool de hilos compartido; tamaño máximo por FETCH_MAX_WORKERS."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("FETCH_MAX_WORKERS", "8")),
+                    thread_name_prefix="fetch",
+                )
+    return _executor
+
+
+def en_paralelo(
+    tareas: Dict[Hashable, Callable[[], Any]],
+    timeout: Optional[float] = None,
+) -> Iterator[Tuple[Hashable, Any, Optional[BaseException]]]:
+    """Ejecuta ``tareas`` en el pool y produce ``(clave, resultado, error)``
+    a medida que terminan, para poder dibujar resultados parciales.
+
+    ``timeout`` limita la espera total; las tareas que no terminen a tiempo se
+    producen con un ``TimeoutError`` y se cancelan si aún no habían empezado.
+    """
+    executor = get_executor()
+    futuros: Dict[Future, Hashable] = {
+        executor.submit(funcion): clave for clave, funcion in tareas.items()
+    }
+    pendientes = set(futuros)
+    fin = None if timeout is None else time.monotonic() + timeout
+
+    while pendientes:
+        restante = None if fin is None else max(0.0, fin - time.monotonic())
+        listos, pendientes = wait(pendientes, timeout=restante, return_when=FIRST_COMPLETED)
+        if not listos:
+            break
+        for futuro in listos:
+            error = futuro.exception()
+            yield futuros[futuro], None if error else futuro.result(), error
+
+    for futuro in pendientes:
+        futuro.cancel()
+        yield futuros[futuro], None, TimeoutError("Tiempo de espera agotado")
@@ -0,0 +1,46 @@
+"""Trazas de Plotly que se adaptan al número de puntos.
+
+- Por encima de ``UMBRAL_WEBGL`` puntos una traza se dibuja con
+  ``go.Scattergl`` (WebGL, un solo canvas) en lugar de SVG, que crea un
+  nodo del DOM por punto y marcador.
+- Por encima de ``UMBRAL_MARCADORES`` los marcadores se omiten: en una traza
+  densa no se distinguen y son la mayor parte del coste de dibujo.
+- ``figura_apilada`` dibuja varias variables como subgráficos con un único
+  eje de tiempo compartido: una figura y un payload en lugar de uno por
+  variable, y el zoom o desplazamiento en uno se aplica a todos.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Optional, Sequence
+
+import plotly.graph_objects as go
+
+UMBRAL_WEBGL = int(os.getenv("GRAFICO_UMBRAL_WEBGL", "1000"))
+UMBRAL_MARCADORES = int(os.getenv("GRAFICO_UMBRAL_MARCADORES", "300"))
+
+# Alto de cada variable en una figura apilada
+ALTO_FILA_PX = 260
+
+
+def traza(x, y, n: Optional[int] = None, marcadores: bool = False, **kwargs):
+    """``go.Scatter`` o ``go.Scattergl`` según los puntos; ``mode`` se ajusta solo."""
+    n = len(x) if n is None else n
+    if "mode" not in kwargs:
+        kwargs["mode"] = "lines+markers" if marcadores and n <= UMBRAL_MARCADORES else "lines"
+    clase = go.Scattergl if n > UMBRAL_WEBGL else go.Scatter
+    return clase(x=x, y=y, **kwargs)
+
+
+def figura_apilada(variables: Sequence[str], rango_x=None, titulo: Optional[str] = None):
+    """Figura vacía con una fila por variable y el eje de tiempo enlazado."""
+    from plotly.subplots import make_subplots
+
+    filas = max(1, len(variables))
+    fig = make_subplots(rows=filas, cols=1, shared_xaxes=True, vertical_spacing=0.04,
+                        subplot_titles=list(variables))
+    fig.update_layout(title=titulo, height=ALTO_FILA_PX * filas + 80, hovermode="x unified")
+    fig.update_xaxes(range=list(rango_x) if rango_x is not None else None)
+    fig.update_xaxes(title_text="Fecha/Hora", row=filas, col=1)
+    return fig
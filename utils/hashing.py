@@ -0,0 +1,119 @@
+"""bcrypt work off the Streamlit script threads.
+
+A bcrypt check costs ~250 ms of CPU. Running it inline means a burst of
+logins (shift change) competes with every other session's rerun for the
+same interpreter. Here checks and hashes run in a process pool so they
+scale across cores, behind a concurrency cap so a login storm queues
+instead of piling up, with queue-time metrics.
+
+This module only imports bcrypt so spawned workers start quickly.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+try:
+    import bcrypt  # type: ignore
+except Exception:
+    bcrypt = None
+
+
+class HashQueueFull(Exception):
+    """Too many password operations waiting; the caller should retry later."""
+
+
+@dataclass
+class HashMetrics:
+    submitted: int = 0
+    rejected: int = 0
+    in_flight: int = 0
+    queue_seconds_total: float = 0.0
+    queue_seconds_max: float = 0.0
+    work_seconds_total: float = 0.0
+
+
+def _checkpw(plain_password: str, stored_password: str) -> Tuple[bool, float, float]:
+    """Worker: returns (match, started_at, finished_at) as wall-clock times."""
+    started = time.time()
+    try:
+        ok = bcrypt.checkpw(plain_password.encode("utf-8"), stored_password.encode("utf-8"))
+    except Exception:
+        ok = False
+    return ok, started, time.time()
+
+
+def _hashpw(plain_password: str) -> Tuple[str, float, float]:
+    started = time.time()
+    hashed = bcrypt.hashpw(plain_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return hashed, started, time.time()
+
+
+class HashPool:
+    def __init__(self, workers: int, max_concurrent: int, queue_timeout: float):
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.queue_timeout = queue_timeout
+        self.metrics = HashMetrics()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.metrics.rejected += 1
+            raise HashQueueFull("Demasiados inicios de sesión simultáneos")
+
+        submitted = time.time()
+        with self._lock:
+            self.metrics.submitted += 1
+            self.metrics.in_flight += 1
+        try:
+            result, started, finished = self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.metrics.in_flight -= 1
+            self._slots.release()
+
+        queued = max(0.0, started - submitted)
+        with self._lock:
+            self.metrics.queue_seconds_total += queued
+            self.metrics.queue_seconds_max = max(self.metrics.queue_seconds_max, queued)
+            self.metrics.work_seconds_total += finished - started
+        return result
+
+    def checkpw(self, plain_password: str, stored_password: str) -> bool:
+        return self._run(_checkpw, plain_password, stored_password)
+
+    def hashpw(self, plain_password: str) -> str:
+        return self._run(_hashpw, plain_password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return asdict(self.metrics)
+
+
+_pool: Optional[HashPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_hash_pool() -> HashPool:
+    """Process-wide pool sized from AUTH_HASH_WORKERS / AUTH_HASH_MAX_CONCURRENT."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = int(os.getenv("AUTH_HASH_WORKERS", str(os.cpu_count() or 2)))
+                _pool = HashPool(
+                    workers=workers,
+                    max_concurrent=int(os.getenv("AUTH_HASH_MAX_CONCURRENT", str(workers * 4))),
+                    queue_timeout=float(os.getenv("AUTH_HASH_QUEUE_TIMEOUT", "10")),
+                )
+    return _pool
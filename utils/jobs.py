@@ -0,0 +1,283 @@
+"""Trabajos en segundo plano con prioridad, límite de concurrencia y progreso.
+
+Procesar o reprocesar un despliegue tarda minutos; hacerlo dentro del rerun
+de Streamlit bloquea la sesión del usuario todo ese tiempo. Aquí ``enviar``
+devuelve un id inmediatamente, los trabajos esperan en una cola de prioridad
+y un número fijo de hilos (``JOBS_MAX_CONCURRENT``) los ejecuta. La interfaz
+solo consulta ``estado(id)``, una copia ligera con porcentaje, etapa y ETA.
+
+La función de cada trabajo recibe como primer argumento un ``Progreso`` para
+informar de su avance: ``progreso(0.4, "Generando agregados")``.
+
+Los resultados de los trabajos terminados ocupan como mucho
+``JOBS_RESULTADOS_MB``: al superarse se liberan los más antiguos (el trabajo
+sigue en el historial, sin resultado). La interfaz libera además los de su
+sesión con ``liberar`` cuando ya no los necesita.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+PRIORIDAD_ALTA = 0
+PRIORIDAD_NORMAL = 5
+PRIORIDAD_BAJA = 9
+
+EN_COLA = "en_cola"
+EJECUTANDO = "ejecutando"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+
+TERMINALES = (COMPLETADO, ERROR, CANCELADO)
+
+
+@dataclass
+class Trabajo:
+    id: str
+    nombre: str
+    prioridad: int
+    estado: str = EN_COLA
+    progreso: float = 0.0
+    etapa: str = "En cola"
+    creado: float = field(default_factory=time.time)
+    iniciado: Optional[float] = None
+    terminado: Optional[float] = None
+    error: Optional[str] = None
+    resultado: Any = None
+    # Identifica trabajos equivalentes (ver ``enviar``)
+    clave: Optional[Hashable] = None
+    # El resultado se liberó para no superar JOBS_RESULTADOS_MB
+    liberado: bool = False
+
+    @property
+    def activo(self) -> bool:
+        return self.estado not in TERMINALES
+
+    @property
+    def eta_s(self) -> Optional[float]:
+        """Segundos restantes estimados a partir del ritmo observado."""
+        if self.estado != EJECUTANDO or self.iniciado is None or self.progreso <= 0:
+            return None
+        transcurrido = time.time() - self.iniciado
+        return transcurrido * (1 - self.progreso) / self.progreso
+
+
+def _tamano(valor: Any, profundidad: int = 4) -> int:
+    """Bytes aproximados de un resultado: arrays, bytes y sus contenedores."""
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if profundidad <= 0:
+        return 0
+    if isinstance(valor, dict):
+        valores = list(valor.values())
+    elif isinstance(valor, (list, tuple)):
+        valores = list(valor)
+    elif hasattr(valor, "__dict__"):
+        valores = list(vars(valor).values())
+    else:
+        return 0
+    return sum(_tamano(v, profundidad - 1) for v in valores)
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza desde ``Progreso`` cuando el trabajo fue cancelado."""
+
+
+class Progreso:
+    """Callback que recibe la función del trabajo para informar su avance."""
+
+    def __init__(self, planificador: "PlanificadorTrabajos", trabajo_id: str):
+        self._planificador = planificador
+        self._id = trabajo_id
+
+    def __call__(self, fraccion: float, etapa: Optional[str] = None) -> None:
+        self._planificador._actualizar(self._id, fraccion, etapa)
+
+
+class PlanificadorTrabajos:
+    def __init__(self, max_concurrentes: int, historial: int = 200,
+                 max_bytes_resultados: Optional[int] = None):
+        self._cola: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._trabajos: "OrderedDict[str, Trabajo]" = OrderedDict()
+        self._funciones: Dict[str, tuple] = {}
+        self._cancelados: set = set()
+        self._lock = threading.Lock()
+        self._secuencia = itertools.count()
+        self._historial = historial
+        self.max_bytes_resultados = max_bytes_resultados or (
+            int(os.getenv("JOBS_RESULTADOS_MB", "256")) * 1024 * 1024
+        )
+        # Bytes de cada resultado retenido, en orden de terminación
+        self._tamanos: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes_resultados = 0
+        self.max_concurrentes = max_concurrentes
+        self._hilos = [
+            threading.Thread(target=self._bucle, name=f"job-{i}", daemon=True)
+            for i in range(max_concurrentes)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    # ------------------------------------------------------------------ API
+    def enviar(
+        self,
+        nombre: str,
+        funcion: Callable[..., Any],
+        *args,
+        prioridad: int = PRIORIDAD_NORMAL,
+        al_terminar: Optional[Callable[[Trabajo], None]] = None,
+        clave: Optional[Hashable] = None,
+        **kwargs,
+    ) -> str:
+        """Encola ``funcion(progreso, *args, **kwargs)`` y devuelve su id.
+
+        Si hay un trabajo activo con la misma ``clave`` no se encola otro:
+        se devuelve el id del existente.
+        """
+        trabajo = Trabajo(id=uuid.uuid4().hex[:12], nombre=nombre, prioridad=prioridad,
+                          clave=clave)
+        with self._lock:
+            if clave is not None:
+                for existente in self._trabajos.values():
+                    if existente.activo and existente.clave == clave:
+                        return existente.id
+            self._trabajos[trabajo.id] = trabajo
+            self._funciones[trabajo.id] = (funcion, args, kwargs, al_terminar)
+            self._podar()
+        self._cola.put((prioridad, next(self._secuencia), trabajo.id))
+        return trabajo.id
+
+    def estado(self, trabajo_id: str) -> Optional[Trabajo]:
+        """Copia del estado actual (segura para leer desde la interfaz)."""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return replace(trabajo) if trabajo else None
+
+    def trabajos(self, solo_activos: bool = False) -> List[Trabajo]:
+        with self._lock:
+            return [
+                replace(t) for t in self._trabajos.values() if t.activo or not solo_activos
+            ]
+
+    def cancelar(self, trabajo_id: str) -> None:
+        """Cancela un trabajo en cola; uno en ejecución se detiene en su
+        siguiente llamada a ``progreso``."""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            if trabajo is None or not trabajo.activo:
+                return
+            if trabajo.estado == EN_COLA:
+                # ``_bucle`` lo descarta al sacarlo de la cola
+                trabajo.estado = CANCELADO
+                trabajo.etapa = "Cancelado"
+                trabajo.terminado = time.time()
+            else:
+                self._cancelados.add(trabajo_id)
+
+    def liberar(self, trabajo_id: str) -> None:
+        """Suelta el resultado de un trabajo terminado que ya se consumió."""
+        with self._lock:
+            self._soltar_resultado(trabajo_id)
+
+    # ------------------------------------------------------------------ interno
+    def _podar(self) -> None:
+        terminados = [t.id for t in self._trabajos.values() if not t.activo]
+        for trabajo_id in terminados[: max(0, len(terminados) - self._historial)]:
+            self._soltar_resultado(trabajo_id)
+            del self._trabajos[trabajo_id]
+
+    def _soltar_resultado(self, trabajo_id: str) -> None:
+        self._bytes_resultados -= self._tamanos.pop(trabajo_id, 0)
+        trabajo = self._trabajos.get(trabajo_id)
+        if trabajo is not None and trabajo.resultado is not None:
+            trabajo.resultado = None
+            trabajo.liberado = True
+
+    def _retener_resultado(self, trabajo_id: str, tamano: int) -> None:
+        """Anota el resultado y libera los más antiguos si se supera el límite."""
+        self._tamanos[trabajo_id] = tamano
+        self._bytes_resultados += tamano
+        while self._bytes_resultados > self.max_bytes_resultados and len(self._tamanos) > 1:
+            self._soltar_resultado(next(iter(self._tamanos)))
+
+    def _actualizar(self, trabajo_id: str, fraccion: float, etapa: Optional[str]) -> None:
+        with self._lock:
+            if trabajo_id in self._cancelados:
+                raise TrabajoCancelado()
+            trabajo = self._trabajos[trabajo_id]
+            trabajo.progreso = min(1.0, max(0.0, float(fraccion)))
+            if etapa is not None:
+                trabajo.etapa = etapa
+
+    def _bucle(self) -> None:
+        while True:
+            _, _, trabajo_id = self._cola.get()
+            with self._lock:
+                trabajo = self._trabajos.get(trabajo_id)
+                funcion, args, kwargs, al_terminar = self._funciones.pop(trabajo_id, (None,) * 4)
+                if trabajo is None or trabajo.estado != EN_COLA:
+                    continue
+                trabajo.estado = EJECUTANDO
+                trabajo.etapa = "Iniciando"
+                trabajo.iniciado = time.time()
+
+            try:
+                resultado = funcion(Progreso(self, trabajo_id), *args, **kwargs)
+                estado, error, etapa = COMPLETADO, None, "Completado"
+            except TrabajoCancelado:
+                resultado, estado, error, etapa = None, CANCELADO, None, "Cancelado"
+            except Exception as e:
+                resultado, estado, error, etapa = None, ERROR, f"{e}", "Error"
+                log.exception("Falló el trabajo %s (%s)", trabajo_id, trabajo.nombre)
+
+            tamano = _tamano(resultado)
+            with self._lock:
+                self._cancelados.discard(trabajo_id)
+                trabajo.estado = estado
+                trabajo.etapa = etapa
+                trabajo.error = error
+                trabajo.resultado = resultado
+                trabajo.terminado = time.time()
+                if estado == COMPLETADO:
+                    trabajo.progreso = 1.0
+                if resultado is not None:
+                    self._retener_resultado(trabajo_id, tamano)
+                final = replace(trabajo)
+
+            if al_terminar is not None:
+                try:
+                    al_terminar(final)
+                except Exception:
+                    log.exception("Falló al_terminar del trabajo %s (%s)", trabajo_id, trabajo.nombre)
+
+
+_planificador: Optional[PlanificadorTrabajos] = None
+_planificador_lock = threading.Lock()
+
+
+def get_planificador() -> PlanificadorTrabajos:
+    """Planificador único por proceso; concurrencia por JOBS_MAX_CONCURRENT."""
+    global _planificador
+    if _planificador is None:
+        with _planificador_lock:
+            if _planificador is None:
+                _planificador = PlanificadorTrabajos(
+                    max_concurrentes=int(os.getenv("JOBS_MAX_CONCURRENT", "2"))
+                )
+    return _planificador
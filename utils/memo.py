@@ -0,0 +1,118 @@
+"""Memoización por contenido de las etapas del pipeline.
+
+Cada etapa de un bloque se identifica por una cadena de hashes:
+
+    clave_0 = hash(variable, timestamps y valores crudos del bloque)
+    clave_i = hash(clave_{i-1}, nombre de la etapa i, parámetros de la etapa i)
+
+Así, cambiar un parámetro invalida solo su etapa y las posteriores, y un
+bloque cuyos datos crudos cambiaron (p. ej. el último día de un despliegue
+en curso) invalida solo su propia cadena. Los resultados se guardan en
+memoria con expulsión LRU por tamaño (``PIPELINE_MEMO_MB``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+Arrays = Dict[str, np.ndarray]
+
+
+def hash_bloque(bloque: Arrays, variable: Optional[str]) -> str:
+    """Hash del contenido crudo de un bloque (timestamps y valores)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(variable).encode("utf-8"))
+    for columna in ("timestamp", "valor"):
+        h.update(np.ascontiguousarray(bloque[columna]).tobytes())
+    return h.hexdigest()
+
+
+def hash_etapa(clave_entrada: str, nombre: str, parametros: Tuple[Hashable, ...]) -> str:
+    """Clave de la salida de una etapa a partir de su entrada y su configuración."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(clave_entrada.encode("ascii"))
+    h.update(repr((nombre, parametros)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _tamano(valor: Any) -> int:
+    datos = valor[0] if isinstance(valor, tuple) else valor
+    if isinstance(datos, dict):
+        return sum(a.nbytes for a in datos.values() if isinstance(a, np.ndarray))
+    return 0
+
+
+class MemoEtapas:
+    """Resultados de etapas ``clave → valor`` con expulsión LRU por bytes."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or int(os.getenv("PIPELINE_MEMO_MB", "512")) * 1024 * 1024
+        self._entradas: "OrderedDict[str, Any]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave: str) -> Any:
+        with self._lock:
+            valor = self._entradas.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave: str, valor: Any) -> None:
+        tamano = _tamano(valor)
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= _tamano(anterior)
+            self._entradas[clave] = valor
+            self._bytes += tamano
+            while self._bytes > self.max_bytes and self._entradas:
+                _, expulsado = self._entradas.popitem(last=False)
+                self._bytes -= _tamano(expulsado)
+
+    def ultima_disponible(self, claves: Sequence[str]) -> Tuple[int, Any]:
+        """Índice y valor de la última clave de la cadena que está guardada.
+
+        Devuelve ``(-1, None)`` si no hay ninguna.
+        """
+        for indice in range(len(claves) - 1, -1, -1):
+            valor = self.obtener(claves[indice])
+            if valor is not None:
+                return indice, valor
+        return -1, None
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    @property
+    def bytes_usados(self) -> int:
+        return self._bytes
+
+
+_memo: Optional[MemoEtapas] = None
+_memo_lock = threading.Lock()
+
+
+def get_memo() -> MemoEtapas:
+    """Memo compartida por todos los reprocesamientos del proceso."""
+    global _memo
+    if _memo is None:
+        with _memo_lock:
+            if _memo is None:
+                _memo = MemoEtapas()
+    return _memo
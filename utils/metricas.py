@@ -0,0 +1,284 @@
+"""Instrumentación de rendimiento: histogramas de latencia y de tamaños.
+
+Uso::
+
+    with medir("api_peticion_segundos", endpoint="/api/despliegues"):
+        ...
+
+    @medido("grafico_segundos", grafico="tendencia")
+    def dibujar(...): ...
+
+    observar("api_respuesta_bytes", len(response.content), endpoint=...)
+
+Con la instrumentación desactivada (``METRICAS=0``, por defecto) ``medir``
+devuelve un context manager vacío compartido y ``medido`` solo comprueba
+una bandera, así que el coste es prácticamente nulo. Se puede activar en
+caliente desde el panel de administración (``activar``).
+
+Las métricas se exportan en formato de texto de Prometheus:
+
+- ``METRICAS_PUERTO``: sirve ``/metrics`` en ese puerto desde un hilo, en
+  ``METRICAS_HOST`` (por defecto 127.0.0.1; 0.0.0.0 para exponerlo fuera).
+- ``METRICAS_ARCHIVO``: reescribe ese fichero cada ``METRICAS_INTERVALO_S``
+  segundos (para el textfile collector de node_exporter).
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+PREFIJO = "sertecpet_"
+
+BUCKETS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_BYTES = (1e2, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+_activo = os.getenv("METRICAS", "0") == "1"
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+
+
+class Histograma:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.cuentas = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.cuentas[bisect.bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def percentil(self, q: float) -> float:
+        """Estimación por interpolación lineal dentro del bucket, como Prometheus."""
+        if not self.total:
+            return math.nan
+        objetivo = q * self.total
+        acumulado = 0
+        for i, cuenta in enumerate(self.cuentas):
+            if acumulado + cuenta >= objetivo and cuenta:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                inferior = self.buckets[i - 1] if i else 0.0
+                return inferior + (self.buckets[i] - inferior) * (objetivo - acumulado) / cuenta
+            acumulado += cuenta
+        return self.buckets[-1]
+
+
+class Registro:
+    def __init__(self):
+        self._histogramas: Dict[Tuple[str, Etiquetas], Histograma] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, nombre: str, valor: float, etiquetas: Etiquetas) -> None:
+        clave = (nombre, etiquetas)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                buckets = BUCKETS_BYTES if nombre.endswith("_bytes") else BUCKETS_SEGUNDOS
+                histograma = self._histogramas[clave] = Histograma(buckets)
+            histograma.observar(valor)
+
+    def resumen(self) -> List[dict]:
+        """Una fila por serie: nombre, etiquetas, total, media, p50, p95, p99."""
+        with self._lock:
+            filas = []
+            for (nombre, etiquetas), h in sorted(self._histogramas.items()):
+                filas.append({
+                    "metrica": nombre,
+                    "etiquetas": ", ".join(f"{k}={v}" for k, v in etiquetas),
+                    "total": h.total,
+                    "media": h.suma / h.total if h.total else math.nan,
+                    "p50": h.percentil(0.50),
+                    "p95": h.percentil(0.95),
+                    "p99": h.percentil(0.99),
+                })
+            return filas
+
+    def prometheus(self) -> str:
+        with self._lock:
+            lineas: List[str] = []
+            nombres_vistos = set()
+            for (nombre, etiquetas), h in sorted(self._histogramas.items()):
+                completo = PREFIJO + nombre
+                if completo not in nombres_vistos:
+                    nombres_vistos.add(completo)
+                    lineas.append(f"# TYPE {completo} histogram")
+                base = [f'{k}="{_escapar(v)}"' for k, v in etiquetas]
+                acumulado = 0
+                for limite, cuenta in zip(list(h.buckets) + [math.inf], h.cuentas):
+                    acumulado += cuenta
+                    le = "+Inf" if limite == math.inf else repr(float(limite))
+                    etiquetas_bucket = ",".join(base + ['le="%s"' % le])
+                    lineas.append(f"{completo}_bucket{{{etiquetas_bucket}}} {acumulado}")
+                sufijo = "{" + ",".join(base) + "}" if base else ""
+                lineas.append(f"{completo}_sum{sufijo} {h.suma!r}")
+                lineas.append(f"{completo}_count{sufijo} {h.total}")
+            return "\n".join(lineas) + "\n"
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._histogramas.clear()
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registro = Registro()
+
+
+def activo() -> bool:
+    return _activo
+
+
+def activar(valor: bool = True) -> None:
+    global _activo
+    _activo = bool(valor)
+
+
+def _etiquetas(etiquetas: dict) -> Etiquetas:
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def observar(nombre: str, valor: float, **etiquetas) -> None:
+    if _activo:
+        registro.observar(nombre, valor, _etiquetas(etiquetas))
+
+
+class _Nulo:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _Nulo()
+
+
+@contextmanager
+def _medir(nombre: str, etiquetas: dict) -> Iterator[None]:
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro.observar(nombre, time.perf_counter() - inicio, _etiquetas(etiquetas))
+
+
+def medir(nombre: str, **etiquetas):
+    """Context manager que registra la duración del bloque en segundos."""
+    if not _activo:
+        return _NULO
+    return _medir(nombre, etiquetas)
+
+
+def medido(nombre: str, **etiquetas):
+    """Decorador equivalente a envolver la función en ``medir``."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activo:
+                return funcion(*args, **kwargs)
+            with _medir(nombre, etiquetas):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+class SesionMedida(requests.Session):
+    """``requests.Session`` que mide cada petición por método y endpoint.
+
+    Registra ``api_peticion_segundos`` (hasta recibir las cabeceras, o el
+    cuerpo completo si no es streaming) y ``api_respuesta_bytes``.
+    """
+
+    def __init__(self, base_url: str = ""):
+        super().__init__()
+        self.base_url = base_url
+
+    def request(self, method, url, *args, **kwargs):
+        if not _activo:
+            return super().request(method, url, *args, **kwargs)
+        endpoint = str(url)[len(self.base_url):] if str(url).startswith(self.base_url) else str(url)
+        etiquetas = _etiquetas({"metodo": method.upper(), "endpoint": endpoint.split("?")[0]})
+        inicio = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            registro.observar("api_errores_segundos", time.perf_counter() - inicio, etiquetas)
+            raise
+        registro.observar("api_peticion_segundos", time.perf_counter() - inicio, etiquetas)
+        if not kwargs.get("stream"):
+            registro.observar("api_respuesta_bytes", len(response.content), etiquetas)
+        elif response.headers.get("Content-Length"):
+            registro.observar("api_respuesta_bytes", int(response.headers["Content-Length"]), etiquetas)
+        return response
+
+
+# ---------------------------------------------------------------------- exportación
+class _Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = registro.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def escribir_archivo(ruta: str) -> None:
+    """Escribe el texto de Prometheus de forma atómica (rename)."""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as fichero:
+        fichero.write(registro.prometheus())
+    os.replace(temporal, ruta)
+
+
+_exportadores_iniciados = False
+_exportadores_lock = threading.Lock()
+
+
+def iniciar_exportadores() -> None:
+    """Arranca (una vez por proceso) el endpoint y/o el fichero configurados."""
+    global _exportadores_iniciados
+    with _exportadores_lock:
+        if _exportadores_iniciados:
+            return
+        _exportadores_iniciados = True
+
+    puerto: Optional[str] = os.getenv("METRICAS_PUERTO")
+    if puerto:
+        host = os.getenv("METRICAS_HOST", "127.0.0.1")
+        servidor = ThreadingHTTPServer((host, int(puerto)), _Manejador)
+        threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+
+    ruta = os.getenv("METRICAS_ARCHIVO")
+    if ruta:
+        intervalo = float(os.getenv("METRICAS_INTERVALO_S", "15"))
+
+        def bucle():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    escribir_archivo(ruta)
+                except OSError:
+                    pass
+
+        threading.Thread(target=bucle, name="metricas-archivo", daemon=True).start()
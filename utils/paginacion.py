@@ -0,0 +1,112 @@
+"""Páginas de la tabla de "Datos Tabulares" con paginación keyset.
+
+Una página son las primeras ``filas`` marcas de tiempo posteriores (o
+anteriores, en orden descendente) a la clave de la página anterior, sobre la
+unión de todas las series seleccionadas. Basta pedir ``filas`` puntos de cada
+serie a partir de la clave para cubrir la página, así que cada salto cuesta
+lo mismo en la primera página que en la millonésima y en memoria solo vive
+la página visible (y la siguiente, precargada en segundo plano).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.api_client import TABLA_PROCESADOS
+from utils.fetch import TIMEOUT_PETICION, en_paralelo
+
+
+@dataclass
+class Pagina:
+    datos: pd.DataFrame
+    siguiente: Optional[int]  # clave (ns) de la página siguiente; None si es la última
+
+
+def nombre_columna(variable: str, tabla: str) -> str:
+    return f"{variable} (procesado)" if tabla == TABLA_PROCESADOS else variable
+
+
+def leer_pagina(client, despliegue_id: Hashable, pares: Sequence[Tuple[str, str]],
+                rango_fechas, despues_de: Optional[int] = None, orden: str = "asc",
+                calidad: Optional[Sequence[int]] = None, filas: int = 500) -> Pagina:
+    """Lee una página de las series ``(variable, tabla)`` unidas por timestamp.
+
+    Cada serie aporta su columna de valor y su columna de calidad.
+    """
+    desde, hasta = rango_fechas
+    tareas = {
+        par: (lambda par=par: client.get_trend_page(
+            despliegue_id, par[0], tabla=par[1], ts_from=desde, ts_to=hasta,
+            despues_de=despues_de, orden=orden, calidad=calidad,
+            page_size=filas, timeout=TIMEOUT_PETICION
+        ))
+        for par in pares
+    }
+
+    columnas: List[pd.DataFrame] = []
+    hay_mas = False
+    # Último timestamp de las series que tienen más puntos: puede tener más
+    # filas que no han llegado
+    fronteras = set()
+    for (variable, tabla), chunk, error in en_paralelo(tareas, timeout=TIMEOUT_PETICION):
+        if error is not None:
+            raise error
+        chunk, mas = chunk
+        hay_mas |= mas
+        if mas and len(chunk["timestamp"]):
+            fronteras.add(int(chunk["timestamp"][-1]))
+        nombre = nombre_columna(variable, tabla)
+        # Un timestamp repetido en una serie se alinea por orden de aparición
+        ts = pd.Series(chunk["timestamp"])
+        columnas.append(pd.DataFrame(
+            {nombre: chunk["valor"], f"{nombre} · calidad": chunk["calidad"]},
+            index=pd.MultiIndex.from_arrays([ts, ts.groupby(ts).cumcount()]),
+        ))
+
+    if not columnas:
+        return Pagina(pd.DataFrame(), None)
+    union = pd.concat(columnas, axis=1).sort_index(ascending=(orden != "desc"))
+    ts = np.asarray(union.index.get_level_values(0), dtype=np.int64)
+    corte = min(filas, len(union))
+    # La página siguiente empieza después del último timestamp de esta: si
+    # quedan filas con ese timestamp (cortadas o sin descargar), se pasa
+    # todo el grupo a la siguiente. Un grupo de más de ``filas`` filas se
+    # muestra entero aquí.
+    if corte:
+        ultimo = ts[corte - 1]
+        if (corte < len(union) and ts[corte] == ultimo) or ultimo in fronteras:
+            grupo = int(np.flatnonzero(ts == ultimo)[0])
+            corte = grupo if grupo else int(np.flatnonzero(ts == ultimo)[-1]) + 1
+    datos = union.iloc[:corte]
+    datos.index = pd.DatetimeIndex(ts[:corte].view("datetime64[ns]"), name="timestamp")
+    quedan = hay_mas or corte < len(union)
+    siguiente = int(ts[corte - 1]) if quedan and corte else None
+    return Pagina(datos, siguiente)
+
+
+_precarga: Optional[ThreadPoolExecutor] = None
+_precarga_lock = threading.Lock()
+
+
+def precargar(*args, **kwargs) -> Future:
+    """Lanza ``leer_pagina`` en segundo plano y devuelve su ``Future``.
+
+    Usa su propio pool (``TABLA_PRECARGA_WORKERS``): ``leer_pagina`` espera
+    a tareas del pool de descargas y no debe ocupar uno de sus hilos.
+    """
+    global _precarga
+    if _precarga is None:
+        with _precarga_lock:
+            if _precarga is None:
+                _precarga = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("TABLA_PRECARGA_WORKERS", "2")),
+                    thread_name_prefix="precarga",
+                )
+    return _precarga.submit(leer_pagina, *args, **kwargs)
@@ -0,0 +1,486 @@
+"""Pipeline de reprocesamiento de series (opciones de "Configuración Avanzada").
+
+Etapas, en orden:
+
+1. Outliers: los puntos marcados por ``utils.calidad.clasificar`` (IQR o k·σ)
+   y los físicamente imposibles pasan a NaN.
+2. Imputación de NaN: lineal, forward fill, media o KNN temporal.
+3. Resample a una frecuencia fija (media por bucket), opcional.
+4. Tratamiento de gaps largos: los buckets vacíos del resample se
+   interpolan, se dejan como NaN o se rellenan con el último valor.
+
+Las tres primeras son operaciones NumPy sobre un bloque completo. Las series
+se trocean en bloques de tiempo (``BLOQUE_S``, alineados a la frecuencia de
+resample) y los pares (variable, bloque) se reparten en un pool de procesos,
+así que reprocesar un despliegue escala con los núcleos disponibles. Su
+salida se memoiza por contenido (``utils.memo``): tras cambiar un parámetro
+solo se recalculan esa etapa y las siguientes, y tras llegar datos nuevos
+solo los bloques cuyo contenido crudo cambió.
+
+Un gap puede empezar en un bloque y acabar en otro, así que la cuarta etapa
+(``CosturaGaps``) recorre los bloques de cada serie en orden: añade los
+buckets vacíos de la costura entre bloques y retiene la cola de NaN de un
+bloque hasta conocer el siguiente valor válido. La serie resultante se
+entrega por trozos (``salida``) en lugar de acumularse en memoria;
+``reprocesar`` la guarda en el almacén local (``utils.almacen``).
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.api_client import TABLA_CRUDOS
+from utils.calidad import FALTANTE, IMPOSIBLE, OUTLIER, clasificar
+from utils.memo import MemoEtapas, get_memo, hash_bloque, hash_etapa
+
+Arrays = Dict[str, np.ndarray]
+
+# Tabla del almacén local donde ``reprocesar`` guarda las series resultantes
+TABLA_REPROCESADOS = "mediciones_reprocesadas"
+
+# Duración de cada bloque de trabajo, en segundos
+BLOQUE_S = int(os.getenv("PIPELINE_BLOQUE_S", str(24 * 3600)))
+
+_NS = 1_000_000_000
+
+IMPUTACIONES = {"Lineal": "lineal", "Forward Fill": "ffill", "KNN": "knn", "Media": "media"}
+UMBRALES = {"IQR Automático": ("iqr", 1.5), "2σ": ("sigma", 2.0), "3σ": ("sigma", 3.0)}
+FRECUENCIAS_S = {"15 minutos": 900, "30 minutos": 1800, "1 hora": 3600, "Mantener original": None}
+TRATAMIENTOS_GAPS = {
+    "Interpolar": "interpolar",
+    "Dejar como NaN": "nan",
+    "Rellenar con último valor": "ffill",
+}
+
+
+@dataclass(frozen=True)
+class ConfigProceso:
+    imputacion: str = "lineal"
+    metodo_outliers: str = "iqr"
+    k_outliers: float = 1.5
+    resample_s: Optional[int] = 900
+    tratamiento_gaps: str = "interpolar"
+    vecinos_knn: int = 5
+
+    @classmethod
+    def desde_formulario(cls, metodo_imputacion: str, umbral_outliers: str,
+                         freq_resample: str, tratamiento_gaps: str,
+                         sigma_personalizado: float = 3.0) -> "ConfigProceso":
+        """Traduce las opciones del formulario ``config_reproceso``."""
+        metodo, k = UMBRALES.get(umbral_outliers, ("sigma", sigma_personalizado))
+        return cls(
+            imputacion=IMPUTACIONES[metodo_imputacion],
+            metodo_outliers=metodo,
+            k_outliers=float(k),
+            resample_s=FRECUENCIAS_S[freq_resample],
+            tratamiento_gaps=TRATAMIENTOS_GAPS[tratamiento_gaps],
+        )
+
+
+@dataclass
+class ResumenProceso:
+    puntos_entrada: int = 0
+    puntos_salida: int = 0
+    outliers: int = 0
+    imposibles: int = 0
+    imputados: int = 0
+    gaps_rellenados: int = 0
+    etapas_calculadas: int = 0
+    etapas_reutilizadas: int = 0
+
+    def __add__(self, otro: "ResumenProceso") -> "ResumenProceso":
+        return ResumenProceso(
+            **{campo: valor + getattr(otro, campo) for campo, valor in asdict(self).items()}
+        )
+
+
+# ---------------------------------------------------------------------- etapas
+def quitar_outliers(valor: np.ndarray, variable: Optional[str],
+                    config: ConfigProceso) -> Tuple[np.ndarray, np.ndarray]:
+    """Devuelve (valores con outliers e imposibles a NaN, códigos de calidad)."""
+    calidad = clasificar(valor, variable, config.metodo_outliers, config.k_outliers)
+    limpio = np.where((calidad == OUTLIER) | (calidad == IMPOSIBLE), np.nan, valor)
+    return limpio, calidad
+
+
+def _ffill(valor: np.ndarray) -> np.ndarray:
+    """Forward fill vectorizado (los NaN iniciales se mantienen)."""
+    validos = ~np.isnan(valor)
+    indices = np.where(validos, np.arange(len(valor)), 0)
+    np.maximum.accumulate(indices, out=indices)
+    relleno = valor[indices]
+    relleno[~validos & (np.cumsum(validos) == 0)] = np.nan
+    return relleno
+
+
+def _knn(timestamp: np.ndarray, valor: np.ndarray, k: int) -> np.ndarray:
+    """Media de los ``k`` vecinos válidos más cercanos en el tiempo.
+
+    Los vecinos de cada hueco están entre las ``k`` posiciones válidas a cada
+    lado de su punto de inserción, así que basta un ``searchsorted`` y una
+    matriz (huecos × 2k): O(m·k + m·log n) en lugar de O(n²).
+    """
+    validos = ~np.isnan(valor)
+    huecos = np.flatnonzero(~validos)
+    t_val, v_val = timestamp[validos], valor[validos]
+    if not len(huecos) or not len(t_val):
+        return valor
+    k = min(k, len(t_val))
+
+    posicion = np.searchsorted(t_val, timestamp[huecos])
+    candidatos = posicion[:, None] + np.arange(-k, k)[None, :]
+    fuera = (candidatos < 0) | (candidatos >= len(t_val))
+    candidatos = np.clip(candidatos, 0, len(t_val) - 1)
+    distancia = np.abs(t_val[candidatos] - timestamp[huecos][:, None]).astype(np.float64)
+    distancia[fuera] = np.inf
+
+    cercanos = np.take_along_axis(
+        candidatos, np.argpartition(distancia, k - 1, axis=1)[:, :k], axis=1
+    )
+    resultado = valor.copy()
+    resultado[huecos] = v_val[cercanos].mean(axis=1)
+    return resultado
+
+
+def imputar(timestamp: np.ndarray, valor: np.ndarray, config: ConfigProceso) -> np.ndarray:
+    validos = ~np.isnan(valor)
+    if validos.all() or not validos.any():
+        return valor
+    if config.imputacion == "ffill":
+        return _ffill(valor)
+    if config.imputacion == "media":
+        return np.where(validos, valor, np.nanmean(valor))
+    if config.imputacion == "knn":
+        return _knn(timestamp, valor, config.vecinos_knn)
+    resultado = valor.copy()
+    resultado[~validos] = np.interp(timestamp[~validos], timestamp[validos], valor[validos])
+    return resultado
+
+
+def resamplear(timestamp: np.ndarray, valor: np.ndarray,
+               resample_s: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Media por bucket de ``resample_s`` segundos; los buckets vacíos quedan en NaN."""
+    if resample_s is None or not len(timestamp):
+        return timestamp, valor
+    paso = np.int64(resample_s) * _NS
+    inicio = (timestamp[0] // paso) * paso
+    bucket = (timestamp - inicio) // paso
+    finitos = np.isfinite(valor)
+    n = int(bucket[-1]) + 1
+    suma = np.bincount(bucket, weights=np.where(finitos, valor, 0.0), minlength=n)
+    cuenta = np.bincount(bucket, weights=finitos, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = suma / cuenta
+    return inicio + np.arange(n, dtype=np.int64) * paso, media
+
+
+def tratar_gaps(timestamp: np.ndarray, valor: np.ndarray, config: ConfigProceso) -> np.ndarray:
+    if config.tratamiento_gaps == "nan" or not np.isnan(valor).any():
+        return valor
+    if config.tratamiento_gaps == "ffill":
+        return _ffill(valor)
+    validos = ~np.isnan(valor)
+    if not validos.any():
+        return valor
+    resultado = valor.copy()
+    resultado[~validos] = np.interp(timestamp[~validos], timestamp[validos], valor[validos])
+    return resultado
+
+
+# Cada etapa recibe la salida de la anterior (arrays ``timestamp``/``valor``)
+# y devuelve su salida y su parte del resumen. ``ETAPAS`` fija el orden y los
+# campos de ``ConfigProceso`` de los que depende cada una (ver ``utils.memo``).
+def _etapa_outliers(datos: Arrays, variable: Optional[str],
+                    config: ConfigProceso) -> Tuple[Arrays, ResumenProceso]:
+    limpio, calidad = quitar_outliers(datos["valor"], variable, config)
+    resumen = ResumenProceso(
+        puntos_entrada=len(limpio),
+        outliers=int(np.count_nonzero(calidad == OUTLIER)),
+        imposibles=int(np.count_nonzero(calidad == IMPOSIBLE)),
+    )
+    return {"timestamp": datos["timestamp"], "valor": limpio}, resumen
+
+
+def _etapa_imputacion(datos: Arrays, variable: Optional[str],
+                      config: ConfigProceso) -> Tuple[Arrays, ResumenProceso]:
+    imputado = imputar(datos["timestamp"], datos["valor"], config)
+    resumen = ResumenProceso(
+        imputados=int(np.count_nonzero(np.isnan(datos["valor"]) & ~np.isnan(imputado)))
+    )
+    return {"timestamp": datos["timestamp"], "valor": imputado}, resumen
+
+
+def _etapa_resample(datos: Arrays, variable: Optional[str],
+                    config: ConfigProceso) -> Tuple[Arrays, ResumenProceso]:
+    ts_salida, resampleado = resamplear(datos["timestamp"], datos["valor"], config.resample_s)
+    return {"timestamp": ts_salida, "valor": resampleado}, ResumenProceso()
+
+
+ETAPAS = (
+    ("outliers", ("metodo_outliers", "k_outliers"), _etapa_outliers),
+    ("imputacion", ("imputacion", "vecinos_knn"), _etapa_imputacion),
+    ("resample", ("resample_s",), _etapa_resample),
+)
+
+
+class CosturaGaps:
+    """Tratamiento de gaps de una serie, aplicado a sus bloques en orden.
+
+    Entre el último bucket de un bloque y el primero del siguiente se añaden
+    los buckets vacíos que falten, y el tratamiento ve el último valor
+    válido ya entregado. Al interpolar, los NaN del final de un bloque se
+    retienen hasta que llega el siguiente valor válido (o hasta ``cerrar``).
+    """
+
+    def __init__(self, config: ConfigProceso):
+        self.config = config
+        self._paso = np.int64(config.resample_s) * _NS if config.resample_s else None
+        self._ultimo_ts: Optional[int] = None
+        self._contexto: Optional[Tuple[int, float]] = None
+        self._pendiente = (np.empty(0, np.int64), np.empty(0))
+
+    def agregar(self, datos: Arrays) -> Tuple[Arrays, ResumenProceso]:
+        ts, valor = datos["timestamp"], datos["valor"]
+        partes = [self._pendiente]
+        if len(ts) and self._paso is not None and self._ultimo_ts is not None:
+            hueco = np.arange(self._ultimo_ts + self._paso, ts[0], self._paso, dtype=np.int64)
+            partes.append((hueco, np.full(len(hueco), np.nan)))
+        partes.append((ts, valor))
+        if len(ts):
+            self._ultimo_ts = int(ts[-1])
+        return self._tratar(np.concatenate([p[0] for p in partes]),
+                            np.concatenate([p[1] for p in partes]), final=False)
+
+    def cerrar(self) -> Tuple[Arrays, ResumenProceso]:
+        """Trata y entrega lo que quedara retenido al final de la serie."""
+        return self._tratar(*self._pendiente, final=True)
+
+    def _tratar(self, ts: np.ndarray, valor: np.ndarray,
+                final: bool) -> Tuple[Arrays, ResumenProceso]:
+        validos = np.flatnonzero(~np.isnan(valor))
+        corte = len(valor)
+        if not final and self.config.tratamiento_gaps == "interpolar":
+            corte = int(validos[-1]) + 1 if len(validos) else 0
+        self._pendiente = (ts[corte:], valor[corte:])
+        ts, valor = ts[:corte], valor[:corte]
+
+        if self._contexto is not None:
+            tratado = tratar_gaps(np.r_[self._contexto[0], ts], np.r_[self._contexto[1], valor],
+                                  self.config)[1:]
+        else:
+            tratado = tratar_gaps(ts, valor, self.config)
+        emitidos = np.flatnonzero(~np.isnan(tratado))
+        if len(emitidos):
+            self._contexto = (int(ts[emitidos[-1]]), float(tratado[emitidos[-1]]))
+
+        resumen = ResumenProceso(
+            puntos_salida=len(tratado),
+            gaps_rellenados=int(np.count_nonzero(np.isnan(valor) & ~np.isnan(tratado))),
+        )
+        salida = {
+            "timestamp": ts,
+            "valor": tratado,
+            "calidad": np.where(np.isnan(tratado), FALTANTE, 0).astype(np.int8),
+        }
+        return salida, resumen
+
+
+def claves_etapas(bloque: Arrays, variable: Optional[str], config: ConfigProceso) -> List[str]:
+    """Cadena de claves de memoización, una por etapa."""
+    clave = hash_bloque(bloque, variable)
+    claves = []
+    for nombre, campos, _ in ETAPAS:
+        clave = hash_etapa(clave, nombre, tuple(getattr(config, c) for c in campos))
+        claves.append(clave)
+    return claves
+
+
+def ejecutar_etapas(datos: Arrays, variable: Optional[str], config: ConfigProceso,
+                    primera: int = 0) -> List[Tuple[Arrays, ResumenProceso]]:
+    """Aplica las etapas desde ``primera`` y devuelve la salida de cada una."""
+    datos = {
+        "timestamp": np.asarray(datos["timestamp"], dtype=np.int64),
+        "valor": np.asarray(datos["valor"], dtype=np.float64),
+    }
+    salidas = []
+    for _, _, etapa in ETAPAS[primera:]:
+        datos, resumen = etapa(datos, variable, config)
+        salidas.append((datos, resumen))
+    return salidas
+
+
+def procesar_bloque(bloque: Arrays, variable: Optional[str],
+                    config: ConfigProceso) -> Tuple[Arrays, ResumenProceso]:
+    """Aplica todas las etapas a un bloque ordenado de una serie."""
+    resumen = ResumenProceso()
+    for datos, parcial in ejecutar_etapas(bloque, variable, config):
+        resumen = resumen + parcial
+    costura = CosturaGaps(config)
+    tratado, parcial = costura.agregar(datos)
+    resto, final = costura.cerrar()
+    datos = {c: np.concatenate([tratado[c], resto[c]]) for c in tratado}
+    return datos, resumen + parcial + final
+
+
+# ---------------------------------------------------------------------- bloques
+def partir_en_bloques(chunks: Iterable[Arrays], bloque_s: int = BLOQUE_S) -> Iterator[Arrays]:
+    """Reagrupa páginas de una serie en bloques alineados de ``bloque_s`` segundos."""
+    paso = np.int64(bloque_s) * _NS
+    pendiente: List[Arrays] = []
+    actual = None
+    for chunk in chunks:
+        ids = chunk["timestamp"] // paso
+        cortes = np.flatnonzero(np.diff(ids)) + 1
+        for desde, hasta in zip(np.r_[0, cortes], np.r_[cortes, len(ids)]):
+            if desde == hasta:
+                continue
+            if actual is not None and ids[desde] != actual:
+                yield {c: np.concatenate([p[c] for p in pendiente]) for c in pendiente[0]}
+                pendiente = []
+            actual = ids[desde]
+            pendiente.append({c: v[desde:hasta] for c, v in chunk.items()})
+    if pendiente:
+        yield {c: np.concatenate([p[c] for p in pendiente]) for c in pendiente[0]}
+
+
+def bloque_alineado(config: ConfigProceso) -> int:
+    """Tamaño de bloque múltiplo de la frecuencia de resample."""
+    if not config.resample_s:
+        return BLOQUE_S
+    return max(1, BLOQUE_S // config.resample_s) * config.resample_s
+
+
+WORKERS = int(os.getenv("PIPELINE_WORKERS", str(os.cpu_count() or 2)))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Pool de procesos compartido; tamaño por PIPELINE_WORKERS."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def procesar_series(
+    series: Dict[str, Iterable[Arrays]],
+    config: ConfigProceso,
+    progreso: Optional[Callable[[int], None]] = None,
+    memo: Optional[MemoEtapas] = None,
+    salida: Optional[Callable[[str, Arrays], None]] = None,
+) -> Dict[str, ResumenProceso]:
+    """Procesa varias series (``{variable: páginas}``) en paralelo.
+
+    Los bloques se envían al pool a medida que se leen, con un máximo de
+    bloques en vuelo o esperando turno para que la memoria no crezca con el
+    despliegue. De cada bloque solo se calculan las etapas posteriores a la
+    última que ya está en ``memo`` (por defecto ``get_memo()``); un bloque
+    sin cambios ni en sus datos ni en la configuración no llega al pool.
+
+    Los gaps se tratan después, en orden, con ``CosturaGaps``, y cada trozo
+    resultante se pasa a ``salida(variable, datos)`` según queda listo.
+    Devuelve el resumen de cada variable; ``progreso`` recibe el número de
+    bloques terminados.
+    """
+    executor = get_executor()
+    memo = memo if memo is not None else get_memo()
+    max_en_vuelo = 2 * WORKERS
+    bloque_s = bloque_alineado(config)
+
+    resumenes = {v: ResumenProceso() for v in series}
+    costuras = {v: CosturaGaps(config) for v in series}
+    # Bloques terminados que esperan a los anteriores de su serie
+    en_espera: Dict[str, Dict[int, Tuple[Arrays, ResumenProceso]]] = {v: {} for v in series}
+    siguiente = {v: 0 for v in series}
+    en_vuelo = {}
+    terminados = 0
+    retenidos = 0
+
+    def entregar(variable, datos, resumen):
+        resumenes[variable] = resumenes[variable] + resumen
+        if salida is not None and len(datos["timestamp"]):
+            salida(variable, datos)
+
+    def terminar(variable, orden, datos, resumen):
+        nonlocal terminados, retenidos
+        en_espera[variable][orden] = (datos, resumen)
+        retenidos += 1
+        while siguiente[variable] in en_espera[variable]:
+            datos, resumen = en_espera[variable].pop(siguiente[variable])
+            retenidos -= 1
+            siguiente[variable] += 1
+            tratado, parcial = costuras[variable].agregar(datos)
+            entregar(variable, tratado, resumen + parcial)
+        terminados += 1
+        if progreso is not None:
+            progreso(terminados)
+
+    def recoger(futuros):
+        for futuro in futuros:
+            variable, orden, claves, primera, resumen = en_vuelo.pop(futuro)
+            for clave, (datos, parcial) in zip(claves[primera:], futuro.result()):
+                resumen = resumen + parcial
+                memo.guardar(clave, (datos, resumen))
+            terminar(variable, orden, datos, replace(
+                resumen, etapas_calculadas=len(ETAPAS) - primera, etapas_reutilizadas=primera
+            ))
+
+    for variable, chunks in series.items():
+        for orden, bloque in enumerate(partir_en_bloques(chunks, bloque_s)):
+            claves = claves_etapas(bloque, variable, config)
+            ultima, guardado = memo.ultima_disponible(claves)
+            if ultima == len(ETAPAS) - 1:
+                datos, resumen = guardado
+                terminar(variable, orden, datos, replace(resumen, etapas_reutilizadas=len(ETAPAS)))
+                continue
+            entrada, resumen = guardado if guardado is not None else (bloque, ResumenProceso())
+
+            while en_vuelo and len(en_vuelo) + retenidos >= max_en_vuelo:
+                listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                recoger(listos)
+            futuro = executor.submit(ejecutar_etapas, entrada, variable, config, ultima + 1)
+            en_vuelo[futuro] = (variable, orden, claves, ultima + 1, resumen)
+    recoger(list(wait(en_vuelo).done))
+
+    for variable, costura in costuras.items():
+        entregar(variable, *costura.cerrar())
+    return resumenes
+
+
+def reprocesar(client, almacen, despliegue_id, variables: Sequence[str], config: ConfigProceso,
+               tabla: str = TABLA_CRUDOS,
+               progreso: Optional[Callable[[int], None]] = None) -> Dict[str, ResumenProceso]:
+    """Reprocesa las series crudas de un despliegue leyéndolas página a página.
+
+    Las series resultantes se escriben en ``almacen`` (un
+    ``utils.almacen.AlmacenSeries``) bajo ``TABLA_REPROCESADOS`` y se
+    publican solo si el reprocesamiento termina sin error.
+    """
+    series = {
+        variable: client.iter_trend_pages(despliegue_id, variable, tabla=tabla)
+        for variable in variables
+    }
+    with ExitStack() as pila:
+        escrituras = {
+            variable: pila.enter_context(almacen.escritura(despliegue_id, variable, TABLA_REPROCESADOS))
+            for variable in variables
+        }
+        return procesar_series(
+            series, config, progreso,
+            salida=lambda variable, datos: escrituras[variable].agregar(datos),
+        )
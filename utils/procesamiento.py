@@ -0,0 +1,162 @@
+"""Trabajos de procesamiento de despliegues (ver ``utils.jobs``).
+
+Cada función recibe primero el callback ``progreso`` del planificador y
+después recursos ya resueltos (cliente, caché, almacén), para no depender
+del contexto de ejecución de Streamlit desde los hilos de trabajo.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+import pandas as pd
+import requests
+
+from utils.api_client import TABLA_CRUDOS, TABLA_PROCESADOS
+from utils.pipeline import ConfigProceso, ResumenProceso, bloque_alineado, reprocesar
+from utils.fetch import TIMEOUT_PETICION
+from utils.resumen import PROCESANDO, get_servicio_resumen
+from utils.rollups import generar_rollups
+
+# Variables registradas en cada despliegue
+# TODO: Conectar con API de Marcelo
+VARIABLES = ["temperatura", "presion", "vibracion", "corriente", "voltaje"]
+
+# Espera al pipeline del servidor: segundos entre consultas y máximo total
+SONDEO_S = float(os.getenv("PROCESO_SONDEO_S", "2"))
+ESPERA_MAX_S = float(os.getenv("PROCESO_TIMEOUT_S", "3600"))
+
+_versiones: Dict[Hashable, int] = defaultdict(int)
+_versiones_lock = threading.Lock()
+
+
+def version_remota(client, despliegue_id: Hashable) -> Optional[Hashable]:
+    """Versión de datos que publica el backend para el despliegue, si la hay.
+
+    Sale del resumen compartido (``utils.resumen``), así que no añade
+    consultas; None si el backend no la envía o no responde.
+    """
+    try:
+        resumen = get_servicio_resumen().obtener(client)
+    except requests.RequestException:
+        return None
+    for fila in resumen.despliegues:
+        if fila["id"] == despliegue_id:
+            return fila["version"]
+    return None
+
+
+def version_datos(client, despliegue_id: Hashable) -> Tuple[Optional[Hashable], int]:
+    """Versión de los datos del despliegue: (versión del backend, local).
+
+    Forma parte de las claves de caché de lo que depende de los datos
+    (p. ej. ``utils.reportes``). La versión del backend sobrevive a los
+    reinicios y cambia aunque el procesamiento se lance desde otro sitio;
+    la local cuenta los (re)procesamientos de este proceso y cubre a los
+    backends que no publican versión.
+    """
+    with _versiones_lock:
+        local = _versiones[despliegue_id]
+    return version_remota(client, despliegue_id), local
+
+
+def rango_datos(client, despliegue_id: Hashable,
+                variables: Sequence[str] = VARIABLES) -> Tuple[datetime, datetime]:
+    """Rango con datos del despliegue, ampliado al minuto.
+
+    Los extremos salen de los datos (``APIClient.get_extension``), no del
+    reloj: el rango por defecto de los selectores forma parte de las claves
+    de cachés, páginas y trabajos, y no debe cambiar entre reruns. Sin datos
+    o sin backend, los últimos 7 días.
+    """
+    try:
+        extension = client.get_extension(despliegue_id, tuple(variables),
+                                         timeout=TIMEOUT_PETICION)
+    except requests.RequestException:
+        extension = None
+    if extension is None:
+        fin = pd.Timestamp.now().ceil("min")
+        return (fin - pd.Timedelta(days=7)).to_pydatetime(), fin.to_pydatetime()
+    inicio = pd.Timestamp(extension[0]).floor("min")
+    fin = max(pd.Timestamp(extension[1]).ceil("min"), inicio + pd.Timedelta(minutes=1))
+    return inicio.to_pydatetime(), fin.to_pydatetime()
+
+
+def _nueva_version(despliegue_id: Hashable) -> None:
+    with _versiones_lock:
+        _versiones[despliegue_id] += 1
+
+
+def esperar_pipeline(progreso, client, despliegue_id: Hashable,
+                     trabajo_id: Optional[str], fraccion: float = 0.5) -> None:
+    """Consulta el estado del pipeline del servidor hasta que termina.
+
+    El avance del servidor ocupa la primera ``fraccion`` del trabajo. Lanza
+    ``RuntimeError`` si el servidor informa un error y ``TimeoutError`` si
+    sigue procesando tras ``PROCESO_TIMEOUT_S``.
+    """
+    limite = time.monotonic() + ESPERA_MAX_S
+    while True:
+        estado = client.estado_procesamiento(despliegue_id, trabajo_id, timeout=TIMEOUT_PETICION)
+        if estado.get("estado") == "error":
+            raise RuntimeError(estado.get("error") or "El pipeline del servidor falló")
+        if estado.get("estado") != PROCESANDO:
+            return
+        if time.monotonic() > limite:
+            raise TimeoutError(f"El pipeline del servidor sigue en curso tras {ESPERA_MAX_S:.0f} s")
+        # ``progreso`` también detiene la espera si se cancela el trabajo
+        progreso(fraccion * float(estado.get("progreso") or 0.0),
+                 "Ejecutando pipeline en el servidor")
+        time.sleep(SONDEO_S)
+
+
+def procesar_despliegue(progreso, client, almacen, cache, despliegue_id: Hashable,
+                        variables: Sequence[str], config: Optional[dict] = None) -> None:
+    """Lanza el pipeline del servidor y, cuando termina, reconstruye los agregados.
+
+    Los agregados se leen de los datos ya procesados y se guardan con la
+    versión de datos que el backend publica al terminar.
+    """
+    resumen = get_servicio_resumen()
+    progreso(0.0, "Ejecutando pipeline en el servidor")
+    try:
+        respuesta = client.iniciar_procesamiento(despliegue_id, config, timeout=TIMEOUT_PETICION)
+        resumen.invalidar()  # el despliegue pasa a "procesando"
+        esperar_pipeline(progreso, client, despliegue_id, (respuesta or {}).get("trabajo_id"))
+        resumen.invalidar()
+        cache.invalidar(despliegue_id)
+        _nueva_version(despliegue_id)
+        generar_rollups(
+            client, almacen, despliegue_id, variables, [TABLA_CRUDOS, TABLA_PROCESADOS],
+            progreso=lambda fraccion, etapa: progreso(0.5 + 0.5 * fraccion, etapa),
+            version=version_remota(client, despliegue_id),
+        )
+    finally:
+        resumen.invalidar()
+
+
+def reprocesar_despliegue(progreso, client, almacen, despliegue_id: Hashable,
+                          variables: Sequence[str], config: ConfigProceso,
+                          desde: datetime, hasta: datetime) -> Dict[str, ResumenProceso]:
+    """Reprocesa localmente las series crudas con la configuración del formulario.
+
+    Las series quedan en ``almacen`` (``utils.pipeline.TABLA_REPROCESADOS``)
+    y el resultado del trabajo es solo el resumen de cada variable. El total
+    de bloques, para el porcentaje de avance, se estima con el rango del
+    despliegue.
+    """
+    bloques = math.ceil((hasta - desde).total_seconds() / bloque_alineado(config)) + 1
+    total = max(1, bloques * len(variables))
+    progreso(0.0, "Procesando bloques")
+    resultado = reprocesar(
+        client, almacen, despliegue_id, variables, config,
+        progreso=lambda n: progreso(min(0.99, n / total), f"Bloques procesados: {n}")
+    )
+    _nueva_version(despliegue_id)
+    return resultado
@@ -0,0 +1,34 @@
+"""Recursos compartidos por todas las sesiones de Streamlit."""
+
+import os
+
+import streamlit as st
+
+from utils.almacen import AlmacenSeries
+from utils.api_client import APIClient
+from utils.cache import CacheSeries
+from utils.rollups import AlmacenRollups
+
+
+@st.cache_resource(show_spinner=False)
+def get_api_client():
+    """Cliente de API compartido por todas las sesiones"""
+    return APIClient(os.getenv("API_BASE_URL", "http://localhost:8000"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_series_cache():
+    """Caché de rangos de series compartida por todas las sesiones"""
+    return CacheSeries()
+
+
+@st.cache_resource(show_spinner=False)
+def get_rollup_store():
+    """Pirámides de agregados guardadas en disco"""
+    return AlmacenRollups()
+
+
+@st.cache_resource(show_spinner=False)
+def get_series_store():
+    """Series completas en disco, leídas con memmap"""
+    return AlmacenSeries()
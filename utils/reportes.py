@@ -0,0 +1,344 @@
+"""Reportes estáticos (PNG y PDF) generados en segundo plano y cacheados.
+
+Generar un reporte tiene dos fases:
+
+1. Lectura (hilo del trabajo, ver ``utils.jobs``): cada serie se recorre
+   página a página y se resume en ``ANCHO_GRAFICO_PX`` buckets de tiempo
+   (media, mínimo y máximo) más sus estadísticas de calidad, con memoria
+   constante sea cual sea el rango.
+2. Dibujo (pool de procesos ``REPORTES_WORKERS``): con los resúmenes se
+   construyen las figuras de Plotly y se rasterizan con ``kaleido``. El PDF
+   tiene una página de KPIs, una por variable y una con la distribución de
+   calidad, unidas con Pillow.
+
+El resultado se guarda en memoria con la clave (despliegue, variables,
+tablas, rango, versión de datos, formato), de modo que volver a pedir el
+mismo reporte es inmediato. La versión de datos la publica el backend y
+cambia también con cada (re)procesamiento local
+(``utils.procesamiento.version_datos``).
+"""
+
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.api_client import TABLA_CRUDOS, TABLA_PROCESADOS
+from utils.calidad import AnalizadorCalidad, EstadisticasCalidad
+from utils.downsampling import ANCHO_GRAFICO_PX
+from utils.metricas import medir
+
+FORMATO_PNG = "png"
+FORMATO_PDF = "pdf"
+
+TIPOS_MIME = {FORMATO_PNG: "image/png", FORMATO_PDF: "application/pdf"}
+
+WORKERS = int(os.getenv("REPORTES_WORKERS", "2"))
+
+_ANCHO_PAGINA, _ALTO_PAGINA = 1200, 850
+
+
+@dataclass
+class ResumenSerie:
+    """Serie reducida a buckets de tiempo, lista para dibujar."""
+    timestamp: np.ndarray
+    media: np.ndarray
+    minimo: np.ndarray
+    maximo: np.ndarray
+    puntos: int = 0
+    suma: float = 0.0
+    valor_min: float = np.nan
+    valor_max: float = np.nan
+
+
+class _Reductor:
+    """Acumula páginas ordenadas de una serie en buckets fijos de tiempo."""
+
+    def __init__(self, desde_ns: int, hasta_ns: int, n_buckets: int):
+        self.desde = desde_ns
+        self.paso = max(1, -(-(hasta_ns - desde_ns) // n_buckets))
+        self.n = n_buckets
+        self.suma = np.zeros(n_buckets)
+        self.cuenta = np.zeros(n_buckets)
+        self.minimo = np.full(n_buckets, np.nan)
+        self.maximo = np.full(n_buckets, np.nan)
+
+    def agregar(self, timestamp: np.ndarray, valor: np.ndarray) -> None:
+        finitos = np.isfinite(valor)
+        timestamp, valor = timestamp[finitos], valor[finitos]
+        if not len(valor):
+            return
+        bucket = np.clip((timestamp - self.desde) // self.paso, 0, self.n - 1)
+        self.suma += np.bincount(bucket, weights=valor, minlength=self.n)
+        self.cuenta += np.bincount(bucket, minlength=self.n)
+        # Las páginas llegan ordenadas: cada bucket es un tramo contiguo
+        inicios = np.flatnonzero(np.r_[True, np.diff(bucket) != 0])
+        ids = bucket[inicios]
+        self.minimo[ids] = np.fmin(self.minimo[ids], np.minimum.reduceat(valor, inicios))
+        self.maximo[ids] = np.fmax(self.maximo[ids], np.maximum.reduceat(valor, inicios))
+
+    def resumen(self) -> ResumenSerie:
+        con_datos = self.cuenta > 0
+        centros = self.desde + np.arange(self.n, dtype=np.int64) * self.paso + self.paso // 2
+        return ResumenSerie(
+            timestamp=centros[con_datos],
+            media=self.suma[con_datos] / self.cuenta[con_datos],
+            minimo=self.minimo[con_datos],
+            maximo=self.maximo[con_datos],
+            puntos=int(self.cuenta.sum()),
+            suma=float(self.suma.sum()),
+            valor_min=float(np.nanmin(self.minimo)) if con_datos.any() else np.nan,
+            valor_max=float(np.nanmax(self.maximo)) if con_datos.any() else np.nan,
+        )
+
+
+@dataclass
+class DatosReporte:
+    despliegue_id: Hashable
+    desde: datetime
+    hasta: datetime
+    series: Dict[Tuple[str, str], ResumenSerie]
+    calidad: Dict[str, dict]
+
+
+def leer_datos_reporte(client, despliegue_id: Hashable, variables: Sequence[str],
+                       tablas: Sequence[str], desde: datetime, hasta: datetime,
+                       progreso=None) -> DatosReporte:
+    """Recorre las series del reporte y las resume con memoria constante.
+
+    La calidad de los datos crudos se clasifica igual que en la pestaña
+    "Análisis de Calidad" (``AnalizadorCalidad``).
+    """
+    desde_ns = pd.Timestamp(desde).as_unit("ns").value
+    hasta_ns = pd.Timestamp(hasta).as_unit("ns").value
+    pares = [(var, tabla) for var in variables for tabla in tablas]
+    series, calidad = {}, {}
+    for i, (var, tabla) in enumerate(pares):
+        if progreso is not None:
+            progreso(0.8 * i / len(pares), f"Leyendo {var} ({tabla})")
+        reductor = _Reductor(desde_ns, hasta_ns, ANCHO_GRAFICO_PX)
+        analizador = AnalizadorCalidad(var) if tabla == TABLA_CRUDOS else None
+        for chunk in client.iter_trend_pages(despliegue_id, var, desde, hasta, tabla=tabla):
+            reductor.agregar(chunk["timestamp"], chunk["valor"])
+            if analizador is not None:
+                analizador.procesar(chunk["timestamp"], chunk["valor"])
+        series[(var, tabla)] = reductor.resumen()
+        if analizador is not None:
+            calidad[var] = asdict(analizador.estadisticas)
+    return DatosReporte(despliegue_id, desde, hasta, series, calidad)
+
+
+# ---------------------------------------------------------------------- dibujo
+# Se ejecuta en procesos del pool: solo importa Plotly y kaleido allí.
+_COLORES = {TABLA_CRUDOS: ("red", "rgba(255, 0, 0, 0.15)"),
+            TABLA_PROCESADOS: ("blue", "rgba(0, 0, 255, 0.15)")}
+_NOMBRES = {TABLA_CRUDOS: "Crudos", TABLA_PROCESADOS: "Procesados"}
+
+
+def _trazas_tendencia(fig, var: str, datos: DatosReporte, fila=None):
+    import plotly.graph_objects as go
+
+    posicion = dict(row=fila, col=1) if fila is not None else {}
+    for (variable, tabla), serie in datos.series.items():
+        if variable != var or not len(serie.timestamp):
+            continue
+        x = serie.timestamp.view("datetime64[ns]")
+        linea, banda = _COLORES.get(tabla, ("gray", "rgba(0, 0, 0, 0.1)"))
+        nombre = f"{var} ({_NOMBRES.get(tabla, tabla)})"
+        fig.add_trace(go.Scatter(x=x, y=serie.maximo, line=dict(width=0), mode="lines",
+                                 showlegend=False, hoverinfo="skip"), **posicion)
+        fig.add_trace(go.Scatter(x=x, y=serie.minimo, line=dict(width=0), mode="lines",
+                                 fill="tonexty", fillcolor=banda, showlegend=False,
+                                 hoverinfo="skip"), **posicion)
+        fig.add_trace(go.Scatter(x=x, y=serie.media, name=nombre, mode="lines",
+                                 line=dict(color=linea, width=1.5)), **posicion)
+
+
+def _figura_kpis(datos: DatosReporte):
+    import plotly.graph_objects as go
+
+    filas = []
+    for (var, tabla), serie in datos.series.items():
+        estadisticas = datos.calidad.get(var) if tabla == TABLA_CRUDOS else None
+        validos = (
+            f"{estadisticas['validos'] / estadisticas['total_puntos']:.1%}"
+            if estadisticas and estadisticas["total_puntos"] else "—"
+        )
+        media = serie.suma / serie.puntos if serie.puntos else np.nan
+        filas.append([var, _NOMBRES.get(tabla, tabla), f"{serie.puntos:,}",
+                      f"{media:.2f}", f"{serie.valor_min:.2f}", f"{serie.valor_max:.2f}", validos])
+    columnas = ["Variable", "Datos", "Puntos", "Media", "Mínimo", "Máximo", "Válidos"]
+    fig = go.Figure(go.Table(
+        header=dict(values=columnas, fill_color="#0068c9", font=dict(color="white")),
+        cells=dict(values=list(zip(*filas)) if filas else [[] for _ in columnas]),
+    ))
+    fig.update_layout(title=(
+        f"Reporte del despliegue #{datos.despliegue_id}<br>"
+        f"<sup>{datos.desde:%Y-%m-%d %H:%M} — {datos.hasta:%Y-%m-%d %H:%M}</sup>"
+    ))
+    return fig
+
+
+def _figura_tendencia(var: str, datos: DatosReporte):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    _trazas_tendencia(fig, var, datos)
+    fig.update_layout(title=f"Tendencia de {var}", xaxis_title="Fecha/Hora", yaxis_title="Valor")
+    return fig
+
+
+def _figura_calidad(datos: DatosReporte):
+    import plotly.graph_objects as go
+
+    total = EstadisticasCalidad()
+    for estadisticas in datos.calidad.values():
+        total = total + EstadisticasCalidad(**estadisticas)
+    fig = go.Figure(go.Pie(
+        labels=["Válidos", "Outliers", "Faltantes", "Imposibles", "Error de categoría"],
+        values=[total.validos, total.outliers, total.faltantes, total.imposibles,
+                total.errores_categoria],
+        hole=.3,
+    ))
+    fig.update_layout(title=f"Distribución de Calidad de Datos · {total.gaps} gaps temporales")
+    return fig
+
+
+def _variables(datos: DatosReporte) -> List[str]:
+    return list(dict.fromkeys(var for var, _ in datos.series))
+
+
+def _png(fig, alto: int = _ALTO_PAGINA) -> bytes:
+    # Importar streamlit deja "streamlit" como plantilla por defecto, cuyos
+    # colores son marcadores (#000001…) que solo resuelve el navegador:
+    # rasterizada con kaleido, cada tarta, celda y línea sale negra.
+    fig.update_layout(template="plotly")
+    return fig.to_image(format="png", width=_ANCHO_PAGINA, height=alto)
+
+
+def renderizar(datos: DatosReporte, formato: str) -> bytes:
+    """PNG con las tendencias apiladas o PDF multipágina (en un proceso del pool)."""
+    try:
+        import kaleido  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("Los reportes estáticos requieren el paquete kaleido") from e
+
+    variables = _variables(datos)
+    if formato == FORMATO_PNG:
+        from plotly.subplots import make_subplots
+
+        fig = make_subplots(rows=max(1, len(variables)), cols=1, shared_xaxes=True,
+                            subplot_titles=variables, vertical_spacing=0.06)
+        for fila, var in enumerate(variables, start=1):
+            _trazas_tendencia(fig, var, datos, fila)
+        fig.update_layout(title=f"Despliegue #{datos.despliegue_id}")
+        return _png(fig, alto=max(_ALTO_PAGINA, 300 * len(variables)))
+
+    from PIL import Image
+
+    figuras = [_figura_kpis(datos)]
+    figuras += [_figura_tendencia(var, datos) for var in variables]
+    figuras.append(_figura_calidad(datos))
+    paginas = [Image.open(io.BytesIO(_png(fig))).convert("RGB") for fig in figuras]
+    salida = io.BytesIO()
+    paginas[0].save(salida, format="PDF", save_all=True, append_images=paginas[1:],
+                    resolution=100.0)
+    return salida.getvalue()
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Pool de procesos de dibujo; tamaño por REPORTES_WORKERS."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+# ---------------------------------------------------------------------- caché
+@dataclass
+class Reporte:
+    nombre: str
+    formato: str
+    datos: bytes
+
+    @property
+    def tipo_mime(self) -> str:
+        return TIPOS_MIME[self.formato]
+
+
+class CacheReportes:
+    """Reportes generados ``clave → Reporte``, con expulsión LRU por bytes."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or int(os.getenv("REPORTES_CACHE_MB", "64")) * 1024 * 1024
+        self._reportes: "OrderedDict[tuple, Reporte]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: tuple) -> Optional[Reporte]:
+        with self._lock:
+            reporte = self._reportes.get(clave)
+            if reporte is not None:
+                self._reportes.move_to_end(clave)
+            return reporte
+
+    def guardar(self, clave: tuple, reporte: Reporte) -> None:
+        with self._lock:
+            anterior = self._reportes.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior.datos)
+            self._reportes[clave] = reporte
+            self._bytes += len(reporte.datos)
+            while self._bytes > self.max_bytes and len(self._reportes) > 1:
+                _, expulsado = self._reportes.popitem(last=False)
+                self._bytes -= len(expulsado.datos)
+
+
+_cache = CacheReportes()
+
+
+def clave_reporte(despliegue_id: Hashable, variables: Sequence[str], tablas: Sequence[str],
+                  desde: datetime, hasta: datetime, version: Hashable, formato: str) -> tuple:
+    return (despliegue_id, tuple(variables), tuple(tablas), desde, hasta, version, formato)
+
+
+def reporte_en_cache(clave: tuple) -> Optional[Reporte]:
+    return _cache.obtener(clave)
+
+
+def generar_reporte(progreso, client, clave: tuple) -> Reporte:
+    """Trabajo de ``utils.jobs``: lee, dibuja en el pool y guarda en la caché."""
+    reporte = _cache.obtener(clave)
+    if reporte is not None:
+        return reporte
+
+    despliegue_id, variables, tablas, desde, hasta, _, formato = clave
+    datos = leer_datos_reporte(client, despliegue_id, variables, tablas, desde, hasta, progreso)
+    progreso(0.8, "Dibujando reporte")
+    # Medido aquí y no dentro de ``renderizar``: el pool es de otros procesos
+    with medir("grafico_segundos", grafico=f"reporte_{formato}"):
+        contenido = get_executor().submit(renderizar, datos, formato).result()
+
+    nombre = f"reporte_despliegue_{despliegue_id}_{desde:%Y%m%d}_{hasta:%Y%m%d}.{formato}"
+    reporte = Reporte(nombre, formato, contenido)
+    _cache.guardar(clave, reporte)
+    return reporte
@@ -0,0 +1,157 @@
+"""Resumen de la página de inicio: KPIs y lista de despliegues.
+
+Todo sale de una única consulta agregada (``APIClient.get_resumen_dashboard``)
+compartida por todas las sesiones: se guarda durante ``DASHBOARD_TTL_S``
+segundos y, si varias sesiones la piden a la vez con la caché vencida, solo
+una va al backend y el resto espera su resultado. Los trabajos de
+procesamiento la invalidan al empezar y al terminar (``invalidar``), para
+que el estado de los despliegues se vea al momento.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import requests
+
+from utils.fetch import TIMEOUT_PETICION
+
+PROCESADO = "procesado"
+PROCESANDO = "procesando"
+SIN_PROCESAR = "sin_procesar"
+
+ETIQUETAS_ESTADO = {
+    PROCESADO: "✅ Procesado",
+    PROCESANDO: "⏳ Procesando",
+    SIN_PROCESAR: "❌ Sin procesar",
+}
+
+TTL_S = float(os.getenv("DASHBOARD_TTL_S", "60"))
+MAX_DESPLIEGUES = int(os.getenv("DASHBOARD_MAX_DESPLIEGUES", "1000"))
+
+
+@dataclass
+class ResumenDashboard:
+    despliegues_activos: int = 0
+    equipos_monitoreados: int = 0
+    alertas_activas: int = 0
+    eficiencia_promedio: Optional[float] = None
+    # Variación respecto al periodo anterior, si el backend la envía
+    deltas: Dict[str, str] = field(default_factory=dict)
+    # Filas: id, motor, fecha, puntos, estado, versión (más reciente primero)
+    despliegues: List[dict] = field(default_factory=list)
+    generado: float = field(default_factory=time.time)
+
+
+def _fila(despliegue: dict) -> dict:
+    estado = str(despliegue.get("estado") or SIN_PROCESAR).lower()
+    return {
+        "id": despliegue.get("id", despliegue.get("despliegue_id")),
+        "motor": despliegue.get("motor") or despliegue.get("equipo") or "",
+        "fecha": despliegue.get("fecha") or despliegue.get("fecha_inicio") or "",
+        "puntos": int(despliegue.get("puntos") or 0),
+        "estado": estado if estado in (PROCESADO, PROCESANDO, SIN_PROCESAR) else SIN_PROCESAR,
+        "alertas": int(despliegue.get("alertas") or 0),
+        "eficiencia": despliegue.get("eficiencia"),
+        "activo": bool(despliegue.get("activo", True)),
+        # Cambia cada vez que el backend reescribe los datos del despliegue
+        "version": despliegue.get("version_datos", despliegue.get("version",
+                                  despliegue.get("actualizado"))),
+    }
+
+
+def construir_resumen(datos: dict) -> ResumenDashboard:
+    """Interpreta la respuesta del backend; calcula los KPIs que no traiga."""
+    filas = sorted(
+        (_fila(d) for d in datos.get("despliegues") or []),
+        key=lambda f: str(f["fecha"]), reverse=True,
+    )
+    kpis = datos.get("kpis") or {}
+    eficiencias = [float(f["eficiencia"]) for f in filas if f["eficiencia"] is not None]
+    return ResumenDashboard(
+        despliegues_activos=int(kpis.get(
+            "despliegues_activos", sum(f["activo"] for f in filas)
+        )),
+        equipos_monitoreados=int(kpis.get(
+            "equipos_monitoreados", len({f["motor"] for f in filas if f["motor"]})
+        )),
+        alertas_activas=int(kpis.get("alertas_activas", sum(f["alertas"] for f in filas))),
+        eficiencia_promedio=kpis.get(
+            "eficiencia_promedio",
+            sum(eficiencias) / len(eficiencias) if eficiencias else None,
+        ),
+        deltas=dict(kpis.get("deltas") or {}),
+        despliegues=filas,
+    )
+
+
+class ServicioResumen:
+    def __init__(self, ttl_s: float = TTL_S):
+        self.ttl_s = ttl_s
+        self._resumen: Optional[ResumenDashboard] = None
+        self._lock = threading.Lock()
+        self._version = 0
+        # Hora del último fallo del backend (0: ninguno desde el último éxito)
+        self._fallo = 0.0
+
+    def _vigente(self, resumen: Optional[ResumenDashboard]) -> bool:
+        if resumen is None:
+            return False
+        ahora = time.time()
+        return ahora - resumen.generado < self.ttl_s or ahora - self._fallo < self.ttl_s
+
+    def obtener(self, client) -> ResumenDashboard:
+        """Resumen vigente; si venció, una sola consulta para todas las sesiones.
+
+        Si el backend falla se sirve el último resumen conocido, si lo hay, y
+        no se vuelve a consultar hasta pasado otro ``ttl_s``: cada rerun de
+        cada sesión no espera su propio timeout.
+        """
+        resumen = self._resumen
+        if self._vigente(resumen):
+            return resumen
+        with self._lock:
+            resumen = self._resumen
+            if self._vigente(resumen):
+                return resumen  # otra sesión lo refrescó mientras esperábamos
+            version = self._version
+            try:
+                nuevo = construir_resumen(
+                    client.get_resumen_dashboard(MAX_DESPLIEGUES, timeout=TIMEOUT_PETICION)
+                )
+            except requests.RequestException:
+                if resumen is None:
+                    raise
+                self._fallo = time.time()
+                return resumen
+            self._fallo = 0.0
+            # Una invalidación durante la consulta deja el resultado ya vencido
+            if version != self._version:
+                nuevo.generado = 0.0
+            self._resumen = nuevo
+            return nuevo
+
+    def invalidar(self) -> None:
+        self._version += 1
+        self._fallo = 0.0
+        resumen = self._resumen
+        if resumen is not None:
+            resumen.generado = 0.0
+
+
+_servicio: Optional[ServicioResumen] = None
+_servicio_lock = threading.Lock()
+
+
+def get_servicio_resumen() -> ServicioResumen:
+    """Servicio único por proceso, compartido por sesiones y trabajos."""
+    global _servicio
+    if _servicio is None:
+        with _servicio_lock:
+            if _servicio is None:
+                _servicio = ServicioResumen()
+    return _servicio
@@ -0,0 +1,281 @@
+"""Pirámide de agregados multi-resolución para las vistas de tendencia.
+
+Para cada serie (despliegue, variable, tabla) se guardan agregados por bucket
+de tiempo a varias resoluciones (1 min, 15 min, 1 h, 1 día): mínimo, máximo,
+media, número de puntos y peor código de calidad. La vista general de un
+despliegue largo se dibuja desde el nivel más grueso que aún da ~1 punto por
+píxel, y solo al hacer zoom se vuelve a los datos crudos.
+
+La pirámide se construye en streaming (bloque a bloque) al procesar un
+despliegue: el nivel más fino se agrega desde los datos y cada nivel superior
+desde el anterior, sin volver a leer la serie. Junto a cada pirámide se
+guarda la versión de datos del backend y la extensión de la serie con la que
+se construyó (``meta.json``), para no servir una pirámide vieja después de
+un reprocesamiento o de un despliegue que sigue recibiendo datos.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Iterable, Optional, Sequence
+
+import numpy as np
+
+Arrays = Dict[str, np.ndarray]
+
+# Resoluciones de la pirámide, en segundos (de la más fina a la más gruesa)
+NIVELES_S = (60, 900, 3600, 86400)
+
+_CAMPOS = ("timestamp", "suma", "count", "min", "max", "calidad")
+
+
+def _agregar(buckets: np.ndarray, campos: Arrays) -> Arrays:
+    """Combina filas consecutivas con el mismo bucket (``buckets`` ordenado)."""
+    if not len(buckets):
+        return {c: v[:0] for c, v in campos.items()}
+    inicios = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    return {
+        "timestamp": buckets[inicios],
+        "suma": np.add.reduceat(campos["suma"], inicios),
+        "count": np.add.reduceat(campos["count"], inicios),
+        "min": np.fmin.reduceat(campos["min"], inicios),
+        "max": np.fmax.reduceat(campos["max"], inicios),
+        "calidad": np.maximum.reduceat(campos["calidad"], inicios),
+    }
+
+
+def agregar_bloque(timestamp: np.ndarray, valor: np.ndarray, calidad: np.ndarray,
+                   resolucion_s: int) -> Arrays:
+    """Agregados de un bloque de datos crudos (ordenado) a ``resolucion_s``."""
+    finitos = np.isfinite(valor)
+    res_ns = np.int64(resolucion_s) * 1_000_000_000
+    return _agregar(
+        (timestamp // res_ns) * res_ns,
+        {
+            "suma": np.where(finitos, valor, 0.0),
+            "count": finitos.astype(np.int64),
+            "min": valor.astype(np.float64, copy=False),
+            "max": valor.astype(np.float64, copy=False),
+            "calidad": calidad.astype(np.int8, copy=False),
+        },
+    )
+
+
+def reagregar(nivel: Arrays, resolucion_s: int) -> Arrays:
+    """Agrega un nivel ya calculado a una resolución más gruesa."""
+    res_ns = np.int64(resolucion_s) * 1_000_000_000
+    return _agregar((nivel["timestamp"] // res_ns) * res_ns, nivel)
+
+
+class AcumuladorRollup:
+    """Construye la pirámide bloque a bloque con memoria acotada.
+
+    El último bucket de cada bloque puede continuar en el siguiente, así que
+    se retiene hasta ver un bucket posterior.
+    """
+
+    def __init__(self, niveles_s: Sequence[int] = NIVELES_S):
+        self.niveles_s = tuple(sorted(niveles_s))
+        self._partes = []
+        self._pendiente: Optional[Arrays] = None
+
+    def agregar(self, bloque: Arrays) -> None:
+        if not len(bloque["timestamp"]):
+            return
+        nuevo = agregar_bloque(
+            bloque["timestamp"], bloque["valor"], bloque["calidad"], self.niveles_s[0]
+        )
+        if self._pendiente is not None:
+            unido = {c: np.concatenate([self._pendiente[c], nuevo[c]]) for c in _CAMPOS}
+            nuevo = _agregar(unido["timestamp"], unido)
+        self._partes.append({c: v[:-1] for c, v in nuevo.items()})
+        self._pendiente = {c: v[-1:] for c, v in nuevo.items()}
+
+    def resultado(self) -> Dict[int, Arrays]:
+        """Niveles ``{resolucion_s: agregados}`` con todos los bloques vistos."""
+        partes = self._partes + ([self._pendiente] if self._pendiente is not None else [])
+        if not partes:
+            base = agregar_bloque(
+                np.empty(0, np.int64), np.empty(0), np.empty(0, np.int8), self.niveles_s[0]
+            )
+        else:
+            base = {c: np.concatenate([p[c] for p in partes]) for c in _CAMPOS}
+        niveles = {self.niveles_s[0]: base}
+        for anterior, resolucion in zip(self.niveles_s, self.niveles_s[1:]):
+            niveles[resolucion] = reagregar(niveles[anterior], resolucion)
+        return niveles
+
+
+def construir_piramide(bloques: Iterable[Arrays],
+                       niveles_s: Sequence[int] = NIVELES_S) -> Dict[int, Arrays]:
+    """Pirámide completa de una serie a partir de sus bloques ordenados."""
+    acumulador = AcumuladorRollup(niveles_s)
+    for bloque in bloques:
+        acumulador.agregar(bloque)
+    return acumulador.resultado()
+
+
+def elegir_resolucion(ts_from, ts_to, ancho_px: int,
+                      niveles_s: Sequence[int] = NIVELES_S) -> Optional[int]:
+    """Nivel más grueso que todavía da al menos un punto por píxel.
+
+    Devuelve None cuando ni el nivel más fino alcanza (vista con zoom): en ese
+    caso hay que dibujar los datos crudos.
+    """
+    duracion_s = (ts_to - ts_from).total_seconds()
+    validos = [r for r in niveles_s if duracion_s / r >= ancho_px]
+    return max(validos) if validos else None
+
+
+class AlmacenRollups:
+    """Pirámides guardadas en disco (``ROLLUP_DIR``), una por serie y nivel.
+
+    Estructura: ``<dir>/<despliegue>/<tabla>/<variable>/<resolucion_s>.npz``
+    más ``meta.json`` (versión y extensión de los datos de origen). Los
+    niveles leídos se conservan en memoria; son pequeños comparados con los
+    datos crudos (una semana a 1 min son ~10k filas).
+    """
+
+    def __init__(self, directorio: Optional[str] = None):
+        self.directorio = Path(directorio or os.getenv("ROLLUP_DIR", ".rollups"))
+        self._memoria: Dict[tuple, Arrays] = {}
+        self._metas: Dict[tuple, Optional[dict]] = {}
+        self._lock = threading.Lock()
+
+    def _ruta(self, despliegue_id: Hashable, variable: str, tabla: str, resolucion_s: int) -> Path:
+        return self.directorio / str(despliegue_id) / tabla / variable / f"{resolucion_s}.npz"
+
+    def _ruta_meta(self, despliegue_id: Hashable, variable: str, tabla: str) -> Path:
+        return self.directorio / str(despliegue_id) / tabla / variable / "meta.json"
+
+    def guardar(self, despliegue_id: Hashable, variable: str, tabla: str,
+                niveles: Dict[int, Arrays], meta: Optional[dict] = None) -> None:
+        """Guarda los niveles y, al final, su ``meta`` (versión, desde, hasta en ns).
+
+        Los metadatos anteriores se borran antes y los nuevos se escriben al
+        final: una pirámide a medio guardar no tiene y nunca está vigente.
+        """
+        ruta_meta = self._ruta_meta(despliegue_id, variable, tabla)
+        with self._lock:
+            self._metas.pop((despliegue_id, variable, tabla), None)
+        if ruta_meta.exists():
+            ruta_meta.unlink()
+        for resolucion_s, datos in niveles.items():
+            ruta = self._ruta(despliegue_id, variable, tabla, resolucion_s)
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            temporal = ruta.with_suffix(".tmp.npz")
+            np.savez(temporal, **datos)
+            os.replace(temporal, ruta)
+            with self._lock:
+                self._memoria[(despliegue_id, variable, tabla, resolucion_s)] = datos
+        meta = dict(meta or {})
+        temporal = ruta_meta.with_suffix(".tmp")
+        temporal.write_text(json.dumps(meta))
+        os.replace(temporal, ruta_meta)
+        with self._lock:
+            self._metas[(despliegue_id, variable, tabla)] = meta
+
+    def meta(self, despliegue_id: Hashable, variable: str, tabla: str) -> Optional[dict]:
+        """Metadatos de la pirámide, o None si no hay (o es de antes de tenerlos)."""
+        clave = (despliegue_id, variable, tabla)
+        with self._lock:
+            if clave in self._metas:
+                return self._metas[clave]
+        ruta = self._ruta_meta(despliegue_id, variable, tabla)
+        meta = json.loads(ruta.read_text()) if ruta.exists() else None
+        with self._lock:
+            self._metas[clave] = meta
+        return meta
+
+    def vigente(self, despliegue_id: Hashable, variable: str, tabla: str,
+                version: Hashable, hasta=None) -> bool:
+        """La pirámide se construyó con ``version`` y, si se da ``hasta``, llega a él.
+
+        ``hasta`` es para despliegues en curso: sus datos crecen sin que
+        cambie la versión, y la pirámide solo sirve si cubre el rango pedido
+        (con un bucket del nivel más fino de margen).
+        """
+        meta = self.meta(despliegue_id, variable, tabla)
+        if meta is None or meta.get("version") != version:
+            return False
+        if hasta is None:
+            return True
+        hasta_ns = int(np.datetime64(hasta, "ns").astype(np.int64))
+        margen = int(meta.get("resolucion_s", NIVELES_S[0])) * 1_000_000_000
+        return meta.get("hasta") is not None and hasta_ns <= meta["hasta"] + margen
+
+    def cargar(self, despliegue_id: Hashable, variable: str, tabla: str,
+               resolucion_s: int) -> Optional[Arrays]:
+        clave = (despliegue_id, variable, tabla, resolucion_s)
+        with self._lock:
+            if clave in self._memoria:
+                return self._memoria[clave]
+        ruta = self._ruta(despliegue_id, variable, tabla, resolucion_s)
+        if not ruta.exists():
+            return None
+        with np.load(ruta) as archivo:
+            datos = {c: archivo[c] for c in _CAMPOS}
+        with self._lock:
+            self._memoria[clave] = datos
+        return datos
+
+    def leer_rango(self, despliegue_id: Hashable, variable: str, tabla: str,
+                   resolucion_s: int, ts_from, ts_to) -> Optional[Arrays]:
+        """Buckets de [ts_from, ts_to] con ``valor`` = media, o None si no hay nivel."""
+        datos = self.cargar(despliegue_id, variable, tabla, resolucion_s)
+        if datos is None:
+            return None
+        desde = np.datetime64(ts_from, "ns").astype(np.int64)
+        hasta = np.datetime64(ts_to, "ns").astype(np.int64)
+        i, j = np.searchsorted(datos["timestamp"], [desde, hasta], side="right")
+        i = max(i - 1, 0)  # incluye el bucket que contiene ts_from
+        with np.errstate(invalid="ignore", divide="ignore"):
+            media = datos["suma"][i:j] / datos["count"][i:j]
+        return {
+            "timestamp": datos["timestamp"][i:j],
+            "valor": media,
+            "min": datos["min"][i:j],
+            "max": datos["max"][i:j],
+            "calidad": datos["calidad"][i:j],
+        }
+
+    def invalidar(self, despliegue_id: Hashable) -> None:
+        with self._lock:
+            for clave in [c for c in self._memoria if c[0] == despliegue_id]:
+                del self._memoria[clave]
+            for clave in [c for c in self._metas if c[0] == despliegue_id]:
+                del self._metas[clave]
+
+
+def generar_rollups(client, almacen: AlmacenRollups, despliegue_id: Hashable,
+                    variables: Sequence[str], tablas: Sequence[str],
+                    niveles_s: Sequence[int] = NIVELES_S,
+                    progreso: Optional[Callable[[float, str], None]] = None,
+                    version: Hashable = None) -> None:
+    """Recorre cada serie del despliegue por páginas y guarda su pirámide.
+
+    ``version`` es la versión de datos del backend con la que se leyó; se
+    guarda con la extensión de cada serie (ver ``AlmacenRollups.vigente``).
+    """
+    almacen.invalidar(despliegue_id)
+    series = [(variable, tabla) for tabla in tablas for variable in variables]
+    for i, (variable, tabla) in enumerate(series):
+        if progreso is not None:
+            progreso(i / len(series), f"Agregados de {variable} ({tabla})")
+        extension = {"desde": None, "hasta": None}
+
+        def bloques(variable=variable, tabla=tabla):
+            for bloque in client.iter_trend_pages(despliegue_id, variable, tabla=tabla):
+                if len(bloque["timestamp"]):
+                    if extension["desde"] is None:
+                        extension["desde"] = int(bloque["timestamp"][0])
+                    extension["hasta"] = int(bloque["timestamp"][-1])
+                yield bloque
+
+        niveles = construir_piramide(bloques(), niveles_s)
+        almacen.guardar(despliegue_id, variable, tabla, niveles, meta={
+            "version": version, "resolucion_s": min(niveles_s), **extension,
+        })
@@ -1,6 +1,13 @@
-import streamlit as st
+import os
 from textwrap import dedent
 
+import streamlit as st
+
+try:
+    from streamlit_autorefresh import st_autorefresh  # type: ignore
+except ImportError:  # pragma: no cover - dependencia opcional
+    st_autorefresh = None
+
 
 def hide_streamlit_pages_menu(keep_sidebar=True):
     css = dedent(
@@ -22,3 +29,171 @@ def hide_streamlit_pages_menu(keep_sidebar=True):
         )
 
     st.markdown(css, unsafe_allow_html=True)
+
+
+_FRAGMENTO = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+HAY_FRAGMENTOS = _FRAGMENTO is not None
+
+
+def fragmento(run_every=None):
+    """``st.fragment`` (o ``st.experimental_fragment``) si la versión lo tiene.
+
+    En versiones sin fragmentos la función se ejecuta como parte del rerun
+    completo de la página.
+    """
+    if _FRAGMENTO is None:
+        return lambda funcion: funcion
+    return _FRAGMENTO(run_every=run_every)
+
+
+def rerun_periodico(segundos, clave):
+    """Relanza la página cada ``segundos`` en versiones sin fragmentos.
+
+    Usa ``streamlit-autorefresh``: el navegador pide el rerun, así que el
+    script termina en cada pasada y no retiene el hilo de la sesión. Cada
+    rerun ejecuta la página entera. Devuelve False si el paquete no está
+    instalado (el llamador ofrece entonces un botón para actualizar).
+    """
+    if st_autorefresh is None:
+        return False
+    st_autorefresh(interval=int(segundos * 1000), key=clave)
+    return True
+
+
+def registrar_trabajo(trabajo_id):
+    """Guarda el id de un trabajo en la sesión para seguirlo en el panel."""
+    trabajos = st.session_state.setdefault("trabajos", [])
+    if trabajo_id not in trabajos:
+        trabajos.append(trabajo_id)
+
+
+def formatear_duracion(segundos):
+    segundos = int(segundos)
+    if segundos < 60:
+        return f"{segundos} s"
+    if segundos < 3600:
+        return f"{segundos // 60} min {segundos % 60} s"
+    return f"{segundos // 3600} h {segundos % 3600 // 60} min"
+
+
+@fragmento(run_every=2)
+def _panel_trabajos():
+    from utils.jobs import COMPLETADO, ERROR, get_planificador
+
+    planificador = get_planificador()
+    terminados = set()
+    for trabajo_id in reversed(st.session_state.get("trabajos", [])):
+        trabajo = planificador.estado(trabajo_id)
+        if trabajo is None:
+            continue
+        if not trabajo.activo:
+            terminados.add(trabajo_id)
+        if trabajo.activo:
+            texto = f"{trabajo.nombre} · {trabajo.etapa} · {trabajo.progreso:.0%}"
+            if trabajo.eta_s is not None:
+                texto += f" · quedan ~{formatear_duracion(trabajo.eta_s)}"
+            st.progress(trabajo.progreso, text=texto)
+        elif trabajo.estado == COMPLETADO and trabajo.liberado:
+            st.info(f"{trabajo.nombre}: completado (resultado liberado, vuelve a lanzarlo)")
+        elif trabajo.estado == COMPLETADO:
+            st.success(f"{trabajo.nombre}: completado")
+        elif trabajo.estado == ERROR:
+            st.error(f"{trabajo.nombre}: {trabajo.error}")
+        else:
+            st.warning(f"{trabajo.nombre}: cancelado")
+
+    # Un trabajo recién terminado puede cambiar el resto de la página
+    # (descargas, resúmenes): se relanza el script completo una vez
+    if terminados - st.session_state.get("_trabajos_terminados", set()):
+        st.session_state["_trabajos_terminados"] = terminados
+        st.rerun()
+
+
+def _descarga_servida(trabajo_id):
+    st.session_state.get("descargas_preparadas", set()).discard(trabajo_id)
+
+
+def mostrar_descargas():
+    """Botones de descarga de las exportaciones y reportes terminados en esta sesión.
+
+    ``st.download_button`` lee el fichero entero en memoria en cada rerun en
+    que se dibuja, así que las exportaciones (que pueden ocupar GB) solo lo
+    hacen después de pulsar "Preparar descarga", y dejan de hacerlo al
+    descargarse.
+    """
+    from utils.exportacion import ResultadoExportacion
+    from utils.jobs import COMPLETADO, get_planificador
+    from utils.reportes import Reporte
+
+    planificador = get_planificador()
+    preparadas = st.session_state.setdefault("descargas_preparadas", set())
+    for trabajo_id in reversed(st.session_state.get("trabajos", [])):
+        trabajo = planificador.estado(trabajo_id)
+        if trabajo is None or trabajo.estado != COMPLETADO:
+            continue
+        resultado = trabajo.resultado
+        if isinstance(resultado, Reporte):
+            st.download_button(
+                f"⬇️ Descargar {resultado.nombre}",
+                data=resultado.datos,
+                file_name=resultado.nombre,
+                mime=resultado.tipo_mime,
+                key=f"descarga_{trabajo_id}",
+            )
+            continue
+        if not isinstance(resultado, ResultadoExportacion) or not os.path.exists(resultado.ruta):
+            continue
+        st.caption(
+            f"{resultado.nombre}: {resultado.filas:,} filas, "
+            f"{resultado.bytes / 1e6:.1f} MB, {resultado.filas_por_s:,.0f} filas/s"
+        )
+        if trabajo_id not in preparadas:
+            if st.button(f"📦 Preparar descarga de {resultado.nombre}", key=f"preparar_{trabajo_id}"):
+                preparadas.add(trabajo_id)
+                st.rerun()
+            continue
+        with open(resultado.ruta, "rb") as fichero:
+            st.download_button(
+                f"⬇️ Descargar {resultado.nombre}",
+                data=fichero,
+                file_name=resultado.nombre,
+                mime=resultado.tipo_mime,
+                key=f"descarga_{trabajo_id}",
+                on_click=_descarga_servida,
+                args=(trabajo_id,),
+            )
+
+
+def mostrar_trabajos():
+    """Panel con el avance de los trabajos lanzados en esta sesión.
+
+    Con fragmentos se refresca solo cada 2 s; sin ellos, con el botón.
+    """
+    if not st.session_state.get("trabajos"):
+        return
+    with st.expander("⏳ Trabajos en segundo plano", expanded=True):
+        _panel_trabajos()
+        mostrar_descargas()
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔄 Actualizar", key="trabajos_actualizar"):
+                st.rerun()
+        with col2:
+            if st.button("🧹 Limpiar terminados", key="trabajos_limpiar"):
+                from utils.exportacion import ResultadoExportacion
+                from utils.jobs import get_planificador
+
+                planificador = get_planificador()
+                activos = {t.id for t in planificador.trabajos(solo_activos=True)}
+                for trabajo_id in st.session_state["trabajos"]:
+                    if trabajo_id in activos:
+                        continue
+                    trabajo = planificador.estado(trabajo_id)
+                    if trabajo is not None and isinstance(trabajo.resultado, ResultadoExportacion):
+                        trabajo.resultado.borrar()
+                    planificador.liberar(trabajo_id)
+                    st.session_state.get("descargas_preparadas", set()).discard(trabajo_id)
+                st.session_state["trabajos"] = [
+                    t for t in st.session_state["trabajos"] if t in activos
+                ]
+                st.rerun()
@@ -0,0 +1,218 @@
+"""Modo en vivo: mediciones nuevas de un despliegue en curso.
+
+Una ``SuscripcionVivo`` lee eventos de una fuente en un hilo propio y los
+guarda en un ``BufferCircular`` de tamaño fijo por variable, de modo que
+memoria y coste de dibujo son constantes durante todo un turno por mucho
+que dure. Fuentes:
+
+- ``FuenteSSE``: Server-Sent Events de ``/api/stream/mediciones``. Cada
+  evento ``data:`` es un JSON ``{"variable": ..., "points": [...]}`` con
+  puntos como los de ``/api/analytics/trend``. Si la conexión se corta, se
+  reabre pidiendo desde el último timestamp recibido.
+- ``FuenteSimulada``: paseo aleatorio local, para pruebas y demostraciones
+  sin backend.
+
+Las suscripciones se cierran solas si nadie las lee durante
+``VIVO_INACTIVIDAD_S`` (p. ej. el operador cerró la pestaña).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+
+from utils.api_client import TABLA_CRUDOS, _puntos_a_arrays
+
+Arrays = Dict[str, np.ndarray]
+
+# 8 horas a 1 Hz por variable
+CAPACIDAD = int(os.getenv("VIVO_CAPACIDAD", str(8 * 3600)))
+INACTIVIDAD_S = float(os.getenv("VIVO_INACTIVIDAD_S", "60"))
+
+
+class BufferCircular:
+    """Últimos ``capacidad`` puntos de una serie en arrays preasignados."""
+
+    def __init__(self, capacidad: int = CAPACIDAD):
+        self.capacidad = capacidad
+        self._ts = np.zeros(capacidad, dtype=np.int64)
+        self._valor = np.zeros(capacidad, dtype=np.float64)
+        self._calidad = np.zeros(capacidad, dtype=np.int8)
+        self._escritura = 0  # próxima posición a escribir
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def ultimo_ts(self) -> Optional[int]:
+        return int(self._ts[self._escritura - 1]) if self._n else None
+
+    def agregar(self, chunk: Arrays) -> None:
+        ts = np.asarray(chunk["timestamp"], dtype=np.int64)
+        if self._n:
+            nuevos = ts > self._ts[self._escritura - 1]  # descarta repetidos al reconectar
+            chunk = {k: np.asarray(v)[nuevos] for k, v in chunk.items()}
+            ts = ts[nuevos]
+        n = len(ts)
+        if not n:
+            return
+        if n >= self.capacidad:
+            chunk = {k: np.asarray(v)[-self.capacidad:] for k, v in chunk.items()}
+            n = self.capacidad
+        posiciones = (self._escritura + np.arange(n)) % self.capacidad
+        self._ts[posiciones] = chunk["timestamp"]
+        self._valor[posiciones] = chunk["valor"]
+        self._calidad[posiciones] = chunk.get("calidad", 0)
+        self._escritura = int((self._escritura + n) % self.capacidad)
+        self._n = min(self.capacidad, self._n + n)
+
+    def datos(self) -> Arrays:
+        """Copia ordenada (del más antiguo al más reciente)."""
+        inicio = (self._escritura - self._n) % self.capacidad
+        orden = (inicio + np.arange(self._n)) % self.capacidad
+        return {
+            "timestamp": self._ts[orden],
+            "valor": self._valor[orden],
+            "calidad": self._calidad[orden],
+        }
+
+
+# ---------------------------------------------------------------------- fuentes
+class FuenteSSE:
+    def __init__(self, client, despliegue_id: Hashable, variables: Sequence[str]):
+        self.client = client
+        self.despliegue_id = despliegue_id
+        self.variables = list(variables)
+
+    def eventos(self, desde_ns: Optional[int], detener: threading.Event
+                ) -> Iterator[Tuple[str, Arrays]]:
+        params = {"despliegue_id": self.despliegue_id, "variables": self.variables}
+        if desde_ns is not None:
+            params["ts_from"] = pd.Timestamp(desde_ns).isoformat()
+        with self.client.session.get(
+            f"{self.client.base_url}/api/stream/mediciones",
+            params=params,
+            headers={"Accept": "text/event-stream"},
+            stream=True,
+            timeout=(5, 30),
+        ) as response:
+            response.raise_for_status()
+            datos: List[str] = []
+            for linea in response.iter_lines(decode_unicode=True):
+                if detener.is_set():
+                    return
+                if linea.startswith("data:"):
+                    datos.append(linea[5:].strip())
+                elif not linea and datos:
+                    evento = json.loads("\n".join(datos))
+                    datos = []
+                    yield evento["variable"], _puntos_a_arrays(evento.get("points") or [])
+
+
+class FuenteSimulada:
+    """Genera ``frecuencia_hz`` puntos por segundo y variable (paseo aleatorio)."""
+
+    def __init__(self, variables: Sequence[str], frecuencia_hz: float = 1.0, semilla=None):
+        self.variables = list(variables)
+        self.periodo_ns = int(1e9 / frecuencia_hz)
+        self._rng = np.random.default_rng(semilla)
+        self._nivel = {var: 50.0 for var in self.variables}
+
+    def eventos(self, desde_ns: Optional[int], detener: threading.Event
+                ) -> Iterator[Tuple[str, Arrays]]:
+        ultimo = desde_ns if desde_ns is not None else time.time_ns() - self.periodo_ns
+        while not detener.wait(self.periodo_ns / 1e9):
+            ahora = pd.Timestamp.now().as_unit("ns").value
+            ts = np.arange(ultimo + self.periodo_ns, ahora + 1, self.periodo_ns, dtype=np.int64)
+            if not len(ts):
+                continue
+            ultimo = int(ts[-1])
+            for var in self.variables:
+                valor = self._nivel[var] + np.cumsum(self._rng.normal(0, 0.5, len(ts)))
+                self._nivel[var] = float(valor[-1])
+                yield var, {"timestamp": ts, "valor": valor,
+                            "calidad": np.zeros(len(ts), dtype=np.int8)}
+
+
+# ---------------------------------------------------------------------- suscripción
+class SuscripcionVivo:
+    def __init__(self, fuente, variables: Sequence[str], capacidad: int = CAPACIDAD,
+                 inactividad_s: float = INACTIVIDAD_S):
+        self.fuente = fuente
+        self.buffers = {var: BufferCircular(capacidad) for var in variables}
+        self.inactividad_s = inactividad_s
+        self.error: Optional[str] = None
+        self.version = 0  # aumenta con cada evento recibido
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._ultimo_acceso = time.monotonic()
+        self._hilo = threading.Thread(target=self._bucle, name="vivo", daemon=True)
+
+    def iniciar(self, historico: Optional[Dict[str, Arrays]] = None) -> "SuscripcionVivo":
+        for var, chunk in (historico or {}).items():
+            self.buffers[var].agregar(chunk)
+        self._hilo.start()
+        return self
+
+    @property
+    def activa(self) -> bool:
+        return self._hilo.is_alive()
+
+    def detener(self) -> None:
+        self._detener.set()
+
+    def datos(self) -> Dict[str, Arrays]:
+        """Copia de los buffers; cuenta como actividad de la suscripción."""
+        self._ultimo_acceso = time.monotonic()
+        with self._lock:
+            return {var: buffer.datos() for var, buffer in self.buffers.items()}
+
+    def _ultimo_ts(self) -> Optional[int]:
+        with self._lock:
+            marcas = [b.ultimo_ts for b in self.buffers.values() if b.ultimo_ts is not None]
+        return min(marcas) if marcas else None
+
+    def _bucle(self) -> None:
+        espera = 1.0
+        while not self._detener.is_set():
+            try:
+                for var, chunk in self.fuente.eventos(self._ultimo_ts(), self._detener):
+                    if time.monotonic() - self._ultimo_acceso > self.inactividad_s:
+                        self._detener.set()
+                        return
+                    if var in self.buffers:
+                        with self._lock:
+                            self.buffers[var].agregar(chunk)
+                            self.version += 1
+                    self.error = None
+                    espera = 1.0
+            except (requests.RequestException, ValueError, KeyError) as e:
+                self.error = str(e)
+            # Fin del stream o error: reconecta con espera creciente
+            if self._detener.wait(espera):
+                return
+            espera = min(30.0, espera * 2)
+            if time.monotonic() - self._ultimo_acceso > self.inactividad_s:
+                return
+
+
+def historico_reciente(client, despliegue_id: Hashable, variables: Sequence[str],
+                       capacidad: int = CAPACIDAD) -> Dict[str, Arrays]:
+    """Últimos ``capacidad`` puntos de cada variable para llenar los buffers."""
+    historico = {}
+    for var in variables:
+        try:
+            chunk, _ = client.get_trend_page(despliegue_id, var, tabla=TABLA_CRUDOS,
+                                             orden="desc", page_size=capacidad)
+        except requests.RequestException:
+            continue
+        historico[var] = {k: v[::-1] for k, v in chunk.items()}
+    return historico
@@ -0,0 +1,120 @@
+"""Formatos binarios columnares para transportar series temporales.
+
+Decodificar JSON con una lista de puntos crea varios objetos Python por punto;
+con formatos columnares el cuerpo de la respuesta se interpreta directamente
+como arrays NumPy sin copiar.
+
+Formatos soportados (negociados con la cabecera ``Accept``):
+
+- Arrow IPC stream (``FORMATO_ARROW``), si ``pyarrow`` está instalado.
+- Arrays empaquetados little-endian (``FORMATO_NUMPY``)::
+
+      b"SRS1" | 4 bytes de relleno | n: uint64
+      timestamp: int64[n] (ns desde epoch)
+      valor: float64[n]
+      calidad: int8[n]
+
+- JSON, como respaldo para backends antiguos.
+
+El cursor de la siguiente página viaja en la cabecera ``X-Next-Cursor``.
+"""
+
+from __future__ import annotations
+
+import struct
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa  # type: ignore
+except Exception:
+    pa = None
+
+FORMATO_ARROW = "application/vnd.apache.arrow.stream"
+FORMATO_NUMPY = "application/x-sertecpet-series"
+FORMATO_JSON = "application/json"
+
+CABECERA_CURSOR = "X-Next-Cursor"
+
+_MAGIA = b"SRS1"
+_CABECERA = struct.Struct("<4s4xQ")
+
+
+def cabecera_accept() -> str:
+    """Valor de ``Accept`` con los formatos que este cliente sabe decodificar."""
+    formatos = [FORMATO_NUMPY, f"{FORMATO_JSON};q=0.1"]
+    if pa is not None:
+        formatos.insert(0, FORMATO_ARROW)
+    return ", ".join(formatos)
+
+
+def codificar_numpy(serie: Dict[str, np.ndarray]) -> bytes:
+    """Empaqueta una serie en ``FORMATO_NUMPY`` (usado por el backend de pruebas)."""
+    n = len(serie["timestamp"])
+    return b"".join(
+        [
+            _CABECERA.pack(_MAGIA, n),
+            np.ascontiguousarray(serie["timestamp"], dtype="<i8").tobytes(),
+            np.ascontiguousarray(serie["valor"], dtype="<f8").tobytes(),
+            np.ascontiguousarray(serie["calidad"], dtype="i1").tobytes(),
+        ]
+    )
+
+
+def decodificar_numpy(buffer: bytes) -> Dict[str, np.ndarray]:
+    """Interpreta ``FORMATO_NUMPY`` como vistas (de solo lectura) sobre ``buffer``."""
+    magia, n = _CABECERA.unpack_from(buffer, 0)
+    if magia != _MAGIA:
+        raise ValueError("Formato binario de serie no reconocido")
+    inicio = _CABECERA.size
+    timestamp = np.frombuffer(buffer, dtype="<i8", count=n, offset=inicio)
+    valor = np.frombuffer(buffer, dtype="<f8", count=n, offset=inicio + 8 * n)
+    calidad = np.frombuffer(buffer, dtype="i1", count=n, offset=inicio + 16 * n)
+    return {"timestamp": timestamp, "valor": valor, "calidad": calidad}
+
+
+def codificar_arrow(serie: Dict[str, np.ndarray]) -> bytes:
+    """Empaqueta una serie como Arrow IPC stream (requiere ``pyarrow``)."""
+    if pa is None:
+        raise RuntimeError("pyarrow no está instalado")
+    tabla = pa.table(
+        {
+            "timestamp": pa.array(np.asarray(serie["timestamp"], dtype=np.int64)),
+            "valor": pa.array(np.asarray(serie["valor"], dtype=np.float64)),
+            "calidad": pa.array(np.asarray(serie["calidad"], dtype=np.int8)),
+        }
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tabla.schema) as writer:
+        writer.write_table(tabla)
+    return sink.getvalue().to_pybytes()
+
+
+def decodificar_arrow(buffer: bytes) -> Dict[str, np.ndarray]:
+    """Lee un Arrow IPC stream; sin copia cuando llega en un solo lote."""
+    if pa is None:
+        raise RuntimeError("pyarrow no está instalado")
+    tabla = pa.ipc.open_stream(pa.py_buffer(buffer)).read_all().combine_chunks()
+
+    def columna(nombre, dtype):
+        datos = tabla.column(nombre).to_numpy(zero_copy_only=False)
+        if np.issubdtype(datos.dtype, np.datetime64):
+            datos = datos.astype("datetime64[ns]").view(np.int64)
+        return datos.astype(dtype, copy=False)
+
+    return {
+        "timestamp": columna("timestamp", np.int64),
+        "valor": columna("valor", np.float64),
+        "calidad": columna("calidad", np.int8),
+    }
+
+
+def decodificar_respuesta(response) -> Optional[Dict[str, np.ndarray]]:
+    """Decodifica una respuesta binaria; None si el backend respondió JSON."""
+    tipo = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if tipo == FORMATO_NUMPY:
+        return decodificar_numpy(response.content)
+    if tipo == FORMATO_ARROW:
+        return decodificar_arrow(response.content)
+    return None